@@ -6,6 +6,9 @@ from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_sc
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from catboost import CatBoostClassifier, Pool
 import matplotlib.pyplot as plt
+import claims_schema
+from claims_schema import read_claims_csv
+from dataset_cache import cached_frame
 
 # ======================================================
 # Preprocessing function
@@ -25,7 +28,7 @@ def preprocess_data(df):
 
     # Scale numeric features
     scaler = StandardScaler()
-    numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns.tolist()
+    numeric_cols = df.select_dtypes(include='number').columns.tolist()
     if 'fraud_reported' in numeric_cols:
         numeric_cols.remove('fraud_reported')
     df[numeric_cols] = scaler.fit_transform(df[numeric_cols])
@@ -35,11 +38,12 @@ def preprocess_data(df):
 # ======================================================
 # Load dataset
 # ======================================================
-df = pd.read_csv("insurance_claims.csv")
-df.replace('?', np.nan, inplace=True)
-
-# Preprocess
-df = preprocess_data(df)
+# Preprocess (cached as a memory-mapped columnar dataset keyed by the CSV hash and the cleaning code)
+df = cached_frame(
+    "insurance_claims.csv", "onehot",
+    lambda: preprocess_data(read_claims_csv("insurance_claims.csv", na_values=['?'], report=True)),
+    code=(preprocess_data, claims_schema),
+)
 
 # Target column
 target = "fraud_reported"
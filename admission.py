@@ -0,0 +1,153 @@
+import asyncio
+import math
+import os
+import threading
+import time
+
+from logs import get_logger
+from metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED
+
+logger = get_logger(__name__)
+
+# ---------------- CONFIG ----------------
+MAX_CONCURRENT = int(os.getenv("FRAUD_MAX_CONCURRENT_ANALYSES", 16))  # per process, until the AI phase ends
+MAX_QUEUE = int(os.getenv("FRAUD_ADMISSION_QUEUE", 32))               # requests allowed to wait for a slot
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("FRAUD_ADMISSION_QUEUE_TIMEOUT", 2))
+BUSY_RETRY_AFTER_SECONDS = 5
+USER_RATE = float(os.getenv("FRAUD_USER_RATE", 0.5))   # sustained predictions per second per user
+USER_BURST = float(os.getenv("FRAUD_USER_BURST", 5))   # back-to-back predictions allowed per user
+MAX_BUCKETS = 100_000  # idle per-user buckets are pruned beyond this
+
+# ---------------- ADMISSION CONTROL ----------------
+# /api/predict holds a concurrency slot from the moment a claim is admitted
+# until its background AI phase has finished, so a burst cannot pile up
+# scoring work and LLM calls without bound. A request that finds every slot
+# taken waits in a bounded queue for at most QUEUE_TIMEOUT_SECONDS; with the
+# queue full, or after the wait, it is rejected right away with 429 and
+# Retry-After. Each user additionally has a token bucket. Limits apply per
+# process (per gunicorn worker).
+
+
+class Rejected(Exception):
+    """Request refused by admission control; answer 429 with Retry-After."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class ConcurrencyLimiter:
+    """At most `limit` admitted units of work, with a bounded queue of waiting threads."""
+
+    def __init__(self, name, limit=MAX_CONCURRENT, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT_SECONDS):
+        self.name = name
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.Semaphore(limit)
+        self._lock = threading.Lock()
+        self.waiting = 0
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed; raises Rejected when saturated."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self._reject("queue_full")
+                self.waiting += 1
+                ADMISSION_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+            try:
+                admitted = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+                    ADMISSION_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+            if not admitted:
+                self._reject("queue_timeout")
+        ADMISSION_IN_FLIGHT.inc(limiter=self.name)
+
+    def release(self):
+        ADMISSION_IN_FLIGHT.dec(limiter=self.name)
+        self._slots.release()
+
+    def run_then_release(self, fn, *args, **kwargs):
+        """Run fn for an admitted request and free its slot afterwards (e.g. as a background job)."""
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.release()
+
+    def _reject(self, reason):
+        ADMISSION_REJECTED.inc(limiter=self.name, reason=reason)
+        raise Rejected("Server busy, retry later", BUSY_RETRY_AFTER_SECONDS)
+
+
+class AsyncConcurrencyLimiter(ConcurrencyLimiter):
+    """ConcurrencyLimiter for coroutines on one event loop."""
+
+    def __init__(self, name, limit=MAX_CONCURRENT, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT_SECONDS):
+        super().__init__(name, limit, max_queue, queue_timeout)
+        self._slots = asyncio.Semaphore(limit)
+
+    async def acquire(self):
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self._reject("queue_full")
+            self.waiting += 1
+            ADMISSION_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout")
+            finally:
+                self.waiting -= 1
+                ADMISSION_QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+        else:
+            await self._slots.acquire()
+        ADMISSION_IN_FLIGHT.inc(limiter=self.name)
+
+    async def run_then_release(self, fn, *args, **kwargs):
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            self.release()
+
+
+class RateLimiter:
+    """Token bucket per key: `rate` tokens per second, up to `burst` saved up."""
+
+    def __init__(self, name, rate=USER_RATE, burst=USER_BURST):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # key -> [tokens, last refill (monotonic)]
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Spend one token for key; raises Rejected with the wait until the next token."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._prune(now)
+                bucket = self._buckets[key] = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return
+            bucket[0] = tokens
+        ADMISSION_REJECTED.inc(limiter=self.name, reason="rate_limited")
+        raise Rejected("Too many requests for this user, slow down", (1 - tokens) / self.rate)
+
+    def _prune(self, now):
+        # Buckets that have refilled completely hold no state worth keeping
+        full_after = self.burst / self.rate
+        for key in [k for k, (_, last) in self._buckets.items() if now - last >= full_after]:
+            del self._buckets[key]
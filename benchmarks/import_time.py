@@ -0,0 +1,75 @@
+"""
+Import time of the API and inference modules, measured in fresh interpreters
+with `python -X importtime`.
+
+Run from the repo root:
+    python benchmarks/import_time.py [--runs 5] [--top 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["logics", "perpbot", "perpbotback", "combined", "combinedback"]
+
+
+def import_once(module):
+    """(wall seconds, {import: cumulative microseconds}) for one fresh import, two levels deep."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    imports = {}
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package" - nesting is indented by two spaces
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            imports[name.strip()] = int(cum_us)
+    return wall, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per module")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    startup = [import_once("sys") for _ in range(args.runs)]
+    baseline = statistics.median(wall for wall, _ in startup)
+    startup_imports = set(startup[-1][1])
+    results = {"interpreter_startup_s": baseline, "modules": {}}
+
+    for module in args.modules:
+        walls, imports = [], {}
+        for _ in range(args.runs):
+            wall, imports = import_once(module)
+            walls.append(wall)
+        imports = {n: us for n, us in imports.items() if n not in startup_imports and n != module}
+        slowest = sorted(imports.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        results["modules"][module] = {
+            "median_wall_s": statistics.median(walls),
+            "import_s": statistics.median(walls) - baseline,
+            "slowest_imports_ms": {name: us / 1000 for name, us in slowest},
+        }
+        print(f"{module:<14} {statistics.median(walls) - baseline:7.3f}s  "
+              + ", ".join(f"{n} {us / 1000:.0f}ms" for n, us in slowest[:5]))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
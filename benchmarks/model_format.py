@@ -0,0 +1,103 @@
+"""
+Startup time and per-prediction latency of the pickled model vs the native
+CatBoost .cbm export (and ONNX when exported and onnxruntime is installed).
+
+Run from the repo root after `python train.py`:
+    python benchmarks/model_format.py [--reps 500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_io import CBM_PATH, ONNX_PATH, PKL_PATH
+
+# Each load runs in a fresh interpreter so import and unpickling costs are counted
+LOAD_SNIPPETS = {
+    "pkl": "import joblib; joblib.load({path!r})",
+    "cbm": "from catboost import CatBoostClassifier; CatBoostClassifier().load_model({path!r}, format='cbm')",
+    "onnx": "import onnxruntime as rt; rt.InferenceSession({path!r})",
+}
+
+
+def measure_startup(fmt, path, runs):
+    """Median wall time of a fresh process that imports the runtime and loads the model."""
+    code = LOAD_SNIPPETS[fmt].format(path=path)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def measure_latency(predict, reps):
+    """p50/p95/p99 latency in ms of single-row predictions."""
+    timings = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        predict()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    pick = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))]
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reps", type=int, default=500, help="predictions per format")
+    parser.add_argument("--startup-runs", type=int, default=3, help="fresh processes per format")
+    parser.add_argument("--data", default="insurance_claims.csv")
+    args = parser.parse_args()
+
+    import joblib
+    import pandas as pd
+    from catboost import CatBoostClassifier
+    from perpbotback import preprocess_input
+
+    row = preprocess_input(pd.read_csv(args.data).head(1))
+    results = {}
+
+    if os.path.exists(PKL_PATH):
+        model = joblib.load(PKL_PATH)
+        results["pkl"] = {
+            "file_mb": os.path.getsize(PKL_PATH) / 1e6,
+            "startup_s": measure_startup("pkl", PKL_PATH, args.startup_runs),
+            **measure_latency(lambda: model.predict_proba(row), args.reps),
+        }
+
+    if os.path.exists(CBM_PATH):
+        model = CatBoostClassifier().load_model(CBM_PATH, format="cbm")
+        results["cbm"] = {
+            "file_mb": os.path.getsize(CBM_PATH) / 1e6,
+            "startup_s": measure_startup("cbm", CBM_PATH, args.startup_runs),
+            **measure_latency(lambda: model.predict_proba(row), args.reps),
+        }
+
+    if os.path.exists(ONNX_PATH):
+        try:
+            import onnxruntime as rt
+        except ImportError:
+            print("onnxruntime not installed, skipping ONNX")
+        else:
+            session = rt.InferenceSession(ONNX_PATH)
+            features = {session.get_inputs()[0].name: row.to_numpy(dtype="float32")}
+            results["onnx"] = {
+                "file_mb": os.path.getsize(ONNX_PATH) / 1e6,
+                "startup_s": measure_startup("onnx", ONNX_PATH, args.startup_runs),
+                **measure_latency(lambda: session.run(None, features), args.reps),
+            }
+
+    print(f"{'format':<8}{'file MB':>9}{'startup s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for fmt, r in results.items():
+        print(f"{fmt:<8}{r['file_mb']:>9.2f}{r['startup_s']:>11.3f}{r['p50_ms']:>9.3f}{r['p95_ms']:>9.3f}{r['p99_ms']:>9.3f}")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Benchmark suite for the scoring pipeline.
+
+Generates synthetic claims with synth.py (learned from insurance_claims.csv)
+and measures latency percentiles, throughput and peak memory (tracemalloc) of:
+  - AutoInsuranceFraudDetector.load_data / run_full_analysis and every
+    detector in its PIPELINE, at each --sizes row count
+  - preprocess_input and get_catboost_prediction, one claim per call
+  - POST /api/predict end to end through the Flask app, with the LLM call
+    stubbed (in-process, or over HTTP against llm_stub.py with --llm http)
+    and Firestore disabled
+
+Every case runs in a fresh interpreter (so peak memory and model loading are
+per case) under --timeout. Results are written as JSON; pass a previous run to
+--compare to flag regressions.
+
+Run from the repo root (with a trained model in models/):
+    python benchmarks/run_benchmarks.py [--sizes 1000,100000,1000000] [--output results.json]
+    python benchmarks/run_benchmarks.py --sizes 1000 --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_PATH = os.path.join(ROOT, "insurance_claims.csv")
+ROW_CASES = ("preprocess_input", "get_catboost_prediction", "api_predict")
+ALL_CASES = ("rules",) + ROW_CASES
+
+
+# ---------------- SYNTHETIC DATA ----------------
+def synthetic_claims(n, seed=0, source=DATA_PATH):
+    """
+    n claims from synth.ClaimSynthesizer fitted on the real data, with the default
+    fraud-pattern injection so every detector has work to do at every size.
+    """
+    from synth import DEFAULT_INJECTION, fit_synthesizer
+
+    return fit_synthesizer(source, seed=seed).sample(n, injection=DEFAULT_INJECTION)
+
+
+# ---------------- STATISTICS ----------------
+def summarize(seconds):
+    """Latency percentiles (ms) of a list of durations in seconds."""
+    ordered = sorted(seconds)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        "n": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def traced_peak_mb(fn):
+    """Run fn under tracemalloc; peak MB allocated above what was live at the start."""
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - start) / 1e6
+
+
+# ---------------- CASES (run inside the child process) ----------------
+def bench_rules(rows, repeat, memory, seed):
+    """load_data, every PIPELINE detector, and their sum (= run_full_analysis)."""
+    from logics import AutoInsuranceFraudDetector
+
+    df = synthetic_claims(rows, seed)
+    stages = ("load_data",) + AutoInsuranceFraudDetector.PIPELINE
+    timings = {name: [] for name in stages + ("run_full_analysis",)}
+
+    def run_pipeline(record):
+        detector = AutoInsuranceFraudDetector()
+        for name in stages:
+            call = (lambda: detector.load_data(df)) if name == "load_data" else getattr(detector, name)
+            record(name, call)
+
+    def time_stage(name, call):
+        start = time.perf_counter()
+        call()
+        timings[name].append(time.perf_counter() - start)
+
+    for _ in range(repeat):
+        run_pipeline(time_stage)
+        timings["run_full_analysis"].append(sum(timings[name][-1] for name in stages[1:]))
+
+    results = {}
+    for name, samples in timings.items():
+        results[name] = summarize(samples)
+        results[name]["rows_per_s"] = rows / (results[name]["p50_ms"] / 1000) if results[name]["p50_ms"] else None
+
+    if memory:
+        peaks = {}
+        run_pipeline(lambda name, call: peaks.__setitem__(name, traced_peak_mb(call)))
+        for name, peak in peaks.items():
+            results[name]["peak_mb"] = peak
+        results["run_full_analysis"]["peak_mb"] = max(peaks[name] for name in stages[1:])
+    return results
+
+
+def claim_rows(n, seed):
+    """n one-row claim payloads as the API receives them (all values as strings)."""
+    df = synthetic_claims(n, seed)
+    return [{k: str(v) for k, v in row.items() if v == v} for row in df.to_dict("records")]
+
+
+def bench_per_claim(case, requests, memory, seed, llm_latency_ms, llm="inline"):
+    """One claim per call: preprocess_input, get_catboost_prediction or POST /api/predict."""
+    if case == "api_predict":
+        # Admission control (admission.py) would answer 429 to a single client
+        # sending claims back to back; the benchmark measures the scoring path
+        os.environ["FRAUD_USER_RATE"] = "0"
+        os.environ["FRAUD_MAX_CONCURRENT_ANALYSES"] = str(requests + 1)
+    from combined import parse_claim_frame
+    from resources import get_catboost_model
+
+    payloads = claim_rows(requests, seed)
+    start = time.perf_counter()
+    get_catboost_model()
+    model_load_s = time.perf_counter() - start
+
+    if case in ("preprocess_input", "get_catboost_prediction"):
+        import perpbot
+        fn = getattr(perpbot, case)
+        frames = [parse_claim_frame(p) for p in payloads]
+        fn(frames[0])  # warm-up
+        calls = [lambda f=f: fn(f) for f in frames]
+    else:
+        import combined
+
+        def stub_llm(claim_details, catboost_result, extra_docs=None, **kwargs):
+            time.sleep(llm_latency_ms / 1000)
+            return {"fraud_score": 50, "explanation": "benchmark stub", "action": "accept", "follow_up_questions": []}
+
+        if llm == "http":
+            # Real client code path (HTTP session, JSON parsing) against the local stub server
+            import perpbot
+            from llm_stub import start_in_thread
+            _, perpbot.PERPLEXITY_API_URL = start_in_thread(latency_ms=llm_latency_ms, seed=seed)
+        else:
+            combined.analyze_claim_perplexity = stub_llm
+        combined.get_firestore_client = lambda: None
+        client = combined.app.test_client()
+        client.post("/api/predict", json=payloads[0])  # warm-up
+
+        job_ids = []
+
+        def post(payload):
+            response = client.post("/api/predict", json=payload)
+            if response.status_code != 202:
+                raise RuntimeError(f"/api/predict returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            job_ids.append(response.get_json()["job_id"])
+
+        calls = [lambda p=p: post(p) for p in payloads]
+
+    samples = []
+    wall_start = time.perf_counter()
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    wall = time.perf_counter() - wall_start
+
+    result = {"latency": summarize(samples), "calls_per_s": len(samples) / wall, "model_load_s": model_load_s}
+    if case == "api_predict":
+        # Background phase (stubbed LLM + skipped save), from request accept to job done
+        jobs = [combined.jobs.wait(job_id, timeout=60) for job_id in job_ids]
+        result["job_latency"] = summarize([job.finished_at - job.created_at for job in jobs if job.finished])
+    if memory:
+        result["peak_mb"] = traced_peak_mb(lambda: [call() for call in calls[:50]])
+    return result
+
+
+def run_case(args):
+    """Child process entry point: run one case and write its result JSON."""
+    if args.case == "rules":
+        result = bench_rules(args.rows, args.repeat, not args.no_memory, args.seed)
+    else:
+        result = bench_per_claim(args.case, args.requests, not args.no_memory, args.seed, args.llm_latency_ms,
+                                 args.llm)
+    with open(args.result_file, "w") as f:
+        json.dump(result, f)
+
+
+# ---------------- DRIVER ----------------
+def spawn_case(case, args, rows=None):
+    """Run one case in a fresh interpreter; returns its result or an error/timeout marker."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_file = f.name
+    cmd = [sys.executable, os.path.abspath(__file__), "--case", case, "--result-file", result_file,
+           "--repeat", str(args.repeat), "--requests", str(args.requests), "--seed", str(args.seed),
+           "--llm-latency-ms", str(args.llm_latency_ms), "--llm", args.llm]
+    if rows is not None:
+        cmd += ["--rows", str(rows)]
+    if args.no_memory:
+        cmd.append("--no-memory")
+
+    output = None if args.verbose else subprocess.DEVNULL
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, cwd=ROOT, stdout=output, stderr=None if args.verbose else subprocess.PIPE,
+                              text=True, timeout=args.timeout)
+        if proc.returncode != 0:
+            return {"status": "error", "error": (proc.stderr or "")[-2000:]}
+        with open(result_file) as f:
+            return {"status": "ok", "wall_s": time.perf_counter() - start, **json.load(f)}
+    except subprocess.TimeoutExpired:
+        return {"status": "timeout", "timeout_s": args.timeout}
+    finally:
+        os.unlink(result_file)
+
+
+def environment():
+    import catboost
+    import numpy
+    import pandas
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "catboost": catboost.__version__,
+    }
+
+
+def flatten(results):
+    """{(case, stage): p50 ms} for regression comparison."""
+    flat = {}
+    for key, case in results["cases"].items():
+        if case.get("status") != "ok":
+            continue
+        for stage, stats in case.items():
+            if isinstance(stats, dict) and "p50_ms" in stats:
+                flat[f"{key}/{stage}"] = stats["p50_ms"]
+    return flat
+
+
+def compare(current, baseline, threshold):
+    """Print p50 changes vs a baseline run; returns the keys that regressed by more than threshold."""
+    now, before = flatten(current), flatten(baseline)
+    regressions = []
+    print(f"\n{'benchmark':<60}{'base ms':>12}{'now ms':>12}{'change':>9}")
+    for key in sorted(now.keys() & before.keys()):
+        change = now[key] / before[key] - 1 if before[key] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(key)
+        print(f"{key:<60}{before[key]:>12.3f}{now[key]:>12.3f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def print_summary(results):
+    for key, case in results["cases"].items():
+        if case.get("status") != "ok":
+            print(f"{key:<28} {case.get('status')}")
+            continue
+        if "latency" in case:
+            lat = case["latency"]
+            print(f"{key:<28} p50 {lat['p50_ms']:8.2f} ms  p95 {lat['p95_ms']:8.2f} ms  "
+                  f"p99 {lat['p99_ms']:8.2f} ms  {case['calls_per_s']:8.1f} calls/s"
+                  + (f"  peak {case['peak_mb']:.1f} MB" if "peak_mb" in case else ""))
+            continue
+        for stage, stats in case.items():
+            if isinstance(stats, dict) and "p50_ms" in stats:
+                print(f"{key + '/' + stage:<60} p50 {stats['p50_ms']:10.1f} ms  "
+                      f"{(stats['rows_per_s'] or 0):12.0f} rows/s"
+                      + (f"  peak {stats['peak_mb']:8.1f} MB" if "peak_mb" in stats else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="row counts for the rule pipeline")
+    parser.add_argument("--cases", default=",".join(ALL_CASES), help=f"subset of {','.join(ALL_CASES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of the rule pipeline per size")
+    parser.add_argument("--requests", type=int, default=200, help="claims per per-claim case")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="sleep in the stubbed LLM call")
+    parser.add_argument("--llm", choices=("inline", "http"), default="inline",
+                        help="stub the LLM in-process, or serve it from llm_stub.py over HTTP")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds per case before it is abandoned")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare p50 latencies against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative p50 slowdown reported as a regression")
+    parser.add_argument("--verbose", action="store_true", help="show the benchmarked code's output")
+    # Internal: set when this script re-invokes itself for a single case
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args)
+        return
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    results = {"environment": environment(), "config": vars(args), "cases": {}}
+    for case in cases:
+        if case == "rules":
+            for rows in (int(s) for s in args.sizes.split(",")):
+                results["cases"][f"rules[{rows}]"] = spawn_case(case, args, rows)
+                print_summary({"cases": {f"rules[{rows}]": results["cases"][f"rules[{rows}]"]}})
+        elif case in ROW_CASES:
+            results["cases"][case] = spawn_case(case, args)
+            print_summary({"cases": {case: results["cases"][case]}})
+        else:
+            parser.error(f"unknown case {case!r}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Per-worker memory of the API under gunicorn with and without pre-fork model
+loading (gunicorn.conf.py, FRAUD_PRELOAD_MODELS).
+
+Rss counts shared pages in every worker; Pss splits them between the sharing
+processes, so the sum of Pss is the real footprint of the deployment.
+
+Run from the repo root (Linux only, needs gunicorn):
+    python benchmarks/worker_rss.py [--workers 4]
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def smaps_rollup(pid):
+    """Rss/Pss/Shared/Private of a process in MB from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].endswith(":") and parts[2] == "kB":
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def children(pid):
+    """PIDs whose parent is pid."""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # Field 4 is the parent pid; the command name (field 2) may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return found
+
+
+def measure(preload, workers, port, settle):
+    env = {
+        **os.environ,
+        "FRAUD_PRELOAD_MODELS": "1" if preload else "0",
+        "FRAUD_WORKERS": str(workers),
+        "FRAUD_THREADS": "1",
+        "FRAUD_BIND": f"127.0.0.1:{port}",
+    }
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "combined:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + 120
+        while len(children(master.pid)) < workers:
+            if time.time() > deadline or master.poll() is not None:
+                raise RuntimeError("gunicorn workers did not start")
+            time.sleep(0.5)
+        # Give workers time to finish post_worker_init (model load when not preloaded)
+        time.sleep(settle)
+
+        per_worker = [smaps_rollup(pid) for pid in children(master.pid)]
+        return {
+            "master": smaps_rollup(master.pid),
+            "workers": per_worker,
+            "total_pss_mb": smaps_rollup(master.pid)["pss_mb"] + sum(w["pss_mb"] for w in per_worker),
+        }
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds to wait after workers start")
+    args = parser.parse_args()
+
+    results = {}
+    for preload in (False, True):
+        label = "preload" if preload else "per_worker_load"
+        results[label] = measure(preload, args.workers, args.port, args.settle)
+        w = results[label]["workers"]
+        print(f"{label:<16} workers={len(w)}  "
+              f"avg Rss {sum(x['rss_mb'] for x in w) / len(w):7.1f} MB  "
+              f"avg Pss {sum(x['pss_mb'] for x in w) / len(w):7.1f} MB  "
+              f"avg private {sum(x['private_mb'] for x in w) / len(w):7.1f} MB  "
+              f"total Pss {results[label]['total_pss_mb']:7.1f} MB")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import os
+import pandas as pd
+
+# ---------------- SCHEMA ----------------
+# Column registry for the insurance_claims.csv format. Shared by logics, train.py,
+# CatBoost.py and the API so every entry point loads claims with the same dtypes.
+
+CATEGORICAL_COLUMNS = [
+    "policy_state", "policy_csl", "insured_sex", "insured_education_level",
+    "insured_occupation", "insured_hobbies", "insured_relationship",
+    "incident_type", "collision_type", "incident_severity", "authorities_contacted",
+    "incident_state", "incident_city", "incident_location", "property_damage",
+    "police_report_available", "auto_make", "auto_model", "fraud_reported",
+]
+
+NUMERIC_COLUMNS = [
+    "months_as_customer", "age", "policy_number", "policy_deductable",
+    "policy_annual_premium", "umbrella_limit", "insured_zip",
+    "capital-gains", "capital-loss", "incident_hour_of_the_day",
+    "number_of_vehicles_involved", "bodily_injuries", "witnesses",
+    "total_claim_amount", "injury_claim", "property_claim", "vehicle_claim",
+    "auto_year", "_c39",
+]
+
+# The frontend form posts these with underscores instead of hyphens
+NUMERIC_ALIASES = ["capital_gains", "capital_loss"]
+
+# Numeric in the CSV but free-form identifiers in API payloads (e.g. "POL001")
+IDENTIFIER_COLUMNS = ["policy_number", "insured_zip"]
+
+# Columns the API coerces to numbers before scoring
+API_NUMERIC_COLUMNS = [c for c in NUMERIC_COLUMNS if c not in IDENTIFIER_COLUMNS + ["_c39"]] + NUMERIC_ALIASES
+
+DATE_COLUMNS = ["policy_bind_date", "incident_date"]
+
+
+def memory_mb(df):
+    """Deep memory usage of a frame in MB."""
+    return df.memory_usage(deep=True).sum() / (1024 ** 2)
+
+
+def downcast_numeric(series):
+    """Downcast a numeric column to the smallest dtype that holds its values."""
+    series = pd.to_numeric(series, errors="coerce")
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+    if series.isna().all():
+        return series.astype("float32")
+    downcast = series.astype("float32")
+    # Keep float32 only when values survive the round trip at cent precision
+    if ((downcast.astype("float64") - series).abs().fillna(0) < 0.005).all():
+        return downcast
+    return series
+
+
+def compact_dtypes(df, parse_dates=True, categorical=True, downcast=True):
+    """
+    Convert a claims frame (e.g. from a plain pd.read_csv or an API payload)
+    to the compact schema dtypes. Unknown columns are left untouched.
+
+    categorical=False / downcast=False skip the category conversion and numeric
+    downcasting (numbers are still parsed): on a few-row frame such as one API
+    claim they cost more time than they save memory.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col in IDENTIFIER_COLUMNS and not pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        if col in NUMERIC_COLUMNS or col in NUMERIC_ALIASES:
+            df[col] = downcast_numeric(df[col]) if downcast else pd.to_numeric(df[col], errors="coerce")
+        elif col in DATE_COLUMNS:
+            if parse_dates:
+                df[col] = pd.to_datetime(df[col], errors="coerce")
+            elif categorical:
+                df[col] = df[col].astype("category")
+        elif col in CATEGORICAL_COLUMNS and categorical:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def read_claims_csv(path="insurance_claims.csv", parse_dates=True, na_values=None,
+                    report=False, **read_csv_kwargs):
+    """
+    Load a claims CSV with category dtypes, downcast numerics and parsed dates.
+
+    parse_dates=False keeps the date columns as categories (train.py feeds them
+    to CatBoost as categorical features). na_values is passed through, e.g.
+    ['?'] for the cleaning used by CatBoost.py.
+    """
+    header = pd.read_csv(path, nrows=0, **read_csv_kwargs).columns
+    dtypes = {col: "category" for col in header if col in CATEGORICAL_COLUMNS}
+    if not parse_dates:
+        dtypes.update({col: "category" for col in header if col in DATE_COLUMNS})
+    dates = [col for col in header if col in DATE_COLUMNS] if parse_dates else False
+
+    df = pd.read_csv(path, dtype=dtypes, parse_dates=dates, na_values=na_values,
+                     **read_csv_kwargs)
+    for col in df.columns:
+        if col in NUMERIC_COLUMNS:
+            df[col] = downcast_numeric(df[col])
+
+    if report:
+        print_memory_report(df, path)
+    return df
+
+
+def baseline_memory_mb(df):
+    """Estimate the deep memory usage of df with default read_csv dtypes (object/int64/float64)."""
+    total = df.index.memory_usage()
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(s):
+            total += s.astype(str).astype(object).memory_usage(index=False, deep=True)
+        elif pd.api.types.is_numeric_dtype(s):
+            total += len(s) * 8
+        else:
+            total += s.memory_usage(index=False, deep=True)
+    return total / (1024 ** 2)
+
+
+def print_memory_report(df, label="claims"):
+    """Print memory saved by the compact dtypes relative to default pd.read_csv dtypes."""
+    before = baseline_memory_mb(df)
+    after = memory_mb(df)
+    saved = (1 - after / before) * 100 if before > 0 else 0.0
+    print(f"📦 {os.path.basename(str(label))}: {len(df)} rows, "
+          f"{before:.2f} MB -> {after:.2f} MB ({saved:.1f}% saved)")
+    return {"rows": len(df), "baseline_mb": before, "compact_mb": after, "saved_pct": saved}
+
+
+def fill_categorical(series, value="Unknown"):
+    """fillna for categorical columns, adding the fill value as a category when needed."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if value not in series.cat.categories:
+            series = series.cat.add_categories([value])
+        return series.fillna(value)
+    return series.fillna(value)
@@ -1,34 +1,37 @@
-import pandas as pd
-from flask import Flask, request, jsonify
-from logics import AutoInsuranceFraudDetector
+from flask import Flask, request, jsonify, Response, g, stream_with_context
 from perpbot import get_catboost_prediction, analyze_claim_perplexity
-import os
+from resources import get_firestore_client
+from jobs import JobStore, DONE
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, render_prometheus, timed
+from profiling import profiled
+from logs import correlation, get_logger, log_payload
+from singleflight import SingleFlight, payload_key
+from resilience import Deadline
+from admission import ConcurrencyLimiter, RateLimiter, Rejected
+from upload_store import MAX_REQUEST_BYTES, UploadTooLarge, store_stream
+from image_index import register_upload
+from werkzeug.exceptions import RequestEntityTooLarge
+import json
+import time
 from datetime import datetime
 import hashlib
 
-# Firebase imports
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-# Initialize Firebase (only if not already initialized)
-if not firebase_admin._apps:
-    try:
-        # Try to load from environment or use default path
-        cred_path = os.getenv('FIREBASE_CREDENTIALS_PATH', 'insurance-fraud-detectio-a6526-firebase-adminsdk-fbsvc-9a0f74002a.json')
-        cred = credentials.Certificate(cred_path)
-        firebase_admin.initialize_app(cred)
-        print("✅ Firebase initialized successfully")
-    except Exception as e:
-        print(f"⚠️ Firebase initialization warning: {e}")
+# Firebase, pandas, sklearn and the CatBoost model are loaded on first use
+# (see resources.py), so importing this module stays cheap and side-effect free.
 
 app = Flask(__name__)
-
-# Initialize Firestore client
-try:
-    db = firestore.client()
-except:
-    db = None
-    print("⚠️ Firestore client not available")
+# Oversized uploads are refused before the multipart body is parsed
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+logger = get_logger(__name__)
+
+# Background pool for the slow phase of /api/predict (LLM + Firestore write)
+jobs = JobStore()
+# Concurrent identical /api/predict calls (same payload or Idempotency-Key) share one analysis
+submissions = SingleFlight("predict")
+# Bounded concurrent analyses (held until the AI phase ends) and per-user rate limits
+analyses = ConcurrencyLimiter("predict")
+user_limits = RateLimiter("predict_user")
+SSE_KEEPALIVE_SECONDS = 15
 
 def generate_analysis_id(claim_data):
     """Generate unique analysis ID"""
@@ -36,106 +39,183 @@ def generate_analysis_id(claim_data):
     hash_object = hashlib.md5(data_string.encode())
     return f"ANALYSIS_{hash_object.hexdigest()[:12].upper()}"
 
-def save_to_fraud_analyses(claim_data, hybrid_result, ai_check):
+DATE_FIELDS = ['analysis_timestamp', 'created_at', 'updated_at', 'reviewed_at']
+
+def serialize_dates(data):
+    """Convert timestamp fields of a fraud_analyses document to ISO strings"""
+    for date_field in DATE_FIELDS:
+        if date_field in data and data[date_field]:
+            data[date_field] = data[date_field].isoformat()
+    return data
+
+def claim_ai_fields(analysis_id, ai_check):
+    """AI verdict fields of a `claims` document (the ones the upload page leaves PENDING)"""
+    return {
+        'analysis_id': analysis_id,
+        'ai_action': ai_check.get('action') or 'APPROVE',
+        'ai_reasoning': ai_check.get('reasoning') or ai_check.get('explanation') or '',
+        'ai_confidence_score': ai_check.get('confidence_score') or 0,
+        'ai_red_flags': ai_check.get('red_flags') or [],
+        'ai_recommendation': ai_check.get('recommendation') or '',
+        'updated_at': datetime.now(),
+    }
+
+def build_analysis_doc(analysis_id, claim_data, hybrid_result, ai_check, processing_time_ms=0):
+    """Build the fraud_analyses document for one analysed claim"""
+    return {
+        # IDs and timestamps
+        'analysis_id': analysis_id,
+        'claim_reference': claim_data.get('policy_number', 'unknown'),
+        'analysis_timestamp': datetime.now(),
+        'processing_time_ms': processing_time_ms,
+        
+        # User Information - THIS IS THE KEY UPDATE
+        'user_id': claim_data.get('user_id', 'unknown'),
+        'user_email': claim_data.get('user_email', 'unknown'),
+        'user_name': claim_data.get('user_name', claim_data.get('user_email', 'unknown')),
+        
+        # Basic claim info for reference
+        'policy_number': claim_data.get('policy_number', ''),
+        'total_claim_amount': float(claim_data.get('total_claim_amount', 0)),
+        'incident_type': claim_data.get('incident_type', ''),
+        'incident_date': claim_data.get('incident_date', ''),
+        'incident_city': claim_data.get('incident_city', ''),
+        'incident_state': claim_data.get('incident_state', ''),
+        'incident_severity': claim_data.get('incident_severity', ''),
+        'auto_make': claim_data.get('auto_make', ''),
+        'auto_model': claim_data.get('auto_model', ''),
+        'auto_year': int(claim_data.get('auto_year', 0)) if claim_data.get('auto_year') else None,
+        'insured_zip': claim_data.get('insured_zip', ''),
+        'insured_occupation': claim_data.get('insured_occupation', ''),
+        'collision_type': claim_data.get('collision_type', ''),
+        'property_damage': claim_data.get('property_damage', ''),
+        'bodily_injuries': int(claim_data.get('bodily_injuries', 0)) if claim_data.get('bodily_injuries') else 0,
+        'witnesses': int(claim_data.get('witnesses', 0)) if claim_data.get('witnesses') else 0,
+        'police_report_available': claim_data.get('police_report_available', ''),
+        'claim_description': claim_data.get('claim_description', ''),
+        'claim_image_sha256': claim_data.get('claim_image_sha256'),  # content address in uploads/
+        
+        # ML Analysis Results
+        'rule_based_score': hybrid_result.get('fraud_score', 0),
+        'catboost_probability': hybrid_result.get('catboost_result', {}).get('fraud_probability', 0),
+        'catboost_prediction': hybrid_result.get('catboost_result', {}).get('fraud_prediction', 'n'),
+        'catboost_confidence': hybrid_result.get('catboost_result', {}).get('confidence', 0),
+        'combined_score': hybrid_result.get('fraud_score', 0),
+        
+        # AI Analysis Results
+        'ai_fraud_score': ai_check.get('fraud_score', hybrid_result.get('fraud_score', 0)),
+        'ai_explanation': ai_check.get('explanation', 'No explanation available'),
+        'ai_action': ai_check.get('action', 'request_documents'),
+        'ai_confidence': ai_check.get('confidence', 0.5),
+        'ai_reasoning': ai_check.get('reasoning', ''),
+        'ai_recommendation': ai_check.get('recommendation', ''),
+        'ai_degraded': ai_check.get('degraded', False),  # LLM skipped/failed: rule + CatBoost verdict
+        
+        # Risk Assessment
+        'risk_level': hybrid_result.get('risk_level', 'MEDIUM'),
+        'risk_factors': hybrid_result.get('reasons', []),
+        'key_risk_factors': ai_check.get('key_risk_factors', []),
+        'red_flags': ai_check.get('red_flags', []),
+        
+        # Recommendations
+        'follow_up_questions': ai_check.get('follow_up_questions', []),
+        'recommendations': ai_check.get('recommendations', []),
+        
+        # Status and Review
+        'status': 'Under Review',
+        'requires_review': ai_check.get('action', 'request_documents') in ['escalate_investigation', 'reject'],
+        'reviewed_at': None,
+        'review_notes': '',
+        'created_at': datetime.now(),
+        'updated_at': datetime.now(),
+        
+        # Technical details
+        'model_version': '1.0',
+        'analysis_method': 'hybrid_ml' if ai_check.get('degraded') else 'hybrid_ml_ai'
+    }
+
+def save_to_fraud_analyses(claim_data, hybrid_result, ai_check, analysis_id=None, processing_time_ms=0):
     """Save detailed analysis results to fraud_analyses collection"""
+    db = get_firestore_client()
     if not db:
-        print("⚠️ Database not available, skipping fraud_analyses save")
+        logger.warning("Database not available, skipping fraud_analyses save")
         return None
     
     try:
-        analysis_id = generate_analysis_id(claim_data)
+        analysis_id = analysis_id or generate_analysis_id(claim_data)
         
         # Create comprehensive analysis document
-        analysis_doc = {
-            # IDs and timestamps
-            'analysis_id': analysis_id,
-            'claim_reference': claim_data.get('policy_number', 'unknown'),
-            'analysis_timestamp': datetime.now(),
-            'processing_time_ms': 0,
-            
-            # User Information - THIS IS THE KEY UPDATE
-            'user_id': claim_data.get('user_id', 'unknown'),
-            'user_email': claim_data.get('user_email', 'unknown'),
-            'user_name': claim_data.get('user_name', claim_data.get('user_email', 'unknown')),
-            
-            # Basic claim info for reference
-            'policy_number': claim_data.get('policy_number', ''),
-            'total_claim_amount': float(claim_data.get('total_claim_amount', 0)),
-            'incident_type': claim_data.get('incident_type', ''),
-            'incident_date': claim_data.get('incident_date', ''),
-            'incident_city': claim_data.get('incident_city', ''),
-            'incident_state': claim_data.get('incident_state', ''),
-            'incident_severity': claim_data.get('incident_severity', ''),
-            'auto_make': claim_data.get('auto_make', ''),
-            'auto_model': claim_data.get('auto_model', ''),
-            'auto_year': int(claim_data.get('auto_year', 0)) if claim_data.get('auto_year') else None,
-            'insured_zip': claim_data.get('insured_zip', ''),
-            'insured_occupation': claim_data.get('insured_occupation', ''),
-            'collision_type': claim_data.get('collision_type', ''),
-            'property_damage': claim_data.get('property_damage', ''),
-            'bodily_injuries': int(claim_data.get('bodily_injuries', 0)) if claim_data.get('bodily_injuries') else 0,
-            'witnesses': int(claim_data.get('witnesses', 0)) if claim_data.get('witnesses') else 0,
-            'police_report_available': claim_data.get('police_report_available', ''),
-            'claim_description': claim_data.get('claim_description', ''),
-            
-            # ML Analysis Results
-            'rule_based_score': hybrid_result.get('fraud_score', 0),
-            'catboost_probability': hybrid_result.get('catboost_result', {}).get('fraud_probability', 0),
-            'catboost_prediction': hybrid_result.get('catboost_result', {}).get('fraud_prediction', 'n'),
-            'catboost_confidence': hybrid_result.get('catboost_result', {}).get('confidence', 0),
-            'combined_score': hybrid_result.get('fraud_score', 0),
-            
-            # AI Analysis Results
-            'ai_fraud_score': ai_check.get('fraud_score', hybrid_result.get('fraud_score', 0)),
-            'ai_explanation': ai_check.get('explanation', 'No explanation available'),
-            'ai_action': ai_check.get('action', 'request_documents'),
-            'ai_confidence': ai_check.get('confidence', 0.5),
-            'ai_reasoning': ai_check.get('reasoning', ''),
-            'ai_recommendation': ai_check.get('recommendation', ''),
-            
-            # Risk Assessment
-            'risk_level': hybrid_result.get('risk_level', 'MEDIUM'),
-            'risk_factors': hybrid_result.get('reasons', []),
-            'key_risk_factors': ai_check.get('key_risk_factors', []),
-            'red_flags': ai_check.get('red_flags', []),
-            
-            # Recommendations
-            'follow_up_questions': ai_check.get('follow_up_questions', []),
-            'recommendations': ai_check.get('recommendations', []),
-            
-            # Status and Review
-            'status': 'Under Review',
-            'requires_review': ai_check.get('action', 'request_documents') in ['escalate_investigation', 'reject'],
-            'reviewed_at': None,
-            'review_notes': '',
-            'created_at': datetime.now(),
-            'updated_at': datetime.now(),
-            
-            # Technical details
-            'model_version': '1.0',
-            'analysis_method': 'hybrid_ml_ai'
-        }
+        analysis_doc = build_analysis_doc(analysis_id, claim_data, hybrid_result, ai_check, processing_time_ms)
         
         # Save to fraud_analyses collection
         doc_ref = db.collection('fraud_analyses').document(analysis_id)
-        doc_ref.set(analysis_doc)
+        with timed("persist"):
+            doc_ref.set(analysis_doc)
         
-        print(f"✅ Analysis saved to fraud_analyses: {analysis_id}")
+        logger.info("Analysis saved to fraud_analyses", extra={"saved_id": analysis_id})
         return analysis_id
         
     except Exception as e:
-        print(f"❌ Error saving to fraud_analyses: {e}")
+        logger.exception("Error saving to fraud_analyses")
         return None
 
+def update_claims(analysis_id, ai_check):
+    """
+    Copy the AI verdict onto the `claims` documents linked to this analysis
+    (analysis_id = the job id the upload page saved), so a claim never stays
+    PENDING because the browser left before the job finished.
+    """
+    db = get_firestore_client()
+    if not db:
+        return 0
+    try:
+        fields = claim_ai_fields(analysis_id, ai_check)
+        updated = 0
+        with timed("persist"):
+            for snapshot in db.collection('claims').where('analysis_id', '==', analysis_id).stream():
+                snapshot.reference.update(fields)
+                updated += 1
+        logger.info("AI verdict attached to claims", extra={"analysis_id": analysis_id, "claims": updated})
+        return updated
+    except Exception:
+        logger.exception("Error updating claims with the AI verdict")
+        return 0
+
 # ---------------- HYBRID ANALYSIS ----------------
+def parse_claim_frame(data):
+    """Turn a claim payload (JSON or form fields) into a one-row DataFrame for scoring"""
+    import pandas as pd
+    from claims_schema import API_NUMERIC_COLUMNS
+
+    # Convert to DataFrame
+    with timed("parse"):
+        df = pd.DataFrame([data])
+
+    with timed("coerce"):
+        # Convert numeric fields safely
+        numeric_fields = API_NUMERIC_COLUMNS
+        for col in numeric_fields:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+
+        # Ensure categorical columns are strings
+        for col in df.columns:
+            if col not in numeric_fields:
+                df[col] = df[col].astype(str).replace({"nan": None})
+    return df
+
+@profiled("hybrid_fraud_analysis")
 def hybrid_fraud_analysis(user_df):
     """
     Runs rule-based + ML-based hybrid fraud detection on a single claim
     and returns combined score.
     """
+    from logics import AutoInsuranceFraudDetector
+
     # --- Step 1: Rule-based analysis ---
-    detector = AutoInsuranceFraudDetector()
-    detector.load_data(user_df).run_full_analysis()
+    with timed("rules"):
+        detector = AutoInsuranceFraudDetector()
+        detector.load_data(user_df).run_full_analysis()
     rule_scores = detector.fraud_scores
 
     if len(rule_scores) > 0:
@@ -150,7 +230,8 @@ def hybrid_fraud_analysis(user_df):
         reasons = []
 
     # --- Step 2: CatBoost prediction ---
-    catboost_result = get_catboost_prediction(user_df)
+    with timed("catboost"):
+        catboost_result = get_catboost_prediction(user_df)
     catboost_prob = catboost_result.get("fraud_probability", 0.0)
 
     # --- Step 3: Combined weighted score ---
@@ -164,93 +245,267 @@ def hybrid_fraud_analysis(user_df):
         "catboost_result": catboost_result
     }
 
+def elapsed_ms(started):
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def complete_analysis(analysis_id, claim_details, claim_data, hybrid_result, started):
+    """
+    Slow phase of /api/predict, run as a background job: AI reasoning on top of
+    the instant hybrid score, then the fraud_analyses document and the verdict on
+    the linked `claims` documents. `started` is the
+    request's perf_counter start, so processing_time_ms covers the whole analysis
+    and the LLM call is bounded by the analysis deadline counted from it.
+    """
+    ai_check = analyze_claim_perplexity(claim_details, hybrid_result["catboost_result"],
+                                        reasons=hybrid_result["reasons"], deadline=Deadline(started=started),
+                                        fallback_score=hybrid_result["fraud_score"])
+    saved_id = save_to_fraud_analyses(claim_data, hybrid_result, ai_check, analysis_id=analysis_id,
+                                      processing_time_ms=elapsed_ms(started))
+    update_claims(analysis_id, ai_check)
+    return {
+        "hybrid_result": hybrid_result,
+        "ai_check": ai_check,
+        "analysis_id": saved_id,
+        "timestamp": datetime.now().isoformat()
+    }
+
+def idempotent_analysis_id(idempotency_key, user_id=None):
+    """
+    Analysis id derived from a client Idempotency-Key, so retries map to the
+    same fraud_analyses document. Scoped to the user: two users sending the
+    same key get different analyses.
+    """
+    scoped = f"{user_id or ''}\x00{idempotency_key}"
+    digest = hashlib.sha256(scoped.encode("utf-8")).hexdigest()
+    return f"ANALYSIS_{digest[:12].upper()}"
+
+def previous_submission(analysis_id):
+    """(response, status) for an analysis already accepted here or saved by any worker, else None"""
+    job = jobs.get(analysis_id)
+    if job and job.accepted:
+        return dict(job.accepted, status=job.status), 202
+    try:
+        db = get_firestore_client()
+        if db:
+            doc = db.collection('fraud_analyses').document(analysis_id).get()
+            if doc.exists:
+                return accepted_from_analysis_doc(analysis_id, doc.to_dict()), 202
+    except Exception as e:
+        # The deterministic id still keeps a re-run from creating a second document
+        logger.warning("Could not check for a previous analysis: %s", e)
+    return None
+
+def accept_claim(analysis_id, data, started):
+    """
+    Instant hybrid score for a claim; its AI reasoning and save continue as a
+    background job. Holds an admission slot until that job is done (raises
+    Rejected when none is free).
+    """
+    analyses.acquire()
+    job = None
+    # The analysis id doubles as the job id and tags every log record of this claim
+    try:
+        with correlation(analysis_id):
+            # ✅ STEP 1-2: Convert to DataFrame with numeric and string columns
+            df = parse_claim_frame(data)
+
+            # ✅ STEP 3: Run hybrid analysis (rules + CatBoost) and answer right away
+            result = hybrid_fraud_analysis(df)
+
+            # ✅ STEP 4-5: AI reasoning and the fraud_analyses save run in the background
+            # under the analysis id the document will be saved as; the job frees the slot
+            job = jobs.submit(analysis_id, analyses.run_then_release, complete_analysis,
+                              analysis_id, df.iloc[0].to_dict(), data, result, started)
+
+            # ✅ STEP 6: Prepare response with the job to poll for the AI verdict
+            response = {
+                "hybrid_result": result,
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/api/jobs/{job.id}",
+                "timestamp": datetime.now().isoformat()
+            }
+            job.accepted = response
+            log_payload(logger, "Response", response)
+        return response
+    finally:
+        if job is None:
+            analyses.release()
+
+def accepted_from_analysis_doc(analysis_id, doc):
+    """The /api/predict response of a finished analysis, same shape as when it was first accepted"""
+    job = job_from_analysis_doc(analysis_id, doc)
+    return {
+        "hybrid_result": job["result"]["hybrid_result"],
+        "job_id": analysis_id,
+        "status": job["status"],
+        "status_url": f"/api/jobs/{analysis_id}",
+        "timestamp": job["result"]["timestamp"]
+    }
+
+def job_from_analysis_doc(analysis_id, doc):
+    """Job status for a finished analysis read back from fraud_analyses"""
+    return {
+        "job_id": analysis_id,
+        "status": DONE,
+        "result": {
+            "hybrid_result": {
+                "fraud_score": doc.get('combined_score'),
+                "risk_level": doc.get('risk_level'),
+                "reasons": doc.get('risk_factors', []),
+                "catboost_result": {
+                    "fraud_prediction": doc.get('catboost_prediction'),
+                    "fraud_probability": doc.get('catboost_probability')
+                }
+            },
+            "ai_check": {
+                "fraud_score": doc.get('ai_fraud_score'),
+                "explanation": doc.get('ai_explanation'),
+                "action": doc.get('ai_action'),
+                "follow_up_questions": doc.get('follow_up_questions', []),
+                "degraded": doc.get('ai_degraded', False)
+            },
+            "analysis_id": analysis_id,
+            "timestamp": doc['analysis_timestamp'].isoformat() if doc.get('analysis_timestamp') else None
+        },
+        "error": None
+    }
+
+# ---------------- METRICS ----------------
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route,
+                                method=request.method, status=response.status_code)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Stage and request latency histograms in the Prometheus text format"""
+    return Response(render_prometheus(), content_type=CONTENT_TYPE)
+
 # ---------------- API ROUTE ----------------
 @app.route("/api/predict", methods=["POST"])
+@profiled("api.predict")
 def predict():
     try:
-        print(f"📩 Incoming request: {request.method} {request.content_type}")
+        logger.debug("Incoming request", extra={"method": request.method, "content_type": request.content_type})
 
         data = None
 
         if request.content_type and request.content_type.startswith("multipart/form-data"):
             # ✅ Handle FormData
             form_data = request.form.to_dict()
-            print("📩 FORM DATA RECEIVED:", form_data)
+            log_payload(logger, "Form data received", form_data)
 
             # Optional: handle uploaded file
             claim_image = request.files.get("claim_image")
             if claim_image:
-                upload_dir = "uploads"
-                os.makedirs(upload_dir, exist_ok=True)
-                file_path = os.path.join(upload_dir, claim_image.filename)
-                claim_image.save(file_path)
-                form_data["claim_image_path"] = file_path
+                # Copied from Werkzeug's spooled part into the content-addressed store (see upload_store.py)
+                stored = store_stream(claim_image.stream, claim_image.filename)
+                form_data["claim_image_path"] = stored.path
+                form_data["claim_image_sha256"] = stored.sha256
+                # Perceptual hash for the reused-photo rule, computed on the image_index pool
+                register_upload(stored.sha256, stored.path, form_data.get("policy_number", ""))
 
             data = form_data
 
         else:
             # ✅ Handle JSON request
             data = request.get_json(force=True, silent=True)
-            print("📩 JSON DATA RECEIVED:", data)
+            log_payload(logger, "JSON data received", data)
 
         if not data:
-            print("⚠️ No valid input data provided.")
+            logger.warning("No valid input data provided")
             return jsonify({"error": "No input data provided"}), 400
 
-        # Convert to DataFrame
-        df = pd.DataFrame([data])
-
-        # ✅ STEP 1: Convert numeric fields safely
-        numeric_fields = [
-            "months_as_customer", "age", "policy_deductable", "policy_annual_premium",
-            "umbrella_limit", "capital_gains", "capital_loss", "incident_hour_of_the_day",
-            "number_of_vehicles_involved", "bodily_injuries", "witnesses",
-            "total_claim_amount", "injury_claim", "property_claim", "vehicle_claim",
-            "auto_year",
-        ]
-        for col in numeric_fields:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-
-        # ✅ STEP 2: Ensure categorical columns are strings
-        for col in df.columns:
-            if col not in numeric_fields:
-                df[col] = df[col].astype(str).replace({"nan": None})
-
-        # ✅ STEP 3: Run hybrid analysis
-        result = hybrid_fraud_analysis(df)
-
-        # ✅ STEP 4: AI reasoning
-        phase1_check = analyze_claim_perplexity(
-            df.iloc[0].to_dict(),
-            result["catboost_result"]
-        )
-
-        # ✅ STEP 5: Save to fraud_analyses collection with user info
-        analysis_id = save_to_fraud_analyses(data, result, phase1_check)
+        # A retried request (same Idempotency-Key) gets the analysis it already started
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key:
+            analysis_id = idempotent_analysis_id(idempotency_key, data.get("user_id"))
+            previous = previous_submission(analysis_id)
+            if previous:
+                return jsonify(previous[0]), previous[1]
+            flight_key = analysis_id
+        else:
+            analysis_id = generate_analysis_id(data)
+            flight_key = payload_key(data)
+
+        try:
+            # Per-user token bucket, then a concurrency slot (see admission.py)
+            user_limits.acquire(data.get("user_id") or request.remote_addr)
+            # Identical requests arriving while this one is being scored share its analysis
+            response = submissions.do(flight_key, accept_claim, analysis_id, data, g.request_started)
+        except Rejected as e:
+            logger.warning("Request rejected by admission control: %s", e)
+            return jsonify({"error": str(e), "retry_after": e.retry_after_header}), 429, \
+                {"Retry-After": e.retry_after_header}
+        return jsonify(response), 202
+
+    except (RequestEntityTooLarge, UploadTooLarge) as e:
+        logger.warning("Upload rejected: %s", e)
+        return jsonify({"error": "Uploaded file is too large"}), 413
 
-        # ✅ STEP 6: Prepare response with analysis ID
-        response = {
-            "hybrid_result": result,
-            "ai_check": phase1_check,
-            "analysis_id": analysis_id,
-            "timestamp": datetime.now().isoformat()
-        }
+    except Exception as e:
+        logger.exception("Server error in /api/predict")
+        return jsonify({"error": str(e)}), 500
 
-        print("✅ RESPONSE:", response)
-        return jsonify(response)
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+@profiled("api.get_job")
+def get_job(job_id):
+    """Status of the background phase of a /api/predict call"""
+    job = jobs.get(job_id)
+    if job:
+        return jsonify(job.to_dict())
 
+    # Accepted by another worker process: once finished it is in fraud_analyses
+    try:
+        db = get_firestore_client()
+        if db:
+            doc = db.collection('fraud_analyses').document(job_id).get()
+            if doc.exists:
+                return jsonify(job_from_analysis_doc(job_id, doc.to_dict()))
     except Exception as e:
-        print("🔥 SERVER ERROR 🔥")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error retrieving job", extra={"job_id": job_id})
         return jsonify({"error": str(e)}), 500
 
+    # Jobs are per process: one still running on another worker is only found
+    # here once its document is saved (never without Firestore)
+    return jsonify({"error": "Job not found"}), 404
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Server-sent events stream that emits the job once it has finished"""
+    if not jobs.get(job_id):
+        return jsonify({"error": "Job not found"}), 404
+
+    def stream():
+        while True:
+            job = jobs.wait(job_id, timeout=SSE_KEEPALIVE_SECONDS)
+            if job is None:
+                return
+            if job.finished:
+                yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+            yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
+
 # ---------------- ADDITIONAL API ENDPOINTS ----------------
 @app.route("/api/analysis/<analysis_id>", methods=["GET"])
+@profiled("api.get_analysis")
 def get_analysis(analysis_id):
     """Get specific analysis result"""
     try:
+        db = get_firestore_client()
         if not db:
             return jsonify({"error": "Database not available"}), 503
             
@@ -260,21 +515,21 @@ def get_analysis(analysis_id):
         if doc.exists:
             analysis_data = doc.to_dict()
             # Convert timestamp to string if it exists
-            for date_field in ['analysis_timestamp', 'created_at', 'updated_at', 'reviewed_at']:
-                if date_field in analysis_data and analysis_data[date_field]:
-                    analysis_data[date_field] = analysis_data[date_field].isoformat()
+            serialize_dates(analysis_data)
             return jsonify(analysis_data)
         else:
             return jsonify({"error": "Analysis not found"}), 404
             
     except Exception as e:
-        print(f"❌ Error retrieving analysis: {e}")
+        logger.exception("Error retrieving analysis")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/high-risk-claims", methods=["GET"])
+@profiled("api.get_high_risk_claims")
 def get_high_risk_claims():
     """Get all high-risk claims"""
     try:
+        db = get_firestore_client()
         if not db:
             return jsonify({"error": "Database not available"}), 503
             
@@ -287,9 +542,7 @@ def get_high_risk_claims():
         high_risk_claims = []
         for doc in docs:
             data = doc.to_dict()
-            for date_field in ['analysis_timestamp', 'created_at', 'updated_at', 'reviewed_at']:
-                if date_field in data and data[date_field]:
-                    data[date_field] = data[date_field].isoformat()
+            serialize_dates(data)
             high_risk_claims.append(data)
         
         return jsonify({
@@ -299,16 +552,20 @@ def get_high_risk_claims():
         })
         
     except Exception as e:
-        print(f"❌ Error retrieving high-risk claims: {e}")
+        logger.exception("Error retrieving high-risk claims")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/fraud-analyses", methods=["GET"])
+@profiled("api.get_all_fraud_analyses")
 def get_all_fraud_analyses():
     """Get all fraud analyses for claims list"""
     try:
+        db = get_firestore_client()
         if not db:
             return jsonify({"error": "Database not available"}), 503
             
+        from firebase_admin import firestore
+
         analyses_ref = db.collection('fraud_analyses')
         docs = analyses_ref.order_by('created_at', direction=firestore.Query.DESCENDING).limit(100).stream()
         
@@ -318,9 +575,7 @@ def get_all_fraud_analyses():
             data['id'] = doc.id  # Add document ID
             
             # Convert timestamps to strings
-            for date_field in ['analysis_timestamp', 'created_at', 'updated_at', 'reviewed_at']:
-                if date_field in data and data[date_field]:
-                    data[date_field] = data[date_field].isoformat()
+            serialize_dates(data)
             
             analyses.append(data)
         
@@ -330,13 +585,15 @@ def get_all_fraud_analyses():
         })
         
     except Exception as e:
-        print(f"❌ Error retrieving fraud analyses: {e}")
+        logger.exception("Error retrieving fraud analyses")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/api/fraud-analyses/<analysis_id>/status", methods=["PUT"])
+@profiled("api.update_analysis_status")
 def update_analysis_status(analysis_id):
     """Update analysis status and review notes"""
     try:
+        db = get_firestore_client()
         if not db:
             return jsonify({"error": "Database not available"}), 503
             
@@ -364,7 +621,7 @@ def update_analysis_status(analysis_id):
         })
         
     except Exception as e:
-        print(f"❌ Error updating analysis status: {e}")
+        logger.exception("Error updating analysis status")
         return jsonify({"error": str(e)}), 500
 
 # ---------------- MAIN ----------------
@@ -0,0 +1,507 @@
+"""
+Async (ASGI) variant of the claim scoring API in combined.py.
+
+Same routes and response shapes, but LLM and Firestore calls are awaited
+instead of blocking a thread, and the CPU-bound rule + CatBoost scoring runs
+on a bounded thread pool, so one process keeps many claims in flight while
+they wait on the network.
+
+Serve with:
+    uvicorn combined_async:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import httpx
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Match, Route
+
+from combined import (SSE_KEEPALIVE_SECONDS, accepted_from_analysis_doc, build_analysis_doc, claim_ai_fields,
+                      elapsed_ms, generate_analysis_id, hybrid_fraud_analysis, idempotent_analysis_id,
+                      job_from_analysis_doc, parse_claim_frame, serialize_dates)
+from jobs import JobStore
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, render_prometheus, timed
+from perpbot import analyze_claim_perplexity_async
+from profiling import profiled
+from logs import correlation, get_logger, log_payload
+from resources import init_firebase
+from singleflight import AsyncSingleFlight, payload_key
+from resilience import Deadline
+from admission import AsyncConcurrencyLimiter, RateLimiter, Rejected
+from upload_store import MAX_REQUEST_BYTES, UploadTooLarge, store_stream
+from image_index import register_upload
+
+# ---------------- CONFIG ----------------
+SCORING_WORKERS = int(os.getenv("FRAUD_SCORING_WORKERS", os.cpu_count() or 1))
+LLM_MAX_CONNECTIONS = int(os.getenv("FRAUD_LLM_MAX_CONNECTIONS", 200))
+SSE_POLL_SECONDS = 0.2  # how often an events stream checks its job
+
+logger = get_logger(__name__)
+
+# Background phase of /api/predict runs as asyncio tasks; the store only tracks state
+jobs = JobStore()
+# Concurrent identical /api/predict calls (same payload or Idempotency-Key) share one analysis
+submissions = AsyncSingleFlight("predict")
+# Bounded concurrent analyses (held until the AI phase ends) and per-user rate limits
+analyses = AsyncConcurrencyLimiter("predict")
+user_limits = RateLimiter("predict_user")
+
+
+def _create_async_firestore_client():
+    """Async Firestore client, or None when Firebase is not configured."""
+    from firebase_admin import firestore_async
+
+    init_firebase()
+    try:
+        return firestore_async.client()
+    except Exception:
+        logger.warning("Firestore client not available")
+        return None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # One pooled HTTP client and Firestore client per process, created in the
+    # worker after startup (neither is fork-safe)
+    app.state.http = httpx.AsyncClient(limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS))
+    app.state.db = await asyncio.to_thread(_create_async_firestore_client)
+    app.state.scoring = ThreadPoolExecutor(max_workers=SCORING_WORKERS, thread_name_prefix="scoring")
+    app.state.tasks = set()
+    try:
+        yield
+    finally:
+        for task in app.state.tasks:
+            task.cancel()
+        await app.state.http.aclose()
+        app.state.scoring.shutdown(wait=False, cancel_futures=True)
+
+
+def score_claim(data):
+    """CPU-bound part of /api/predict: parse the payload and run the hybrid analysis."""
+    df = parse_claim_frame(data)
+    return df, hybrid_fraud_analysis(df)
+
+
+def limited_body(request, max_bytes=MAX_REQUEST_BYTES):
+    """
+    The request with a receive channel that raises UploadTooLarge once more
+    than max_bytes of body arrived, whatever Content-Length said: a chunked
+    multipart body is stopped before request.form() spools all of it.
+    """
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise UploadTooLarge(f"Request body exceeds {max_bytes} bytes")
+        return message
+
+    return Request(request.scope, receive)
+
+
+def save_upload(upload):
+    """Copy an uploaded claim image (Starlette's spooled part) into the content-addressed store (see upload_store.py)."""
+    return store_stream(upload.file, upload.filename)
+
+
+async def save_to_fraud_analyses(db, claim_data, hybrid_result, ai_check, analysis_id=None, processing_time_ms=0):
+    """Save detailed analysis results to fraud_analyses collection"""
+    if not db:
+        logger.warning("Database not available, skipping fraud_analyses save")
+        return None
+
+    try:
+        analysis_id = analysis_id or generate_analysis_id(claim_data)
+        analysis_doc = build_analysis_doc(analysis_id, claim_data, hybrid_result, ai_check, processing_time_ms)
+        with timed("persist"):
+            await db.collection('fraud_analyses').document(analysis_id).set(analysis_doc)
+
+        logger.info("Analysis saved to fraud_analyses", extra={"saved_id": analysis_id})
+        return analysis_id
+
+    except Exception as e:
+        logger.exception("Error saving to fraud_analyses")
+        return None
+
+
+async def update_claims(db, analysis_id, ai_check):
+    """Copy the AI verdict onto the `claims` documents linked to this analysis (see combined.update_claims)."""
+    if not db:
+        return 0
+    try:
+        fields = claim_ai_fields(analysis_id, ai_check)
+        updated = 0
+        with timed("persist"):
+            async for snapshot in db.collection('claims').where('analysis_id', '==', analysis_id).stream():
+                await snapshot.reference.update(fields)
+                updated += 1
+        logger.info("AI verdict attached to claims", extra={"analysis_id": analysis_id, "claims": updated})
+        return updated
+    except Exception:
+        logger.exception("Error updating claims with the AI verdict")
+        return 0
+
+
+async def complete_analysis(app, job, claim_details, claim_data, hybrid_result, started):
+    """Slow phase of /api/predict: AI reasoning, then the fraud_analyses document and the linked claims."""
+    job.start()
+    try:
+        ai_check = await analyze_claim_perplexity_async(app.state.http, claim_details, hybrid_result["catboost_result"],
+                                                        reasons=hybrid_result["reasons"],
+                                                        deadline=Deadline(started=started),
+                                                        fallback_score=hybrid_result["fraud_score"])
+        saved_id = await save_to_fraud_analyses(app.state.db, claim_data, hybrid_result, ai_check, analysis_id=job.id,
+                                                processing_time_ms=elapsed_ms(started))
+        await update_claims(app.state.db, job.id, ai_check)
+        job.finish({
+            "hybrid_result": hybrid_result,
+            "ai_check": ai_check,
+            "analysis_id": saved_id,
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.exception("Job failed", extra={"job_id": job.id})
+        job.fail(e)
+
+
+async def previous_submission(app, analysis_id):
+    """(response, status) for an analysis already accepted here or saved by any worker, else None."""
+    job = jobs.get(analysis_id)
+    if job and job.accepted:
+        return dict(job.accepted, status=job.status), 202
+    try:
+        if app.state.db:
+            doc = await app.state.db.collection('fraud_analyses').document(analysis_id).get()
+            if doc.exists:
+                return accepted_from_analysis_doc(analysis_id, doc.to_dict()), 202
+    except Exception as e:
+        # The deterministic id still keeps a re-run from creating a second document
+        logger.warning("Could not check for a previous analysis: %s", e)
+    return None
+
+
+async def accept_claim(app, analysis_id, data, started):
+    """
+    Instant hybrid score for a claim; its AI reasoning and save continue as a
+    background task, which holds an admission slot until it is done.
+    """
+    await analyses.acquire()
+    task = None
+    # The analysis id doubles as the job id and tags every log record of this claim
+    try:
+        with correlation(analysis_id):
+            # Executor threads don't inherit contextvars; run scoring in a copy of this context
+            loop = asyncio.get_running_loop()
+            df, result = await loop.run_in_executor(app.state.scoring, contextvars.copy_context().run,
+                                                    score_claim, data)
+
+            # AI reasoning and the save continue in the background under the analysis id
+            job = jobs.create(analysis_id)
+            task = asyncio.create_task(analyses.run_then_release(
+                complete_analysis, app, job, df.iloc[0].to_dict(), data, result, started))
+            app.state.tasks.add(task)
+            task.add_done_callback(app.state.tasks.discard)
+
+            response = {
+                "hybrid_result": result,
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/api/jobs/{job.id}",
+                "timestamp": datetime.now().isoformat()
+            }
+            job.accepted = response
+            log_payload(logger, "Response", response)
+        return response
+    finally:
+        if task is None:
+            analyses.release()
+
+
+# ---------------- API ROUTE ----------------
+@profiled("api.predict")
+async def predict(request):
+    started = time.perf_counter()
+    try:
+        content_type = request.headers.get("content-type", "")
+        logger.debug("Incoming request", extra={"method": request.method, "content_type": content_type})
+
+        if int(request.headers.get("content-length") or 0) > MAX_REQUEST_BYTES:
+            raise UploadTooLarge(f"Request body exceeds {MAX_REQUEST_BYTES} bytes")
+        # No or understated Content-Length (chunked bodies): count the bytes as they arrive
+        request = limited_body(request)
+
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            data = {k: v for k, v in form.items() if isinstance(v, str)}
+
+            # Optional: handle uploaded file
+            claim_image = form.get("claim_image")
+            if claim_image is not None and not isinstance(claim_image, str) and claim_image.filename:
+                stored = await run_in_threadpool(save_upload, claim_image)
+                data["claim_image_path"] = stored.path
+                data["claim_image_sha256"] = stored.sha256
+                # Perceptual hash for the reused-photo rule, computed on the image_index pool
+                register_upload(stored.sha256, stored.path, data.get("policy_number", ""))
+        else:
+            try:
+                data = await request.json()
+            except ValueError:
+                data = None
+
+        if not data:
+            logger.warning("No valid input data provided")
+            return JSONResponse({"error": "No input data provided"}, status_code=400)
+
+        log_payload(logger, "Claim data received", data)
+
+        # A retried request (same Idempotency-Key) gets the analysis it already started
+        idempotency_key = request.headers.get("idempotency-key")
+        if idempotency_key:
+            analysis_id = idempotent_analysis_id(idempotency_key, data.get("user_id"))
+            previous = await previous_submission(request.app, analysis_id)
+            if previous:
+                return JSONResponse(previous[0], status_code=previous[1])
+            flight_key = analysis_id
+        else:
+            analysis_id = generate_analysis_id(data)
+            flight_key = payload_key(data)
+
+        try:
+            # Per-user token bucket, then a concurrency slot (see admission.py)
+            user_limits.acquire(data.get("user_id") or (request.client.host if request.client else None))
+            # Identical requests arriving while this one is being scored share its analysis
+            response = await submissions.do(flight_key, accept_claim, request.app, analysis_id, data, started)
+        except Rejected as e:
+            logger.warning("Request rejected by admission control: %s", e)
+            return JSONResponse({"error": str(e), "retry_after": e.retry_after_header}, status_code=429,
+                                headers={"Retry-After": e.retry_after_header})
+        return JSONResponse(response, status_code=202)
+
+    except UploadTooLarge as e:
+        logger.warning("Upload rejected: %s", e)
+        return JSONResponse({"error": "Uploaded file is too large"}, status_code=413)
+
+    except Exception as e:
+        logger.exception("Server error in /api/predict")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@profiled("api.get_job")
+async def get_job(request):
+    """Status of the background phase of a /api/predict call"""
+    job_id = request.path_params["job_id"]
+    job = jobs.get(job_id)
+    if job:
+        return JSONResponse(job.to_dict())
+
+    # Accepted by another worker process: once finished it is in fraud_analyses
+    try:
+        db = request.app.state.db
+        if db:
+            doc = await db.collection('fraud_analyses').document(job_id).get()
+            if doc.exists:
+                return JSONResponse(job_from_analysis_doc(job_id, doc.to_dict()))
+    except Exception as e:
+        logger.exception("Error retrieving job", extra={"job_id": job_id})
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    return JSONResponse({"error": "Job not found"}, status_code=404)
+
+
+async def job_events(request):
+    """Server-sent events stream that emits the job once it has finished."""
+    job = jobs.get(request.path_params["job_id"])
+    if not job:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+
+    async def stream():
+        waited = 0.0
+        # Jobs finish on this event loop; checking their flag is cheaper than a thread per client
+        while not job.finished:
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            waited += SSE_POLL_SECONDS
+            if waited >= SSE_KEEPALIVE_SECONDS:
+                waited = 0.0
+                yield ": keep-alive\n\n"
+        yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+# ---------------- ADDITIONAL API ENDPOINTS ----------------
+@profiled("api.get_analysis")
+async def get_analysis(request):
+    """Get specific analysis result"""
+    analysis_id = request.path_params["analysis_id"]
+    try:
+        db = request.app.state.db
+        if not db:
+            return JSONResponse({"error": "Database not available"}, status_code=503)
+
+        doc = await db.collection('fraud_analyses').document(analysis_id).get()
+        if doc.exists:
+            return JSONResponse(serialize_dates(doc.to_dict()))
+        return JSONResponse({"error": "Analysis not found"}, status_code=404)
+
+    except Exception as e:
+        logger.exception("Error retrieving analysis")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@profiled("api.get_high_risk_claims")
+async def get_high_risk_claims(request):
+    """Get all high-risk claims"""
+    try:
+        db = request.app.state.db
+        if not db:
+            return JSONResponse({"error": "Database not available"}, status_code=503)
+
+        threshold = float(request.query_params.get('threshold', 70.0))
+        query = db.collection('fraud_analyses').where('combined_score', '>=', threshold).limit(50)
+        high_risk_claims = [serialize_dates(doc.to_dict()) async for doc in query.stream()]
+
+        return JSONResponse({
+            "high_risk_claims": high_risk_claims,
+            "count": len(high_risk_claims),
+            "threshold": threshold
+        })
+
+    except Exception as e:
+        logger.exception("Error retrieving high-risk claims")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@profiled("api.get_all_fraud_analyses")
+async def get_all_fraud_analyses(request):
+    """Get all fraud analyses for claims list"""
+    try:
+        db = request.app.state.db
+        if not db:
+            return JSONResponse({"error": "Database not available"}, status_code=503)
+
+        from firebase_admin import firestore_async
+
+        query = db.collection('fraud_analyses').order_by(
+            'created_at', direction=firestore_async.Query.DESCENDING).limit(100)
+        analyses = []
+        async for doc in query.stream():
+            data = doc.to_dict()
+            data['id'] = doc.id  # Add document ID
+            analyses.append(serialize_dates(data))
+
+        return JSONResponse({
+            "analyses": analyses,
+            "count": len(analyses)
+        })
+
+    except Exception as e:
+        logger.exception("Error retrieving fraud analyses")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@profiled("api.update_analysis_status")
+async def update_analysis_status(request):
+    """Update analysis status and review notes"""
+    analysis_id = request.path_params["analysis_id"]
+    try:
+        db = request.app.state.db
+        if not db:
+            return JSONResponse({"error": "Database not available"}, status_code=503)
+
+        data = await request.json()
+        new_status = data.get('status')
+        review_notes = data.get('review_notes', '')
+
+        if not new_status:
+            return JSONResponse({"error": "Status is required"}, status_code=400)
+
+        await db.collection('fraud_analyses').document(analysis_id).update({
+            'status': new_status,
+            'updated_at': datetime.now(),
+            'reviewed_at': datetime.now(),
+            'review_notes': review_notes
+        })
+
+        return JSONResponse({
+            "message": f"Analysis {analysis_id} status updated to {new_status}",
+            "analysis_id": analysis_id,
+            "status": new_status
+        })
+
+    except Exception as e:
+        logger.exception("Error updating analysis status")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def prometheus_metrics(request):
+    """Stage and request latency histograms in the Prometheus text format"""
+    return Response(render_prometheus(), headers={"content-type": CONTENT_TYPE})
+
+
+routes = [
+    Route("/metrics", prometheus_metrics, methods=["GET"]),
+    Route("/api/predict", predict, methods=["POST"]),
+    Route("/api/jobs/{job_id}", get_job, methods=["GET"]),
+    Route("/api/jobs/{job_id}/events", job_events, methods=["GET"]),
+    Route("/api/analysis/{analysis_id}", get_analysis, methods=["GET"]),
+    Route("/api/high-risk-claims", get_high_risk_claims, methods=["GET"]),
+    Route("/api/fraud-analyses", get_all_fraud_analyses, methods=["GET"]),
+    Route("/api/fraud-analyses/{analysis_id}/status", update_analysis_status, methods=["PUT"]),
+]
+
+
+
+def route_template(scope):
+    """Path template of the matching route, so ids don't explode metric labels."""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class RequestTimingMiddleware:
+    """Record REQUEST_SECONDS for every HTTP request (pure ASGI, streams untouched)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route=route_template(scope),
+                                    method=scope["method"], status=status["code"])
+
+
+app = Starlette(routes=routes, lifespan=lifespan, middleware=[Middleware(RequestTimingMiddleware)])
+
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=5000)
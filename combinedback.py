@@ -1,17 +1,29 @@
-
 import os
 
-from logics import AutoInsuranceFraudDetector  # your first system
-from perpbotback import get_catboost_prediction, analyze_claim_perplexity
+from perpbotback import get_catboost_prediction, analyze_claim_perplexity, analyze_claims_batch
+from logs import get_logger
+from singleflight import payload_key
+from resilience import Deadline
+from profiling import profiled
 
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
-if not PERPLEXITY_API_KEY:
-    raise ValueError("❌ Missing PERPLEXITY_API_KEY. Please set it in your environment.")
+# Claims packed into one phase-1 LLM request by run_batch_analysis (1 = one request per claim)
+LLM_BATCH_SIZE = int(os.getenv("FRAUD_LLM_BATCH_SIZE", 1))
+
+logger = get_logger(__name__)
+
 
+def require_api_key():
+    """Return the Perplexity API key, failing only when an analysis actually needs it."""
+    if not PERPLEXITY_API_KEY:
+        raise ValueError("❌ Missing PERPLEXITY_API_KEY. Please set it in your environment.")
+    return PERPLEXITY_API_KEY
 
-def hybrid_fraud_analysis(claim_df, rule_scores):
+
+def claim_evidence(claim_df, rule_scores):
+    """Steps 1-3: rule score, CatBoost prediction and combined score of one claim."""
     # --- Step 1: Rule-based score (precomputed for all claims) ---
-    cid = claim_df.iloc[0]["policy_number"]
+    cid = claim_df.iloc[0]["claim_id"]
     rule_result = rule_scores.get(cid, {"score": 0})
     rule_score = rule_result["score"]
 
@@ -22,20 +34,43 @@ def hybrid_fraud_analysis(claim_df, rule_scores):
     # --- Step 3: Combine scores ---
     combined_score = (0.6 * (rule_score / 100) + 0.4 * catboost_prob) * 100
 
-    # --- Step 4: Phase 1 → Call Perplexity for reasoning ---
-    claim_details = claim_df.iloc[0].to_dict()
     evidence = {
         "rule_based_score": rule_score,
         "catboost_result": catboost_result,
         "combined_score": combined_score
     }
+    return claim_df.iloc[0].to_dict(), evidence, rule_result.get("reasons", [])
+
 
-    ai_result = analyze_claim_perplexity(
-        claim_details=claim_details,
-        catboost_result=evidence,
-        extra_docs=None,
-        api_key=PERPLEXITY_API_KEY
-    )
+@profiled("hybrid_fraud_analysis")
+def hybrid_fraud_analysis(claim_df, rule_scores, deadline=None):
+    """Hybrid + AI analysis of one claim, finished (possibly degraded) within deadline."""
+    deadline = deadline or Deadline()
+    claim_details, evidence, reasons = claim_evidence(claim_df, rule_scores)
+    return ai_analysis(claim_details, evidence, reasons, deadline=deadline)
+
+
+def ai_analysis(claim_details, evidence, reasons, ai_result=None, deadline=None):
+    """
+    Steps 4-6; ai_result is a phase-1 verdict already obtained in a batched request.
+    Both LLM calls share `deadline`; past it, or while the LLM circuit is open,
+    the verdict is degraded to the rule + CatBoost score.
+    """
+    api_key = require_api_key()
+    deadline = deadline or Deadline()
+    fallback_score = round(evidence["combined_score"], 2)
+
+    # --- Step 4: Phase 1 → Call Perplexity for reasoning ---
+    if ai_result is None:
+        ai_result = analyze_claim_perplexity(
+            claim_details=claim_details,
+            catboost_result=evidence,
+            extra_docs=None,
+            api_key=api_key,
+            reasons=reasons,
+            deadline=deadline,
+            fallback_score=fallback_score
+        )
 
     # --- Step 5: Handle AI requesting extra documents ---
     import base64, os
@@ -63,32 +98,81 @@ def hybrid_fraud_analysis(claim_df, rule_scores):
             claim_details=claim_details,
             catboost_result=evidence,
             extra_docs=extra_docs,
-            api_key=PERPLEXITY_API_KEY
+            api_key=api_key,
+            reasons=reasons,
+            deadline=deadline,
+            fallback_score=fallback_score
         )
 
         ai_result["follow_up_questions"] = []
-        ai_result["action"] = "final_decision"
+        if not ai_result.get("degraded"):
+            ai_result["action"] = "final_decision"
 
     # --- Step 6: Sync fraud_score ---
-    ai_result["fraud_score"] = round(combined_score, 2)
+    ai_result["fraud_score"] = fallback_score
 
     return ai_result
 
 
-def run_batch_analysis(user_data):
+def run_batch_analysis(user_data, batch_size=None):
+    from logics import AutoInsuranceFraudDetector  # your first system
+
+    batch_size = batch_size or LLM_BATCH_SIZE
+
+    # Repeated identical claims are analysed once; the copies reuse the first result
+    keys = [payload_key(row) for row in user_data.to_dict("records")]
+
+    # Same claim ids as AutoInsuranceFraudDetector.load_data assigns, to look up rule scores
+    if 'claim_id' not in user_data.columns:
+        user_data = user_data.assign(claim_id='CLAIM_' + user_data.index.astype(str).str.zfill(6))
+
     # --- Step A: Run rule-based analysis on ALL claims once ---
     detector = AutoInsuranceFraudDetector()
     detector.load_data(user_data).run_full_analysis()
-    rule_scores = detector.fraud_scores  # dict keyed by policy_number
+    rule_scores = detector.fraud_scores  # dict keyed by claim_id
+    analysed = {}
+
+    def reused(i):
+        return dict(analysed[keys[i]], claim_index=i)
 
     # --- Step B: AI analysis per-claim ---
-    results = []
-    for i in range(len(user_data)):
-        claim_df = user_data.iloc[[i]]
-        result = hybrid_fraud_analysis(claim_df, rule_scores)
-        result["claim_index"] = i
-        ## immediate output
-        yield result  # allows streaming instead of waiting
+    if batch_size <= 1:
+        for i in range(len(user_data)):
+            if keys[i] in analysed:
+                yield reused(i)
+                continue
+            claim_df = user_data.iloc[[i]]
+            result = hybrid_fraud_analysis(claim_df, rule_scores)
+            result["claim_index"] = i
+            analysed[keys[i]] = result
+            ## immediate output
+            yield result  # allows streaming instead of waiting
+        return
+
+    # --- Step B (batched): phase 1 for batch_size claims per LLM request ---
+    # Claims whose verdict is missing or malformed in the answer get their own request
+    for start in range(0, len(user_data), batch_size):
+        chunk = range(start, min(start + batch_size, len(user_data)))
+        first = {}
+        for i in chunk:
+            if keys[i] not in analysed:
+                first.setdefault(keys[i], i)
+        claims = [(i, *claim_evidence(user_data.iloc[[i]], rule_scores)) for i in first.values()]
+        verdicts = analyze_claims_batch(claims, api_key=require_api_key(), deadline=Deadline()) if claims else {}
+        if len(verdicts) < len(claims):
+            logger.info("Batched AI verdicts incomplete, falling back to single requests",
+                        extra={"batch": len(claims), "valid": len(verdicts)})
+
+        prepared = {claim[0]: claim for claim in claims}
+        for i in chunk:
+            if i not in prepared:
+                yield reused(i)
+                continue
+            _, claim_details, evidence, reasons = prepared[i]
+            result = ai_analysis(claim_details, evidence, reasons, ai_result=verdicts.get(i))
+            result["claim_index"] = i
+            analysed[keys[i]] = result
+            yield result
 
 
 if __name__ == "__main__":
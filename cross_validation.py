@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from train import DATA_PATH, build_model, load_training_data
+
+# ---------------- CONFIG ----------------
+N_FOLDS = 5
+EARLY_STOPPING_FRACTION = 0.15  # share of each training fold held out for early stopping
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_fold(fold, train_idx, valid_idx, params, thread_count, path=DATA_PATH):
+    """
+    Train one fold in a fresh worker process. The dataset comes from the
+    memory-mapped cache, so every fold reads the same shared pages instead of
+    receiving a pickled copy. Early stopping uses a slice of the training fold,
+    never the scored fold.
+    """
+    start = time.perf_counter()
+    X, y, categorical_features = load_training_data(path)
+
+    fit_idx, stop_idx = train_test_split(train_idx, test_size=EARLY_STOPPING_FRACTION,
+                                         stratify=y[train_idx], random_state=42)
+    model = build_model(categorical_features, thread_count=thread_count, verbose=False, **params)
+    model.fit(X.iloc[fit_idx], y[fit_idx], eval_set=(X.iloc[stop_idx], y[stop_idx]))
+
+    auc = roc_auc_score(y[valid_idx], model.predict_proba(X.iloc[valid_idx])[:, 1])
+    return {
+        "fold": fold,
+        "auc": float(auc),
+        "best_iteration": model.get_best_iteration(),
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def cross_validate(n_folds=N_FOLDS, n_jobs=None, params=None, path=DATA_PATH, seed=42):
+    """
+    Stratified k-fold CV with folds trained concurrently. Returns per-fold
+    results plus mean/stdev AUC.
+    """
+    params = params or {}
+    X, y, _ = load_training_data(path)
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, n_folds))
+    thread_count = max(1, (os.cpu_count() or 1) // n_jobs)
+
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    folds = list(splitter.split(X, y))
+    print(f"🔁 {n_folds}-fold CV: {n_jobs} folds in parallel, {thread_count} threads each")
+
+    # One process per fold (max_tasks_per_child=1) so ru_maxrss is that fold's peak
+    ctx = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=ctx, max_tasks_per_child=1) as executor:
+        futures = [
+            executor.submit(run_fold, i, train_idx, valid_idx, params, thread_count, path)
+            for i, (train_idx, valid_idx) in enumerate(folds)
+        ]
+        results = sorted((f.result() for f in futures), key=lambda r: r["fold"])
+    wall = time.perf_counter() - start
+
+    aucs = [r["auc"] for r in results]
+    summary = {
+        "folds": results,
+        "mean_auc": statistics.mean(aucs),
+        "stdev_auc": statistics.stdev(aucs) if len(aucs) > 1 else 0.0,
+        "wall_seconds": wall,
+    }
+
+    print("\nFold  AUC     Iter  Time(s)  PeakRSS(MB)")
+    for r in results:
+        print(f"{r['fold']:>4}  {r['auc']:.4f}  {r['best_iteration']:>4}  {r['seconds']:>7.1f}  {r['peak_rss_mb']:>11.1f}")
+    print(f"\nAUC: {summary['mean_auc']:.4f} ± {summary['stdev_auc']:.4f} (total wall time {wall:.1f}s)")
+    return summary
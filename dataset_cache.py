@@ -0,0 +1,147 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# ---------------- CONFIG ----------------
+# Cleaned datasets are stored one .npy file per column (categoricals as codes)
+# plus a manifest.json, so they can be opened with np.load(mmap_mode='r') and
+# the pages shared between every process reading the same cache entry.
+CACHE_DIR = os.getenv("FRAUD_CACHE_DIR", os.path.join(".cache", "datasets"))
+CACHE_FORMAT_VERSION = 1
+SOURCE_INDEX = "sources.json"  # size + mtime -> sha256 of source files already hashed
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """SHA-256 of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_sha256(path, cache_dir=None):
+    """
+    SHA-256 of a source file, re-hashed only when its size or mtime changed
+    (remembered in <cache_dir>/sources.json); multi-GB CSVs are not re-read on every run.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    index_path = os.path.join(cache_dir, SOURCE_INDEX)
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    entry = index.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = file_sha256(path)
+    index[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{index_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    return digest
+
+
+def code_version(functions):
+    """Short hash of the source of the functions/modules a recipe runs, so editing them invalidates the cache."""
+    h = hashlib.sha256()
+    for fn in functions:
+        try:
+            h.update(inspect.getsource(fn).encode("utf-8"))
+        except (OSError, TypeError):  # no source file (frozen build, REPL): fall back to the bytecode
+            h.update(fn.__code__.co_code)
+    return h.hexdigest()[:8]
+
+
+def cache_path(source_path, recipe, cache_dir=None, code=()):
+    """Cache entry directory for a source file + cleaning recipe (+ the recipe's code)."""
+    digest = source_sha256(source_path, cache_dir)[:16]
+    version = f"v{CACHE_FORMAT_VERSION}" + (f"-{code_version(code)}" if code else "")
+    name = f"{os.path.splitext(os.path.basename(source_path))[0]}-{recipe}-{version}-{digest}"
+    return os.path.join(cache_dir or CACHE_DIR, name)
+
+
+def save_frame(df, directory):
+    """Write df as per-column .npy files + manifest.json into directory."""
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        if s.dtype == object:
+            s = s.astype("category")
+        entry = {"name": col, "file": f"col_{i:04d}.npy"}
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            values = s.cat.codes.to_numpy()
+            entry["kind"] = "category"
+            entry["categories"] = s.cat.categories.tolist()
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            values = s.to_numpy(dtype="datetime64[ns]")
+            entry["kind"] = "datetime"
+        else:
+            values = s.to_numpy()
+            entry["kind"] = "numeric"
+        np.save(os.path.join(directory, entry["file"]), np.ascontiguousarray(values), allow_pickle=False)
+        columns.append(entry)
+
+    manifest = {"version": CACHE_FORMAT_VERSION, "rows": len(df), "columns": columns}
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+
+def load_frame(directory, mmap=True):
+    """Open a cached frame; with mmap=True the columns are read-only memory maps."""
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    mode = "r" if mmap else None
+    data = {}
+    for entry in manifest["columns"]:
+        values = np.load(os.path.join(directory, entry["file"]), mmap_mode=mode, allow_pickle=False)
+        if entry["kind"] == "category":
+            dtype = pd.CategoricalDtype(entry["categories"])
+            data[entry["name"]] = pd.Series(pd.Categorical.from_codes(values, dtype=dtype), copy=False)
+        else:
+            data[entry["name"]] = pd.Series(values, copy=False)
+    return pd.DataFrame(data, copy=False)
+
+
+def cached_frame(source_path, recipe, build_fn, cache_dir=None, mmap=True, code=()):
+    """
+    Return the cleaned frame for source_path, building it with build_fn() on a
+    cache miss. Entries are keyed by the source file hash, the recipe name and
+    the source of `code` (the functions/modules build_fn cleans with), so
+    editing the CSV, switching recipe or changing the cleaning code never
+    returns stale data.
+    """
+    directory = cache_path(source_path, recipe, cache_dir, code)
+    if os.path.exists(os.path.join(directory, "manifest.json")):
+        print(f"⚡ Loaded cached dataset: {directory}")
+        return load_frame(directory, mmap=mmap)
+
+    df = build_fn()
+
+    # Write to a private temp dir and rename, so concurrent builders never see partial entries
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    save_frame(df, tmp_dir)
+    try:
+        os.rename(tmp_dir, directory)
+        print(f"💾 Cached dataset: {directory}")
+    except OSError:
+        # Another process finished the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return load_frame(directory, mmap=mmap)
+
+
+def clear_cache(cache_dir=None):
+    """Delete every cached dataset."""
+    shutil.rmtree(cache_dir or CACHE_DIR, ignore_errors=True)
@@ -1,11 +1,54 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { motion } from "framer-motion";
 import axios from "axios";
 import { useNavigate } from "react-router-dom";
 import { db, auth } from "../firebase"; // Import Firebase
-import { collection, addDoc } from "firebase/firestore";
+import { collection, addDoc, doc, updateDoc } from "firebase/firestore";
 import { onAuthStateChanged } from "firebase/auth";
 
+const API_BASE = "http://127.0.0.1:5000";
+const JOB_POLL_INTERVAL_MS = 2000;
+const JOB_POLL_TIMEOUT_MS = 120000;
+
+// Poll the background AI analysis started by /api/predict until it finishes.
+// Jobs live in the worker process that accepted the claim: a poll answered by
+// another worker gets 404 until the analysis is saved, so keep polling.
+async function waitForJob(jobId) {
+  const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    try {
+      const res = await axios.get(`${API_BASE}/api/jobs/${jobId}`);
+      if (res.data.status === "done") return res.data.result;
+      if (res.data.status === "failed") throw new Error(res.data.error || "AI analysis failed");
+    } catch (err) {
+      if (err.response?.status !== 404) throw err;
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+  throw new Error("Timed out waiting for AI analysis");
+}
+
+// Copy the AI verdict onto the saved claim once the background job is done.
+// The job itself also updates every claim saved with its analysis_id, so a claim
+// does not stay PENDING if this tab closes first; this covers a job that finished
+// before the claim document was written.
+async function attachAiResult(claimId, jobId) {
+  try {
+    const result = await waitForJob(jobId);
+    await updateDoc(doc(db, "claims", claimId), {
+      analysis_id: result.analysis_id || jobId,
+      ai_action: result.ai_check?.action || "APPROVE",
+      ai_reasoning: result.ai_check?.reasoning || result.ai_check?.explanation || "",
+      ai_confidence_score: result.ai_check?.confidence_score || 0,
+      ai_red_flags: result.ai_check?.red_flags || [],
+      ai_recommendation: result.ai_check?.recommendation || "",
+      updated_at: new Date(),
+    });
+  } catch (err) {
+    console.error("AI analysis error:", err);
+  }
+}
+
 function ClaimUpload() {
   const navigate = useNavigate();
   const [currentUser, setCurrentUser] = useState(null);
@@ -54,6 +97,9 @@ function ClaimUpload() {
   });
 
   const [isSubmitting, setIsSubmitting] = useState(false);
+  // Reused when a failed submission is retried, so the backend returns the
+  // analysis it already started instead of creating a duplicate
+  const idempotencyKey = useRef(null);
 
   // Monitor authentication state
   useEffect(() => {
@@ -75,6 +121,7 @@ function ClaimUpload() {
 
   const handleChange = (e) => {
     const { name, value, files } = e.target;
+    idempotencyKey.current = null; // edited claim → new analysis
     setFormData({
       ...formData,
       [name]: files ? files[0] : value,
@@ -105,8 +152,15 @@ function ClaimUpload() {
       form.append("user_id", currentUser.uid);
       form.append("user_email", currentUser.email);
 
-      const res = await axios.post("http://127.0.0.1:5000/api/predict", form, {
-        headers: { "Content-Type": "multipart/form-data" },
+      // Returns the instant rule + CatBoost score; AI reasoning continues as a job
+      if (!idempotencyKey.current) {
+        idempotencyKey.current = crypto.randomUUID();
+      }
+      const res = await axios.post(`${API_BASE}/api/predict`, form, {
+        headers: {
+          "Content-Type": "multipart/form-data",
+          "Idempotency-Key": idempotencyKey.current,
+        },
       });
 
       // Step 2: Save to Firebase with ML results and user mapping
@@ -130,12 +184,13 @@ function ClaimUpload() {
         catboost_prediction: res.data.hybrid_result?.catboost_result?.prediction || "Not Fraud",
         catboost_confidence: res.data.hybrid_result?.catboost_result?.confidence || 0,
         
-        // AI Perplexity Analysis
-        ai_action: res.data.ai_check?.action || "APPROVE",
-        ai_reasoning: res.data.ai_check?.reasoning || "",
-        ai_confidence_score: res.data.ai_check?.confidence_score || 0,
-        ai_red_flags: res.data.ai_check?.red_flags || [],
-        ai_recommendation: res.data.ai_check?.recommendation || "",
+        // AI Perplexity Analysis (filled in by attachAiResult when the job finishes)
+        analysis_id: res.data.job_id,
+        ai_action: "PENDING",
+        ai_reasoning: "",
+        ai_confidence_score: 0,
+        ai_red_flags: [],
+        ai_recommendation: "",
         
         // Metadata
         created_at: new Date(),
@@ -146,6 +201,9 @@ function ClaimUpload() {
       const docRef = await addDoc(collection(db, "claims"), claimData);
       console.log("Claim saved with ID: ", docRef.id);
 
+      // Not awaited: the user moves on while the AI analysis completes
+      attachAiResult(docRef.id, res.data.job_id);
+
       // Step 3: Navigate to success page with results
       navigate("/claim-success", { 
         state: { 
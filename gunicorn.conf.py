@@ -0,0 +1,56 @@
+# Gunicorn configuration for the claim scoring API:
+#     gunicorn combined:app
+#
+# With FRAUD_PRELOAD_MODELS=1 (default) the CatBoost model and heavy libraries are
+# loaded once in the master and shared copy-on-write by every forked worker.
+# With FRAUD_PRELOAD_MODELS=0 each worker loads its own copy after forking.
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("FRAUD_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("FRAUD_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("FRAUD_THREADS", 4))
+timeout = int(os.getenv("FRAUD_WORKER_TIMEOUT", 120))
+
+PRELOAD_MODELS = os.getenv("FRAUD_PRELOAD_MODELS", "1") == "1"
+preload_app = PRELOAD_MODELS
+
+# Workers share one port, so /metrics sums every worker's values through this
+# directory (see metrics.py); a fresh one per master unless FRAUD_METRICS_DIR is set
+OWN_METRICS_DIR = "FRAUD_METRICS_DIR" not in os.environ
+if OWN_METRICS_DIR:
+    os.environ["FRAUD_METRICS_DIR"] = tempfile.mkdtemp(prefix="fraud-metrics-")
+
+
+def on_starting(server):
+    if PRELOAD_MODELS:
+        from resources import preload
+        preload()
+        server.log.info("Models preloaded in master (pid %s)", os.getpid())
+
+
+def post_fork(server, worker):
+    # Drop anything network-related that may have been created before the fork
+    from resources import firestore_client, http_session
+    firestore_client.reset()
+    http_session.reset()
+
+
+def post_worker_init(worker):
+    if not PRELOAD_MODELS:
+        from resources import get_catboost_model
+        get_catboost_model()
+        worker.log.info("Model loaded in worker (pid %s)", os.getpid())
+
+
+def child_exit(server, worker):
+    # Keep the exited worker's counters in the /metrics totals
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if OWN_METRICS_DIR:
+        shutil.rmtree(os.environ["FRAUD_METRICS_DIR"], ignore_errors=True)
@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+from logs import get_logger
+from metrics import timed
+from resources import Lazy
+
+logger = get_logger(__name__)
+
+# ---------------- CONFIG ----------------
+IMAGE_INDEX_PATH = os.getenv("FRAUD_IMAGE_INDEX", os.path.join("uploads", "image_index.jsonl"))
+MATCH_DISTANCE = int(os.getenv("FRAUD_IMAGE_MATCH_DISTANCE", 6))  # max differing bits of a "same photo"
+HASH_WORKERS = int(os.getenv("FRAUD_IMAGE_HASH_WORKERS", 2))
+FINGERPRINT_TIMEOUT_SECONDS = 5.0  # scoring waits at most this long for a pending fingerprint
+MAX_FINGERPRINTS = 10_000  # finished fingerprint futures kept for reuse
+HASH_BITS = 64
+CHUNKS = 4  # multi-index: 4 tables keyed by 16-bit slices of the hash
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+# ---------------- PERCEPTUAL IMAGE INDEX ----------------
+# Each uploaded claim photo gets a 64-bit difference hash (dHash): resized,
+# re-encoded, lightly cropped or recoloured copies of one photo stay within a
+# few bits of each other. Hashes are computed once per stored file (keyed by
+# its sha256, see upload_store.py) on a small thread pool at upload time.
+#
+# Lookups use multi-index hashing: two hashes within MATCH_DISTANCE bits agree
+# to within MATCH_DISTANCE // 4 bits on at least one of the four 16-bit
+# slices, so a query probes a handful of buckets per slice and checks the
+# full distance only for those candidates, instead of scanning every image.
+# The index is an append-only JSON-lines file shared by all worker processes;
+# each process picks up lines appended by the others before searching.
+
+
+def dhash(path):
+    """64-bit difference hash of an image file (needs Pillow)."""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.draft("L", (64, 64))  # JPEGs decode straight to a small greyscale image
+        small = img.convert("L").resize((9, 8), Image.LANCZOS)
+        pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def _probe_masks(radius):
+    """XOR masks of every CHUNK_BITS-bit value within `radius` bits of a slice."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            masks.append(mask)
+    return masks
+
+
+class ImageIndex:
+    """Perceptual hashes of claim photos with the claims they were sent with."""
+
+    def __init__(self, path=IMAGE_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offset = 0  # bytes of the file already loaded
+        self._hashes, self._shas, self._claims = [], [], []
+        self._seen = set()  # (sha256, claim) pairs already indexed
+        self._tables = [{} for _ in range(CHUNKS)]
+        self._masks = {}
+        with self._lock:
+            self._refresh()
+        logger.info("Image index loaded", extra={"path": path, "images": len(self)})
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _refresh(self):
+        # Caller holds self._lock
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a line still being written is read next time
+        for line in data[:end].splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                self._insert(entry["sha256"], int(entry["dhash"], 16), entry["claim"])
+        self._offset += end
+
+    def _insert(self, sha256, value, claim):
+        if (sha256, claim) in self._seen:
+            return
+        self._seen.add((sha256, claim))
+        position = len(self._hashes)
+        self._hashes.append(value)
+        self._shas.append(sha256)
+        self._claims.append(claim)
+        for i, table in enumerate(self._tables):
+            table.setdefault((value >> (i * CHUNK_BITS)) & CHUNK_MASK, []).append(position)
+
+    def add(self, sha256, value, claim):
+        """Record that claim came with the image (sha256, dHash value)."""
+        with self._lock:
+            self._refresh()
+            if (sha256, claim) in self._seen:
+                return
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                line = json.dumps({"sha256": sha256, "dhash": f"{value:016x}", "claim": claim}) + "\n"
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                self._refresh()
+            else:
+                self._insert(sha256, value, claim)
+
+    def search(self, value, max_distance=MATCH_DISTANCE, exclude_claim=None):
+        """Indexed images within max_distance bits, nearest first, as dicts (sha256, claim, distance)."""
+        radius = max_distance // CHUNKS
+        if radius not in self._masks:
+            self._masks[radius] = _probe_masks(radius)
+        with self._lock:
+            self._refresh()
+            candidates = set()
+            for i, table in enumerate(self._tables):
+                chunk = (value >> (i * CHUNK_BITS)) & CHUNK_MASK
+                for mask in self._masks[radius]:
+                    candidates.update(table.get(chunk ^ mask, ()))
+            matches = []
+            for position in candidates:
+                if exclude_claim is not None and self._claims[position] == exclude_claim:
+                    continue
+                distance = hamming(value, self._hashes[position])
+                if distance <= max_distance:
+                    matches.append({"sha256": self._shas[position], "claim": self._claims[position],
+                                    "distance": distance})
+        return sorted(matches, key=lambda m: m["distance"])
+
+
+image_index = Lazy(ImageIndex)
+_pool = Lazy(lambda: ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="imagehash"))
+_fingerprints = {}  # sha256 -> Future of its dHash, so each stored file is decoded once
+_fingerprints_lock = threading.Lock()
+
+
+def claim_ref(value):
+    """Claim reference as stored in the index (policy numbers may arrive as str, int or float)."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _fingerprint(path):
+    with timed("image_hash"):
+        return dhash(path)
+
+
+def fingerprint(sha256, path):
+    """Future of the dHash of a stored upload; started on the pool at most once per sha256."""
+    with _fingerprints_lock:
+        future = _fingerprints.get(sha256)
+        if future is None:
+            if len(_fingerprints) >= MAX_FINGERPRINTS:
+                for key in [k for k, f in _fingerprints.items() if f.done()]:
+                    del _fingerprints[key]
+            future = _fingerprints[sha256] = _pool.get().submit(_fingerprint, path)
+    return future
+
+
+def register_upload(sha256, path, claim):
+    """Fingerprint a newly stored upload in the background and add it to the index under the claim."""
+    def index(future):
+        try:
+            image_index.get().add(sha256, future.result(), claim_ref(claim))
+        except Exception as e:
+            logger.warning("Could not index uploaded image: %s", e, extra={"sha256": sha256})
+    fingerprint(sha256, path).add_done_callback(index)
+
+
+def find_reused(sha256, path, claim, max_distance=MATCH_DISTANCE):
+    """Earlier claims (other than this one) that sent the same or a near-identical photo."""
+    try:
+        value = fingerprint(sha256, path).result(timeout=FINGERPRINT_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning("Image fingerprint unavailable: %s", e, extra={"sha256": sha256})
+        return []
+    with timed("image_search"):
+        return image_index.get().search(value, max_distance, exclude_claim=claim_ref(claim))
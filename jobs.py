@@ -0,0 +1,132 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# ---------------- CONFIG ----------------
+JOB_WORKERS = int(os.getenv("FRAUD_JOB_WORKERS", 8))
+JOB_TTL_SECONDS = int(os.getenv("FRAUD_JOB_TTL", 3600))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# ---------------- BACKGROUND JOBS ----------------
+# The slow phase of a claim analysis (LLM reasoning + Firestore write) runs as a
+# job after /api/predict has already answered with the instant score. Jobs live
+# in memory in the process that accepted the request; finished jobs are dropped
+# after JOB_TTL_SECONDS.
+
+
+class Job:
+    """State of one background job; `done` is set once it has finished or failed."""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.accepted = None  # response the job was accepted with, replayed for idempotent retries
+        self.done = threading.Event()
+
+    def start(self):
+        self.status = RUNNING
+
+    def finish(self, result):
+        self.result = result
+        self.status = DONE
+        self.finished_at = time.time()
+        self.done.set()
+
+    def fail(self, error):
+        self.error = str(error)
+        self.status = FAILED
+        self.finished_at = time.time()
+        self.done.set()
+
+    @property
+    def finished(self):
+        return self.done.is_set()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobStore:
+    """Thread-safe in-memory job registry with its own worker pool."""
+
+    def __init__(self, workers=JOB_WORKERS, ttl=JOB_TTL_SECONDS):
+        self.workers = workers
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        # Created on first submit so a pre-fork master never starts threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        return self._executor
+
+    def create(self, job_id):
+        """Register a job whose work is driven by the caller (e.g. an asyncio task)."""
+        job = Job(job_id)
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        return job
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        """Register a job and run fn(*args, **kwargs) for it on the worker pool."""
+        job = self.create(job_id)
+        with self._lock:
+            executor = self._get_executor()
+        # Run in a copy of the caller's context so the job keeps its log correlation id
+        executor.submit(contextvars.copy_context().run, self._run, job, fn, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job, fn, args, kwargs):
+        job.start()
+        try:
+            job.finish(fn(*args, **kwargs))
+        except Exception as e:
+            logger.exception("Job failed", extra={"job_id": job.id})
+            job.fail(e)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes or timeout expires; returns the job (None if unknown)."""
+        job = self.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        expired = [jid for jid, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for jid in expired:
+            del self._jobs[jid]
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import threading
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# ---------------- CONFIG ----------------
+# live   - call the API (default)
+# record - call the API and append every successful response to the cassette
+# replay - answer from the cassette only; never touches the network
+LLM_MODE = os.getenv("FRAUD_LLM_MODE", "live").lower()
+LLM_CASSETTE = os.getenv("FRAUD_LLM_CASSETTE", "llm_cassette.jsonl")
+
+# ---------------- RECORD / REPLAY ----------------
+# A cassette is a JSON-lines file of {"key", "request", "response"} entries.
+# The key is a hash of the request body (model, messages, sampling params), so
+# a replayed run gets exactly the response recorded for the same prompt. The
+# stub server (llm_stub.py --cassette) can serve the same file over HTTP.
+
+
+def request_key(data):
+    """Stable key of a chat-completions request body."""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ReplayMiss(LookupError):
+    """No recorded response for a request in replay mode."""
+
+
+class Cassette:
+    """Recorded chat-completions responses keyed by request_key()."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._responses = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses[entry["key"]] = entry["response"]
+
+    def __len__(self):
+        return len(self._responses)
+
+    def get(self, data):
+        return self._responses.get(request_key(data))
+
+    def record(self, data, response):
+        key = request_key(data)
+        with self._lock:
+            self._responses[key] = response
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "request": data, "response": response}) + "\n")
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    global _cassette
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(LLM_CASSETTE)
+                logger.info("LLM %s mode, cassette %s (%d responses)", LLM_MODE, LLM_CASSETTE, len(_cassette))
+    return _cassette
+
+
+def replayed_response(data):
+    """The recorded response body in replay mode, None in live/record mode; raises ReplayMiss."""
+    if LLM_MODE != "replay":
+        return None
+    response = get_cassette().get(data)
+    if response is None:
+        raise ReplayMiss(f"no recorded LLM response for request {request_key(data)[:12]}")
+    return response
+
+
+def record_response(data, response):
+    """Store a live response body when recording."""
+    if LLM_MODE == "record":
+        get_cassette().record(data, response)
@@ -0,0 +1,230 @@
+"""
+Local stand-in for the Perplexity chat-completions API.
+
+Answers POST /chat/completions (and /v1/chat/completions) in the same wire
+format, so the scoring pipeline can be load-tested and benchmarked offline:
+  - latency: fixed --latency-ms plus uniform --jitter-ms per request
+  - errors: --error-rate of requests fail with --error-status, --rate-limit-rate
+    of them with 429 + Retry-After
+  - responses: recorded ones from --cassette (see llm_replay.py) when the
+    request matches, otherwise a canned verdict derived from the CatBoost
+    probability in the prompt (keyed by claim id for batched prompts;
+    --batch-drop-rate leaves some out)
+GET /stats returns request counters.
+
+Run:
+    python llm_stub.py --port 8089 --latency-ms 800 --jitter-ms 400 --error-rate 0.02
+    FRAUD_LLM_URL=http://127.0.0.1:8089/chat/completions python combined.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_replay import Cassette
+
+# ---------------- CANNED RESPONSES ----------------
+FOLLOW_UP_QUESTIONS = [
+    "Provide a photo of the damaged vehicle showing the number plate.",
+    "Provide the repair estimate or service invoice.",
+]
+
+
+def canned_verdict(evidence):
+    """Deterministic verdict for the prompt_builder evidence (claim, model, rules, docs)."""
+    model = evidence.get("model") or {}
+    # combinedback sends the hybrid evidence with the CatBoost result nested
+    probability = model.get("fraud_probability", (model.get("catboost_result") or {}).get("fraud_probability")) or 0.0
+    score = round(float(probability) * 100, 2)
+    has_docs = bool(evidence.get("docs"))
+    if score >= 70:
+        action, questions = "escalate_investigation", []
+    elif score < 30:
+        action, questions = "accept", []
+    elif has_docs:
+        action, questions = "accept", []
+    else:
+        action, questions = "request_documents", FOLLOW_UP_QUESTIONS
+    return {
+        "fraud_score": score,
+        "explanation": f"Stub verdict from CatBoost probability {probability:.3f}.",
+        "action": action,
+        "follow_up_questions": questions,
+    }
+
+
+def user_evidence(data):
+    """The JSON evidence from the last user message (plain string or list of content parts)."""
+    for message in reversed(data.get("messages", [])):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content")
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if part.get("type") == "text")
+        try:
+            return json.loads(content or "{}")
+        except ValueError:
+            return {}
+    return {}
+
+
+def completion(data, content):
+    """Wrap assistant content in a chat-completions response body."""
+    prompt_chars = sum(len(json.dumps(m.get("content"))) for m in data.get("messages", []))
+    return {
+        "id": f"stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": data.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (prompt_chars + len(content)) // 4,
+        },
+    }
+
+
+# ---------------- SERVER ----------------
+class StubConfig:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=500,
+                 rate_limit_rate=0.0, batch_drop_rate=0.0, cassette=None, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit_rate = rate_limit_rate
+        self.batch_drop_rate = batch_drop_rate
+        self.cassette = Cassette(cassette) if cassette else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "recorded": 0, "canned": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def draw(self):
+        """Latency in seconds and a uniform draw for error injection, under the lock (shared RNG)."""
+        with self.lock:
+            delay = (self.latency_ms + self.random.uniform(0, self.jitter_ms)) / 1000
+            return delay, self.random.random()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # set per server in make_server()
+
+    def log_message(self, format, *args):
+        pass  # keep load tests quiet
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.config.lock:
+                self.send_json(200, dict(self.config.stats))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if self.path.rstrip("/") not in ("/chat/completions", "/v1/chat/completions"):
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            self.send_json(400, {"error": {"message": "invalid JSON body"}})
+            return
+
+        config = self.config
+        config.count("requests")
+        delay, draw = config.draw()
+        time.sleep(delay)
+
+        if draw < config.rate_limit_rate:
+            config.count("rate_limited")
+            self.send_json(429, {"error": {"message": "rate limited (stub)"}}, {"Retry-After": "1"})
+            return
+        if draw < config.rate_limit_rate + config.error_rate:
+            config.count("errors")
+            self.send_json(config.error_status, {"error": {"message": "injected failure (stub)"}})
+            return
+
+        recorded = config.cassette.get(data) if config.cassette else None
+        if recorded is not None:
+            config.count("recorded")
+            self.send_json(200, recorded)
+            return
+        config.count("canned")
+        evidence = user_evidence(data)
+        if "claims" in evidence:
+            # Batched prompt: verdicts keyed by claim id, some dropped to exercise the fallback
+            answer = {claim.get("id"): canned_verdict(claim) for claim in evidence["claims"]
+                      if config.draw()[1] >= config.batch_drop_rate}
+        else:
+            answer = canned_verdict(evidence)
+        self.send_json(200, completion(data, json.dumps(answer)))
+
+
+def make_server(host="127.0.0.1", port=8089, **options):
+    """A ThreadingHTTPServer for the stub; port=0 picks a free port (see server.server_address)."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": StubConfig(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(host="127.0.0.1", port=0, **options):
+    """Start a stub server on a daemon thread; returns (server, chat-completions URL)."""
+    server = make_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/chat/completions"
+
+
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed delay per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra uniform random delay per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--batch-drop-rate", type=float, default=0.0,
+                        help="fraction of claims left out of batched (multi-claim) answers")
+    parser.add_argument("--cassette", help="serve recorded responses from this llm_replay cassette")
+    parser.add_argument("--seed", type=int, help="seed for latency/error draws (reproducible runs)")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                         error_rate=args.error_rate, error_status=args.error_status,
+                         rate_limit_rate=args.rate_limit_rate, batch_drop_rate=args.batch_drop_rate,
+                         cassette=args.cassette, seed=args.seed)
+    print(f"🤖 LLM stub listening on http://{args.host}:{args.port}/chat/completions")
+    if server.RequestHandlerClass.config.cassette is not None:
+        print(f"📼 Serving {len(server.RequestHandlerClass.config.cassette)} recorded responses from {args.cassette}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping LLM stub")
+        server.server_close()
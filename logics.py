@@ -1,12 +1,84 @@
+import os
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import IsolationForest
 from datetime import datetime, timedelta
 import warnings
+from claims_schema import compact_dtypes, read_claims_csv
+from metrics import timed
+from profiling import profiled
+from logs import get_logger
+from resources import Lazy
+
+logger = get_logger(__name__)
 
 warnings.filterwarnings('ignore')
 
+# ---------------- CONFIG ----------------
+OUTLIER_COLUMNS = ['total_claim_amount', 'months_as_customer', 'age', 'policy_annual_premium',
+                   'incident_hour_of_the_day', 'number_of_vehicles_involved']
+# Frames smaller than this (a single API claim...) are scored against an
+# IsolationForest fitted once on the reference claims instead of on themselves
+OUTLIER_MIN_CLAIMS = int(os.getenv("FRAUD_OUTLIER_MIN_CLAIMS", 50))
+# Frames smaller than this (single API claims, small batches) keep object
+# columns and full-width numbers: compacting them costs more than it saves
+COMPACT_MIN_ROWS = int(os.getenv("FRAUD_COMPACT_MIN_ROWS", 1000))
+REFERENCE_CLAIMS = os.getenv("FRAUD_REFERENCE_CLAIMS",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "insurance_claims.csv"))
+
+
+class OutlierModel:
+    """StandardScaler + IsolationForest fitted on the numeric claim columns of a frame."""
+
+    def __init__(self, df, columns=OUTLIER_COLUMNS, contamination=0.05):
+        # sklearn is only needed here; importing it lazily keeps `import logics` fast
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.ensemble import IsolationForest
+
+        self.columns = [c for c in columns if c in df.columns and pd.api.types.is_numeric_dtype(df[c])]
+        self.fit_labels = None
+        if not self.columns:
+            return
+        data = df[self.columns].astype(float)
+        self.medians = data.median()
+        self.scaler = StandardScaler()
+        scaled = self.scaler.fit_transform(data.fillna(self.medians))
+        self.forest = IsolationForest(contamination=contamination, random_state=42)
+        self.fit_labels = self.forest.fit_predict(scaled)
+
+    def predict(self, df):
+        """-1 for outliers, 1 for inliers; columns df lacks take the fitted medians."""
+        data = pd.DataFrame({c: pd.to_numeric(df[c], errors='coerce') if c in df.columns else float('nan')
+                             for c in self.columns}, index=df.index).astype(float)
+        return self.forest.predict(self.scaler.transform(data.fillna(self.medians)))
+
+
+def _fit_reference_outliers():
+    if not os.path.exists(REFERENCE_CLAIMS):
+        logger.warning("No reference claims at %s, outlier detection disabled for small frames", REFERENCE_CLAIMS)
+        return None
+    model = OutlierModel(read_claims_csv(REFERENCE_CLAIMS, na_values=['?']))
+    logger.info("Reference outlier model fitted", extra={"path": REFERENCE_CLAIMS, "columns": model.columns})
+    return model
+
+
+reference_outliers = Lazy(_fit_reference_outliers)
+
 class AutoInsuranceFraudDetector:
+    # Detectors in the order run_full_analysis applies them; scoring comes last
+    # because it reads every detector's flagged claims
+    PIPELINE = (
+        'detect_duplicate_claims',
+        'detect_suspicious_amounts',
+        'detect_excessive_frequency',
+        'detect_suspicious_patterns',
+        'detect_geographic_anomalies',
+        'detect_vehicle_age_anomalies',
+        'detect_outliers',
+        'detect_reused_images',
+        'detect_fraud_rings',
+        'detect_configured_rules',
+        'calculate_fraud_scores',
+    )
+
     def __init__(self):
             """Initialize the auto insurance fraud detection system"""
             self.df = None
@@ -20,19 +92,26 @@ class AutoInsuranceFraudDetector:
             self.frequency_months = 6
             self.high_risk_amount = None
 
-            # Average claim amounts by incident type (can still be domain-informed)
-            self.incident_avg_amounts = {
-                "Multi-vehicle Collision": 25000,
-                "Single Vehicle Collision": 15000,
-                "Vehicle Theft": 30000,
-                "Parked Car": 8000,
-                "Property Damage": 5000,
-                "Bodily Injury": 35000
-            }
+            # Rule expressions, weights, amount tables and risk levels (see rule_engine.py);
+            # None loads FRAUD_RULES (rules.json) once per process
+            self.rules = None
+
+            # Suspicious occupations, hobbies, locations, zips... (see watchlists.py);
+            # compiled once per process, None loads the files under FRAUD_WATCHLIST_DIR
+            self.watchlists = None
 
-            # Suspicious patterns
-            self.suspicious_occupations = ['unemployed', 'student', 'retired']
-            self.high_risk_hobbies = ['racing', 'extreme sports', 'motorcycling']
+            # Fraud rings: policies linked through shared entities (each key is one
+            # column or a combination of columns). Claims of one policy are one node,
+            # so a policyholder's repeat claims never form a ring on their own
+            self.ring_entities = [
+                ('insured_zip',),
+                ('incident_location',),
+                ('auto_make', 'auto_model', 'auto_year'),
+            ]
+            self.ring_min_shared = 2           # entities two policies must share to be linked
+            self.ring_max_entity_claims = 20   # values shared by more policies (common models...) don't link
+            self.ring_min_size = 3             # distinct policies in a flagged component
+            self.ring_min_density = 0.5        # share of its policy pairs linked directly
 
 
     def set_dynamic_thresholds(self):
@@ -62,19 +141,18 @@ class AutoInsuranceFraudDetector:
             # Duplicate threshold (usually 1 is fine)
             self.duplicate_threshold = 1
 
-            print(f"Dynamic thresholds set:")
-            print(f"- High risk amount: {self.high_risk_amount:.2f}")
-            print(f"- Amount threshold multiplier: {self.amount_threshold:.2f}")
-            print(f"- Frequency threshold: {self.frequency_threshold}")
+            logger.debug("Dynamic thresholds set", extra={
+                "high_risk_amount": float(self.high_risk_amount),
+                "amount_threshold": float(self.amount_threshold),
+                "frequency_threshold": float(self.frequency_threshold),
+            })
 
     def load_data(self, df):
             """Load claims data"""
-            self.df = df.copy()
-
-            # Convert dates safely
-            for col in ['incident_date', 'policy_bind_date']:
-                if col in self.df.columns:
-                    self.df[col] = pd.to_datetime(self.df[col], errors='coerce')
+            # Copy with schema dtypes (parsed numbers and dates; categories and
+            # downcast numerics only for frames large enough to benefit)
+            compact = len(df) >= COMPACT_MIN_ROWS
+            self.df = compact_dtypes(df, categorical=compact, downcast=compact)
 
             # Drop rows without incident_date (cannot analyze)
             self.df = self.df.dropna(subset=['incident_date'])
@@ -86,7 +164,7 @@ class AutoInsuranceFraudDetector:
             # 🔥 Set thresholds dynamically after data is loaded
             self.set_dynamic_thresholds()
 
-            print(f"Loaded {len(self.df)} claims")
+            logger.debug("Loaded claims", extra={"claims": len(self.df)})
             return self
 
     def detect_duplicate_claims(self):
@@ -106,31 +184,11 @@ class AutoInsuranceFraudDetector:
             'total_flagged': len(flagged),
             'risk_level': 'HIGH' if flagged else 'LOW'
         }
-        print(f"Duplicate claims detected: {len(flagged)}")
+        logger.debug("Detector finished", extra={"detector": "duplicate_claims", "flagged": len(flagged)})
         return flagged
 
     def detect_suspicious_amounts(self):
-        flagged = []
-        for idx, row in self.df.iterrows():
-            claim_amount = row.get('total_claim_amount', 0)
-            incident_type = row.get('incident_type', 'Unknown')
-            incident_severity = row.get('incident_severity', 'Unknown')
-
-            expected = self.incident_avg_amounts.get(incident_type, 20000)
-            severity_multiplier = {'Minor Damage':0.5, 'Major Damage':1.5, 'Total Loss':2.0}.get(incident_severity,1.0)
-            adjusted = expected * severity_multiplier
-
-            if claim_amount > adjusted * self.amount_threshold:
-                flagged.append(row['claim_id'])
-
-        self.fraud_results['suspicious_amounts'] = {
-            'method': 'Suspicious Amount Detection',
-            'flagged_claims': flagged,
-            'total_flagged': len(flagged),
-            'risk_level': 'HIGH' if flagged else 'LOW'
-        }
-        print(f"Suspicious amounts detected: {len(flagged)}")
-        return flagged
+        return self.apply_rule('suspicious_amounts')
 
     import pandas as pd
     from datetime import datetime
@@ -158,7 +216,7 @@ class AutoInsuranceFraudDetector:
                 "total_flagged": 0,
                 "risk_level": "LOW"
             }
-            print("Excessive frequency detected: 0 (no recent claims)")
+            logger.debug("Detector finished", extra={"detector": "excessive_frequency", "flagged": 0})
             return []
 
         # Always group by policy_number
@@ -179,163 +237,282 @@ class AutoInsuranceFraudDetector:
             "risk_level": "MEDIUM" if flagged else "LOW"
         }
 
-        print(f"Excessive frequency detected: {len(flagged)}")
+        logger.debug("Detector finished", extra={"detector": "excessive_frequency", "flagged": len(flagged)})
         return flagged
 
     def detect_suspicious_patterns(self):
-        flagged = []
-        for idx, row in self.df.iterrows():
-            reasons = []
-
-            if row.get('witnesses', 0)==0 and str(row.get('police_report_available','')).lower()=='no':
-                reasons.append("No witnesses & no police report")
+        from watchlists import watchlist_hits
 
-            hour = row.get('incident_hour_of_the_day',12)
-            if hour>=22 or hour<=4:
-                reasons.append("Late night incident")
+        df = self.df
+        # No witnesses & no police report, late night, high-value single vehicle (rules.json)
+        suspicious = self.rule_set().evaluate('suspicious_patterns', df, self.rule_context())
 
-            if row.get('number_of_vehicles_involved',2)==1 and row.get('total_claim_amount',0)>self.high_risk_amount:
-                reasons.append("High-value single vehicle incident")
+        # Occupation, hobby, location... watchlists, matched column-wise
+        hits = watchlist_hits(df, self.watchlists)
+        watchlist_reasons = {}
+        for name, flags in hits.items():
+            suspicious |= flags
+            for cid in df.loc[flags, 'claim_id']:
+                watchlist_reasons.setdefault(cid, []).append(name)
 
-            occ = str(row.get('insured_occupation','')).lower()
-            if any(o in occ for o in self.suspicious_occupations):
-                reasons.append("High-risk occupation")
-            hobby = str(row.get('insured_hobbies','')).lower()
-            if any(h in hobby for h in self.high_risk_hobbies):
-                reasons.append("High-risk hobby")
-
-            if reasons:
-                flagged.append(row['claim_id'])
+        flagged = df.loc[suspicious, 'claim_id'].tolist()
 
         self.fraud_results['suspicious_patterns'] = {
             'method': 'Suspicious Pattern Detection',
             'flagged_claims': flagged,
             'total_flagged': len(flagged),
+            'watchlist_hits': watchlist_reasons,
             'risk_level': 'MEDIUM' if flagged else 'LOW'
         }
-        print(f"Suspicious patterns detected: {len(flagged)}")
+        logger.debug("Detector finished", extra={"detector": "suspicious_patterns", "flagged": len(flagged)})
         return flagged
 
     def detect_geographic_anomalies(self):
-        flagged = []
-        for idx, row in self.df.iterrows():
-            if 'incident_state' in row and 'policy_state' in row:
-                if str(row['incident_state']).upper() != str(row['policy_state']).upper():
-                    flagged.append(row['claim_id'])
+        return self.apply_rule('geographic_anomalies')
+
+    def detect_vehicle_age_anomalies(self):
+        return self.apply_rule('vehicle_age_anomalies')
 
-        self.fraud_results['geographic_anomalies'] = {
-            'method': 'Geographic Anomaly Detection',
+    def detect_outliers(self):
+        if len(self.df) >= OUTLIER_MIN_CLAIMS:
+            # Outliers relative to the frame itself
+            preds = OutlierModel(self.df).fit_labels
+        else:
+            # Too few claims to fit on (a one-claim frame never flags itself): use the reference fit
+            model = reference_outliers.get()
+            preds = model.predict(self.df) if model is not None and model.columns else None
+        if preds is None:
+            self.fraud_results['statistical_outliers'] = {'flagged_claims':[],'total_flagged':0,'risk_level':'LOW'}
+            return []
+
+        flagged = self.df[preds==-1]['claim_id'].tolist()
+
+        self.fraud_results['statistical_outliers'] = {
+            'method':'Statistical Outlier Detection',
             'flagged_claims': flagged,
             'total_flagged': len(flagged),
-            'risk_level': 'MEDIUM' if flagged else 'LOW'
+            'risk_level':'MEDIUM' if flagged else 'LOW'
         }
-        print(f"Geographic anomalies detected: {len(flagged)}")
+        logger.debug("Detector finished", extra={"detector": "statistical_outliers", "flagged": len(flagged)})
         return flagged
 
-    def detect_vehicle_age_anomalies(self):
+    def detect_reused_images(self):
+        """Claims whose uploaded photo (or a near copy) was already sent with another policy."""
+        if 'claim_image_sha256' not in self.df.columns:
+            self.fraud_results['reused_images'] = {'flagged_claims': [], 'total_flagged': 0, 'risk_level': 'LOW'}
+            return []
+
+        from image_index import find_reused
+
         flagged = []
-        current_year = datetime.now().year
-        for idx,row in self.df.iterrows():
-            auto_year = row.get('auto_year',current_year)
-            claim_amount = row.get('total_claim_amount',0)
-            try:
-                age = current_year - int(auto_year)
-                if age>15 and claim_amount>30000:
-                    flagged.append(row['claim_id'])
-            except: continue
-
-        self.fraud_results['vehicle_age_anomalies'] = {
-            'method':'Vehicle Age Anomaly Detection',
+        matches = {}
+        for idx, row in self.df.iterrows():
+            sha256 = row.get('claim_image_sha256')
+            if pd.isna(sha256) or not sha256 or pd.isna(row.get('claim_image_path')):
+                continue
+            found = find_reused(str(sha256), str(row['claim_image_path']), row.get('policy_number', ''))
+            if found:
+                flagged.append(row['claim_id'])
+                matches[row['claim_id']] = found[:5]
+
+        self.fraud_results['reused_images'] = {
+            'method': 'Reused Image Detection',
             'flagged_claims': flagged,
             'total_flagged': len(flagged),
-            'risk_level':'MEDIUM' if flagged else 'LOW'
+            'matches': matches,
+            'risk_level': 'HIGH' if flagged else 'LOW'
         }
-        print(f"Vehicle age anomalies detected: {len(flagged)}")
+        logger.debug("Detector finished", extra={"detector": "reused_images", "flagged": len(flagged)})
         return flagged
 
-    def detect_outliers(self):
-        cols = ['total_claim_amount','months_as_customer','age','policy_annual_premium','incident_hour_of_the_day','number_of_vehicles_involved']
-        available_cols = [c for c in cols if c in self.df.columns and pd.api.types.is_numeric_dtype(self.df[c])]
-        if not available_cols:
-            self.fraud_results['statistical_outliers'] = {'flagged_claims':[],'total_flagged':0,'risk_level':'LOW'}
+    def detect_fraud_rings(self):
+        """
+        Link policies whose claims share at least ring_min_shared entities (zip,
+        location, vehicle) and flag the claims of dense connected components.
+        """
+        df = self.df
+        keys = [key for key in self.ring_entities if all(c in df.columns for c in key)]
+        if len(df) < self.ring_min_size or len(keys) < self.ring_min_shared:
+            self.fraud_results['fraud_rings'] = {'flagged_claims': [], 'total_flagged': 0, 'rings': [],
+                                                 'risk_level': 'LOW'}
             return []
 
-        data = self.df[available_cols].fillna(self.df[available_cols].median())
-        scaler = StandardScaler()
-        scaled = scaler.fit_transform(data)
+        import numpy as np
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        # Graph node per policy; a claim without policy number is a node of its own
+        if 'policy_number' in df.columns:
+            nodes = df.groupby('policy_number', observed=True, sort=False, dropna=True).ngroup().to_numpy()
+            missing = nodes < 0
+            nodes[missing] = nodes.max(initial=-1) + 1 + np.arange(missing.sum())
+        else:
+            nodes = np.arange(len(df))
+        n = int(nodes.max()) + 1
+
+        pairs = []
+        for key in keys:
+            # (entity, policy) memberships, one per policy however many of its claims share the entity
+            ids = df.groupby(list(key), observed=True, sort=False, dropna=True).ngroup().to_numpy()
+            valid = ids >= 0
+            members = np.unique(ids[valid].astype(np.int64) * n + nodes[valid])
+            entity, policy = members // n, members % n
+            # Hub values shared by too many policies are dropped
+            keep = np.bincount(entity)[entity] <= self.ring_max_entity_claims
+            entity, policy = entity[keep], policy[keep]
+            # Every pair of policies in a group (sorted by entity, then policy)
+            for offset in range(1, min(self.ring_max_entity_claims, len(policy))):
+                same = entity[offset:] == entity[:-offset]
+                if not same.any():
+                    break
+                pairs.append(policy[:-offset][same] * n + policy[offset:][same])
+
+        # A pair sharing entities under several keys was generated once per key
+        codes, shared = np.unique(np.concatenate(pairs) if pairs else np.empty(0, np.int64), return_counts=True)
+        strong = codes[shared >= self.ring_min_shared]
+        a, b = strong // n, strong % n
+        graph = coo_matrix((np.ones(len(strong), dtype=np.int8), (a, b)), shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+
+        # Component sizes and the share of member pairs linked directly
+        sizes = np.bincount(labels)
+        edges = np.bincount(labels[a], minlength=len(sizes))
+        possible = np.maximum(sizes * (sizes - 1) / 2, 1)
+        density = edges / possible
+        ring = (sizes >= self.ring_min_size) & (density >= self.ring_min_density)
+
+        claim_labels = labels[nodes]
+        claim_ids = df['claim_id'].to_numpy()
+        flagged = claim_ids[ring[claim_labels]].tolist()
+        # Largest rings first, then keep 100
+        largest = np.flatnonzero(ring)
+        largest = largest[np.argsort(-sizes[largest], kind='stable')][:100]
+        rings = [{'size': int(sizes[label]), 'density': round(float(density[label]), 2),
+                  'claims': claim_ids[claim_labels == label].tolist()}
+                 for label in largest]
+
+        linked = sizes[sizes > 1]
+        self.fraud_results['fraud_rings'] = {
+            'method': 'Fraud Ring Detection',
+            'flagged_claims': flagged,
+            'total_flagged': len(flagged),
+            'rings': rings,  # the 100 largest; size counts distinct policies
+            'linked_components': int(len(linked)),
+            'largest_component': int(linked.max()) if len(linked) else 1,
+            'risk_level': 'HIGH' if flagged else 'LOW'
+        }
+        logger.debug("Detector finished", extra={"detector": "fraud_rings", "flagged": len(flagged),
+                                                  "rings": int(ring.sum())})
+        return flagged
 
-        iso = IsolationForest(contamination=0.05, random_state=42)
-        preds = iso.fit_predict(scaled)
-        flagged = self.df[preds==-1]['claim_id'].tolist()
+    def rule_set(self):
+        if self.rules is None:
+            from rule_engine import rules
+            self.rules = rules.get()
+        return self.rules
+
+    def rule_context(self):
+        """Detector values rule expressions can use besides the claim columns."""
+        return {
+            'amount_threshold': self.amount_threshold,
+            'high_risk_amount': self.high_risk_amount,
+            'frequency_threshold': self.frequency_threshold,
+            'current_year': datetime.now().year,
+        }
 
-        self.fraud_results['statistical_outliers'] = {
-            'method':'Statistical Outlier Detection',
+    def apply_rule(self, name):
+        """Run a rules.json expression rule over the whole frame as a detector."""
+        rule = self.rule_set().rules[name]
+        matched = self.rule_set().evaluate(name, self.df, self.rule_context())
+        flagged = self.df.loc[matched, 'claim_id'].tolist()
+
+        self.fraud_results[name] = {
+            'method': rule.method,
             'flagged_claims': flagged,
             'total_flagged': len(flagged),
-            'risk_level':'MEDIUM' if flagged else 'LOW'
+            'risk_level': rule.risk_level if flagged else 'LOW'
         }
-        print(f"Statistical outliers detected: {len(flagged)}")
+        logger.debug("Detector finished", extra={"detector": name, "flagged": len(flagged)})
+        return flagged
+
+    def detect_configured_rules(self):
+        """Rules from rules.json that no detector above has applied (e.g. ones analysts added)."""
+        flagged = []
+        for name in self.rule_set().rules:
+            if name not in self.fraud_results:
+                flagged.extend(self.apply_rule(name))
         return flagged
 
     def calculate_fraud_scores(self):
-        scores = {}
-        for idx,row in self.df.iterrows():
-            cid = row['claim_id']
-            score = 0
-            reasons = []
-
-            for method, result in self.fraud_results.items():
-                if cid in result['flagged_claims']:
-                    if method=='duplicate_claims': score+=40; reasons.append('Duplicate claim')
-                    elif method=='suspicious_amounts': score+=35; reasons.append('Suspicious amount')
-                    elif method=='excessive_frequency': score+=25; reasons.append('Excessive frequency')
-                    elif method=='suspicious_patterns': score+=20; reasons.append('Suspicious pattern')
-                    elif method=='geographic_anomalies': score+=15; reasons.append('Geographic anomaly')
-                    elif method=='vehicle_age_anomalies': score+=15; reasons.append('Vehicle age anomaly')
-                    elif method=='statistical_outliers': score+=10; reasons.append('Statistical outlier')
-
-            if str(row.get('fraud_reported','')).lower()=='y':
-                score+=50; reasons.append('Previously flagged as fraud')
-
-            score = min(score,100)
-            if score>=70: level='HIGH'
-            elif score>=40: level='MEDIUM'
-            elif score>=20: level='LOW'
-            else: level='MINIMAL'
-
-            scores[cid]={'score':score,'risk_level':level,'reasons':reasons,'claim_amount':row.get('total_claim_amount',0),'incident_type':row.get('incident_type','Unknown')}
-
-        self.fraud_scores = scores
-        print(f"Fraud scores calculated for {len(scores)} claims")
-        return scores
+        import numpy as np
+
+        rule_set = self.rule_set()
+        claim_ids = self.df['claim_id'].to_numpy()
+        score = np.zeros(len(claim_ids))
+        reasons = [[] for _ in range(len(claim_ids))]
+
+        for method, result in self.fraud_results.items():
+            if method not in rule_set.weights or not result['flagged_claims']:
+                continue
+            points, reason = rule_set.weights[method]
+            hit = np.flatnonzero(self.df['claim_id'].isin(result['flagged_claims']).to_numpy())
+            score[hit] += points
+            for i in hit:
+                reasons[i].append(reason)
+
+        score = np.minimum(score, rule_set.max_score)
+        levels = rule_set.risk_levels(score)
+        amounts = self.df['total_claim_amount'].to_numpy() if 'total_claim_amount' in self.df.columns \
+            else np.zeros(len(claim_ids))
+        incident_types = self.df['incident_type'].to_numpy() if 'incident_type' in self.df.columns \
+            else np.full(len(claim_ids), 'Unknown')
+
+        self.fraud_scores = {
+            cid: {'score': int(s) if float(s).is_integer() else float(s), 'risk_level': str(level),
+                  'reasons': r, 'claim_amount': amount, 'incident_type': incident_type}
+            for cid, s, level, r, amount, incident_type
+            in zip(claim_ids, score, levels, reasons, amounts, incident_types)
+        }
+        logger.debug("Fraud scores calculated", extra={"claims": len(self.fraud_scores)})
+        return self.fraud_scores
 
+    @profiled("run_full_analysis")
     def run_full_analysis(self):
         if self.df is None: raise ValueError("No data loaded")
-        self.detect_duplicate_claims()
-        self.detect_suspicious_amounts()
-        self.detect_excessive_frequency()
-        self.detect_suspicious_patterns()
-        self.detect_geographic_anomalies()
-        self.detect_vehicle_age_anomalies()
-        self.detect_outliers()
-        self.calculate_fraud_scores()
-        print("Full analysis complete ✅")
+        for name in self.PIPELINE:
+            # Each detector is timed separately (metrics.STAGE_SECONDS, stage "rules.<name>")
+            with timed(f"rules.{name}"):
+                getattr(self, name)()
         return self
 
 # --- Main execution ---
 # --- Main execution ---
 if __name__ == "__main__":
+    import argparse
+    import profiling
+
+    parser = argparse.ArgumentParser(description="Run the rule-based fraud detectors on a claims CSV")
+    parser.add_argument("data", nargs="?", default="insurance_claims.csv")
+    parser.add_argument("--profile", action="store_true", help="write cProfile/tracemalloc reports (see profiling.py)")
+    parser.add_argument("--profile-dir", default=None)
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(args.profile_dir)
+
     try:
         # Load real dataset instead of generating sample
-        df = pd.read_csv("insurance_claims.csv")
-        print("✅ insurance_claims.csv loaded successfully!")
+        df = read_claims_csv(args.data, report=True)
+        print(f"✅ {args.data} loaded successfully!")
     except FileNotFoundError:
-        print("⚠️ insurance_claims.csv not found, falling back to sample data...")
+        print(f"⚠️ {args.data} not found, falling back to sample data...")
         # df = create_sample_auto_data()
 
     detector = AutoInsuranceFraudDetector()
     detector.load_data(df).run_full_analysis()
 
+    for method, result in detector.fraud_results.items():
+        print(f"{method}: {result['total_flagged']} flagged")
+
     # Show top 5 high-risk claims
     sorted_claims = sorted(detector.fraud_scores.items(), key=lambda x: x[1]['score'], reverse=True)
     print("\nTop 5 Suspicious Claims:")
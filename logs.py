@@ -0,0 +1,178 @@
+import atexit
+import contextvars
+import json
+import logging
+import math
+import os
+import queue
+import random
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# ---------------- CONFIG ----------------
+LOG_LEVEL = os.getenv("FRAUD_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("FRAUD_LOG_FORMAT", "json")  # json | text
+LOG_QUEUE_SIZE = int(os.getenv("FRAUD_LOG_QUEUE_SIZE", 10000))
+# Fraction of requests whose full payload/response is logged (all of them at DEBUG)
+PAYLOAD_SAMPLE_RATE = float(os.getenv("FRAUD_LOG_PAYLOAD_SAMPLE_RATE", 0.01))
+PAYLOAD_MAX_CHARS = 200  # long strings (AI explanations) are cut in payload logs
+
+# ---------------- STRUCTURED LOGGING ----------------
+# Loggers under the "fraud" namespace hand records to a bounded queue; a
+# background listener thread formats and writes them, so request threads never
+# wait on console I/O. When the queue is full records are dropped and counted.
+# Each record carries the analysis id bound with `correlation()`.
+
+analysis_id_var = contextvars.ContextVar("analysis_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "analysis_id"}
+
+
+@contextmanager
+def correlation(analysis_id):
+    """Tag log records emitted inside the block (and tasks/jobs it starts) with analysis_id."""
+    token = analysis_id_var.set(analysis_id)
+    try:
+        yield
+    finally:
+        analysis_id_var.reset(token)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, analysis_id and extras."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "analysis_id", None):
+            entry["analysis_id"] = record.analysis_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                # NaN/inf are not valid JSON
+                entry[key] = str(value) if isinstance(value, float) and not math.isfinite(value) else value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _CorrelationFilter(logging.Filter):
+    def filter(self, record):
+        record.analysis_id = analysis_id_var.get()
+        return True
+
+
+class _BackgroundHandler(QueueHandler):
+    """
+    QueueHandler whose listener thread starts with the first record in each
+    process, so importing is side-effect free and forked workers get their own.
+    """
+
+    def __init__(self, target):
+        super().__init__(queue.Queue(LOG_QUEUE_SIZE))
+        self.target = target
+        self.dropped = 0
+        self._listener = None
+        self._lock = threading.Lock()
+        self.addFilter(_CorrelationFilter())
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.flush_and_stop)
+
+    def _after_fork(self):
+        # The parent's listener thread does not exist in the child
+        self._lock = threading.Lock()
+        self._listener = None
+        self.queue = queue.Queue(LOG_QUEUE_SIZE)
+
+    def _start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                self._listener.start()
+
+    def prepare(self, record):
+        # Render message and traceback here: args and exc_info may not be safe to format later
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if self._listener is None:
+            self._start()
+        super().emit(record)
+
+    def flush_and_stop(self):
+        """Write out queued records (called at exit)."""
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+
+
+_handler = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level=None, fmt=None):
+    """Configure the "fraud" logger once per process; returns the queue handler."""
+    global _handler
+    with _setup_lock:
+        if _handler is None:
+            target = logging.StreamHandler()
+            if (fmt or LOG_FORMAT) == "json":
+                target.setFormatter(JsonFormatter())
+            else:
+                target.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(analysis_id)s] %(message)s"))
+            _handler = _BackgroundHandler(target)
+
+            root = logging.getLogger("fraud")
+            root.addHandler(_handler)
+            root.setLevel(level or LOG_LEVEL)
+            root.propagate = False
+    return _handler
+
+
+def get_logger(name):
+    """Logger for a module, under the "fraud" namespace."""
+    setup_logging()
+    return logging.getLogger(f"fraud.{name}")
+
+
+def _truncate(value):
+    if isinstance(value, str):
+        return value if len(value) <= PAYLOAD_MAX_CHARS else value[:PAYLOAD_MAX_CHARS] + "…"
+    if isinstance(value, dict):
+        return {k: _truncate(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_truncate(v) for v in value]
+    return value
+
+
+def log_payload(logger, message, payload, level=logging.INFO):
+    """Log a large payload for a PAYLOAD_SAMPLE_RATE sample of calls (every call at DEBUG)."""
+    if not logger.isEnabledFor(level):
+        return
+    if not logger.isEnabledFor(logging.DEBUG) and random.random() >= PAYLOAD_SAMPLE_RATE:
+        return
+    logger.log(level, message, extra={"payload": _truncate(payload)})
+
+
+def dropped_records():
+    """Records discarded because the log queue was full."""
+    return _handler.dropped if _handler else 0
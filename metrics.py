@@ -0,0 +1,339 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# ---------------- CONFIG ----------------
+# Upper bounds in seconds; spans sub-millisecond detectors up to slow LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Estimated input tokens per LLM request
+TOKEN_BUCKETS = (100, 200, 300, 400, 600, 800, 1200, 1600, 2400, 3200, 6400)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Directory shared by the worker processes of one server (gunicorn.conf.py sets
+# it); unset, /metrics reports the serving process only
+MULTIPROCESS_DIR = os.getenv("FRAUD_METRICS_DIR")
+FLUSH_SECONDS = float(os.getenv("FRAUD_METRICS_FLUSH_SECONDS", 1.0))
+ARCHIVE = "archive.json"  # counters and histograms of exited workers
+
+# ---------------- METRICS ----------------
+# Minimal in-process metrics (histograms, gauges, counters) rendered in the
+# Prometheus text format on /metrics.
+# Gunicorn workers share one port, so each scrape is answered by whichever
+# worker accepts it. With FRAUD_METRICS_DIR set every process writes its values
+# to <dir>/<pid>.json every FLUSH_SECONDS and /metrics sums the files of all
+# workers, so counters never go backwards between scrapes. When a worker exits
+# (gunicorn child_exit hook) its counters and histograms are folded into
+# <dir>/archive.json and its gauges dropped. Other workers' values lag by up to
+# FLUSH_SECONDS.
+
+_families = []
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+class Histogram:
+    """Labelled histogram (latency by default) with cumulative buckets, sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """{labels: [per-bucket counts, sum, count]} copy of this process's values."""
+        with self._lock:
+            return {key: [list(s[0]), s[1], s[2]] for key, s in self._series.items()}
+
+    @staticmethod
+    def merge(into, series):
+        for key, (counts, total, count) in series.items():
+            current = into.setdefault(key, [[0] * len(counts), 0.0, 0])
+            current[0] = [a + b for a, b in zip(current[0], counts)]
+            current[1] += total
+            current[2] += count
+
+    def reset(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def samples(self, data=None):
+        """{labels: (cumulative bucket counts, sum, count)} of data (default: this process)."""
+        snapshot = self.snapshot() if data is None else data
+        result = {}
+        for key, (counts, total, count) in snapshot.items():
+            cumulative, running = [], 0
+            for c in counts:
+                running += c
+                cumulative.append(running)
+            result[key] = (cumulative, total, count)
+        return result
+
+    def render(self, data=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (cumulative, total, count) in sorted(self.samples(data).items()):
+            for bound, value in zip(self.buckets + ("+Inf",), cumulative):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {value}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Gauge:
+    """Labelled value that goes up and down (queue depth, calls in flight)."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, "")) for name in self.labelnames)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(into, values):
+        for key, value in values.items():
+            into[key] = into.get(key, 0) + value
+
+    def reset(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self, data=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted((self.snapshot() if data is None else data).items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Counter(Gauge):
+    """Labelled monotonically increasing count."""
+
+    kind = "counter"
+
+    def dec(self, amount=1, **labels):
+        raise ValueError("counters only go up")
+
+
+def gauge(name, help_text, labelnames=()):
+    metric = Gauge(name, help_text, labelnames)
+    _families.append(metric)
+    return metric
+
+
+def counter(name, help_text, labelnames=()):
+    metric = Counter(name, help_text, labelnames)
+    _families.append(metric)
+    return metric
+
+
+def histogram(name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+    """Create and register a histogram so it appears on /metrics."""
+    metric = Histogram(name, help_text, labelnames, buckets)
+    _families.append(metric)
+    return metric
+
+
+STAGE_SECONDS = histogram(
+    "fraud_stage_duration_seconds",
+    "Time spent in each stage of a claim analysis.",
+    ["stage"],
+)
+REQUEST_SECONDS = histogram(
+    "fraud_http_request_duration_seconds",
+    "HTTP request latency by route, method and status.",
+    ["route", "method", "status"],
+)
+PROMPT_TOKENS = histogram(
+    "fraud_llm_prompt_tokens",
+    "Estimated input tokens (system + user message) per LLM request.",
+    buckets=TOKEN_BUCKETS,
+)
+
+ADMISSION_IN_FLIGHT = gauge(
+    "fraud_admission_in_flight",
+    "Admitted requests whose work has not finished yet.",
+    ["limiter"],
+)
+ADMISSION_QUEUE_DEPTH = gauge(
+    "fraud_admission_queue_depth",
+    "Requests waiting for an admission slot.",
+    ["limiter"],
+)
+ADMISSION_REJECTED = counter(
+    "fraud_admission_rejected_total",
+    "Requests answered 429 by admission control.",
+    ["limiter", "reason"],
+)
+UPLOADS = counter(
+    "fraud_uploads_total",
+    "Claim image uploads by outcome (stored, deduplicated, too_large).",
+    ["outcome"],
+)
+
+
+@contextmanager
+def timed(stage):
+    """Record the wall time of the block in STAGE_SECONDS under `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def _dump(snapshots, path):
+    """Write {family name: {labels: value}} atomically (label tuples become JSON lists)."""
+    data = {name: [[[list(pair) for pair in key], value] for key, value in values.items()]
+            for name, values in snapshots.items()}
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {name: {tuple(tuple(pair) for pair in key): value for key, value in values}
+            for name, values in data.items()}
+
+
+def _merge_files(paths, kinds=None):
+    families = {metric.name: metric for metric in _families}
+    merged = {}
+    for path in paths:
+        for name, values in _load(path).items():
+            metric = families.get(name)
+            if metric is not None and (kinds is None or metric.kind in kinds):
+                metric.merge(merged.setdefault(name, {}), values)
+    return merged
+
+
+class _DirectoryLock:
+    """flock on <dir>/.lock: shared while reading the files, exclusive while archiving."""
+
+    def __init__(self, directory, exclusive=False):
+        self.path = os.path.join(directory, ".lock")
+        self.exclusive = exclusive
+
+    def __enter__(self):
+        import fcntl
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()  # releases the lock
+
+
+def flush():
+    """Write this process's values to <FRAUD_METRICS_DIR>/<pid>.json."""
+    if MULTIPROCESS_DIR:
+        os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+        _dump({metric.name: metric.snapshot() for metric in _families},
+              os.path.join(MULTIPROCESS_DIR, f"{os.getpid()}.json"))
+
+
+def mark_process_dead(pid, directory=None):
+    """Fold an exited worker's counters and histograms into archive.json; its gauges are dropped."""
+    directory = directory or MULTIPROCESS_DIR
+    path = os.path.join(directory or "", f"{pid}.json")
+    if not directory or not os.path.exists(path):
+        return
+    archive = os.path.join(directory, ARCHIVE)
+    with _DirectoryLock(directory, exclusive=True):
+        _dump(_merge_files([archive, path], kinds=("counter", "histogram")), archive)
+        os.remove(path)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception:
+            pass  # metrics must never take the worker down; the next flush retries
+
+
+def _start_flusher():
+    threading.Thread(target=_flush_forever, name="metrics-flush", daemon=True).start()
+
+
+def _after_fork():
+    # A forked worker starts from zero (the parent's values are in the parent's file)
+    # with fresh locks, archives a file left by a dead process with the same pid,
+    # and flushes from its own thread
+    for metric in _families:
+        metric.reset()
+    mark_process_dead(os.getpid())
+    _start_flusher()
+
+
+if MULTIPROCESS_DIR:
+    _start_flusher()
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def render_prometheus():
+    """All registered metrics in the Prometheus text exposition format."""
+    merged = {}
+    if MULTIPROCESS_DIR:
+        flush()
+        with _DirectoryLock(MULTIPROCESS_DIR):
+            merged = _merge_files(sorted(glob.glob(os.path.join(MULTIPROCESS_DIR, "*.json"))))
+    lines = []
+    for metric in _families:
+        lines.extend(metric.render(merged.get(metric.name, {}) if MULTIPROCESS_DIR else None))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,47 @@
+import os
+import joblib
+
+# ---------------- CONFIG ----------------
+MODEL_DIR = os.getenv("FRAUD_MODEL_DIR", "models")
+CBM_PATH = os.path.join(MODEL_DIR, "catboost_model.cbm")
+PKL_PATH = os.path.join(MODEL_DIR, "catboost_model.pkl")
+ONNX_PATH = os.path.join(MODEL_DIR, "catboost_model.onnx")
+CATEGORICAL_FEATURES_PATH = os.path.join(MODEL_DIR, "categorical_features.pkl")
+
+
+def export_model(catboost_model, onnx=False):
+    """
+    Save the model in CatBoost's native .cbm format (and optionally ONNX) next
+    to the pickle. Returns the list of written paths.
+    """
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    catboost_model.save_model(CBM_PATH, format="cbm")
+    written = [CBM_PATH]
+
+    if onnx:
+        if catboost_model.get_cat_feature_indices():
+            # CatBoost's ONNX-ML exporter rejects models with categorical features
+            print("⚠️ ONNX export skipped: CatBoost cannot export categorical features to ONNX")
+        else:
+            catboost_model.save_model(ONNX_PATH, format="onnx")
+            written.append(ONNX_PATH)
+    return written
+
+
+def load_catboost_model(prefer="cbm"):
+    """
+    Load the inference model and its categorical feature names.
+
+    The native .cbm file is used when present (no pickle, no training-time Python
+    objects); otherwise the joblib pickle written by older training runs.
+    """
+    if prefer == "cbm" and os.path.exists(CBM_PATH):
+        from catboost import CatBoostClassifier
+        model = CatBoostClassifier()
+        model.load_model(CBM_PATH, format="cbm")
+        categorical_features = [model.feature_names_[i] for i in model.get_cat_feature_indices()]
+        return model, categorical_features
+
+    model = joblib.load(PKL_PATH)
+    categorical_features = joblib.load(CATEGORICAL_FEATURES_PATH)
+    return model, categorical_features
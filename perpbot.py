@@ -1,23 +1,40 @@
-import pandas as pd
-import joblib
 import json
-import requests
 import os
 from dotenv import load_dotenv
+from resources import get_catboost_model, get_http_session
+from llm_replay import record_response, replayed_response, request_key
+from singleflight import AsyncSingleFlight, SingleFlight
+from resilience import CircuitOpen, DeadlineExceeded, llm_breaker
+from logs import get_logger
+from prompt_builder import build_prompt
+from metrics import timed
+from profiling import profiled
 
 # ---------------- CONFIG ----------------
 LOW_THRESHOLD = 10    # Skip final check if fraud_score <= LOW_THRESHOLD
 HIGH_THRESHOLD = 70   # If fraud_score >= HIGH_THRESHOLD, remove follow-up questions
 load_dotenv()
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
+logger = get_logger(__name__)
 
 # ---------------- LOAD MODELS ----------------
-catboost_model = joblib.load("models/catboost_model.pkl")
-categorical_features = joblib.load("models/categorical_features.pkl")
+# Loaded lazily on first prediction (native .cbm when available, pickle otherwise)
+def __getattr__(name):
+    """Keep module.catboost_model / module.categorical_features working without loading at import."""
+    if name == "catboost_model":
+        return get_catboost_model()[0]
+    if name == "categorical_features":
+        return get_catboost_model()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ---------------- HELPER FUNCTIONS ----------------
+@profiled("preprocess_input")
 def preprocess_input(user_df):
     """Safe preprocessing for CatBoost input."""
+    import pandas as pd
+    from claims_schema import fill_categorical
+    catboost_model, categorical_features = get_catboost_model()
+
     df = user_df.copy()
 
     # Ensure all model features exist
@@ -31,7 +48,7 @@ def preprocess_input(user_df):
     # Fill categorical columns with 'Unknown' and ensure string type
     for col in categorical_features:
         if col in df.columns:
-            df[col] = df[col].fillna('Unknown').astype(str)
+            df[col] = fill_categorical(df[col], 'Unknown').astype(str)
 
     # Fill numeric columns with median safely
     numeric_cols = [col for col in df.columns if col not in categorical_features]
@@ -46,77 +63,153 @@ def preprocess_input(user_df):
 
 def get_catboost_prediction(user_df):
     """Return fraud prediction and probability from CatBoost."""
-    X_processed = preprocess_input(user_df)
-    prob = catboost_model.predict_proba(X_processed)[:, 1][0]  # probability of fraud
+    with timed("catboost.preprocess"):
+        X_processed = preprocess_input(user_df)
+    catboost_model, _ = get_catboost_model()
+    with timed("catboost.predict"):
+        prob = catboost_model.predict_proba(X_processed)[:, 1][0]  # probability of fraud
     pred = 'y' if prob >= 0.5 else 'n'
     return {"fraud_prediction": pred, "fraud_probability": float(prob)}
 
-def analyze_claim_perplexity(claim_details, catboost_result, extra_docs=None):
-    """Call Perplexity AI for fraud analysis (without CNN)."""
-    system_prompt = """
-You are an expert insurance fraud investigation assistant.
-
-You receive:
-- Claim details (reported by user)
-- CatBoost fraud prediction
-- Extra documents (photos, FIR, receipts, etc.)
-
-Your tasks:
-1. Decide if current information is enough to conclude fraud analysis.
-   - If enough → give fraud_score (0-100), explanation, and action.
-   - If not enough → set action = "request_documents" and ask for at most two specific, useful extra proofs.
-2. Extra questions must directly help conclude the claim’s validity.
-3. After extra documents are provided, always give the FINAL fraud score and action.
-4. Fraud score scale: 0 = clearly genuine, 100 = very likely fraud.
-
-Output strictly in JSON with this schema:
-{
-  "fraud_score": number or null,
-  "explanation": string,
-  "action": one of ["accept", "request_documents", "escalate_investigation", "reject"],
-  "follow_up_questions": [ up to 2 short strings ]
-}
-""" 
-    print(PERPLEXITY_API_KEY)
-    evidence = {
-        "CLAIM_DETAILS": claim_details,
-        "CATBOOST_RESULT": catboost_result,
-        "EXTRA_DOCUMENTS": extra_docs or {}
-    }
+# Point FRAUD_LLM_URL at llm_stub.py (e.g. http://127.0.0.1:8089/chat/completions) to run offline
+PERPLEXITY_API_URL = os.getenv("FRAUD_LLM_URL", "https://api.perplexity.ai/chat/completions")
+LLM_TIMEOUT = 60  # seconds
+
+def build_perplexity_request(claim_details, catboost_result, extra_docs=None, reasons=None):
+    """Headers and JSON payload for the Perplexity chat-completions call (compact prompt, see prompt_builder)."""
+    prompt = build_prompt(claim_details, catboost_result, reasons=reasons, extra_docs=extra_docs)
 
-    url = "https://api.perplexity.ai/chat/completions"
     headers = {
         "Authorization": f"Bearer {PERPLEXITY_API_KEY}",
         "Content-Type": "application/json"
     }
     data = {
         "model": "sonar",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": json.dumps(evidence)}
-        ],
+        "messages": prompt.messages(),
         "temperature": 0.0,
         "max_tokens": 600
     }
+    return headers, data
 
-    try:
-        resp = requests.post(url, headers=headers, data=json.dumps(data), timeout=60)
+def parse_perplexity_response(result):
+    """Extract the JSON verdict from a chat-completions response body."""
+    content = result.get("choices", [])[0].get("message", {}).get("content")
+    if not content:
+        raise ValueError("No assistant content returned")
+    return json.loads(content)
+
+# User-facing explanation per degraded_reason; the exception itself (URLs,
+# ports, response bodies) only goes to the log
+DEGRADED_EXPLANATIONS = {
+    "circuit_open": "AI analysis is temporarily unavailable",
+    "deadline_exceeded": "AI analysis did not finish in time",
+    "llm_error": "AI analysis failed",
+}
+
+def degraded_reason(error):
+    if isinstance(error, CircuitOpen):
+        return "circuit_open"
+    if isinstance(error, DeadlineExceeded):
+        return "deadline_exceeded"
+    return "llm_error"
+
+def ai_failure_result(error):
+    """Verdict used when the AI call fails: escalate to a human."""
+    return {
+        "fraud_score": None,
+        "explanation": f"{DEGRADED_EXPLANATIONS[degraded_reason(error)]}; escalated for manual review.",
+        "action": "escalate_investigation",
+        "follow_up_questions": []
+    }
+
+def degraded_result(fraud_score, error):
+    """
+    Verdict from the rule + CatBoost score alone, for when the LLM was skipped
+    (circuit open, deadline exhausted) or failed. Marked degraded; only clearly
+    low scores are accepted, everything else goes to a human.
+    """
+    reason = degraded_reason(error)
+    return {
+        "fraud_score": fraud_score,
+        "explanation": f"{DEGRADED_EXPLANATIONS[reason]}; verdict based on rule and CatBoost scores only.",
+        "action": "accept" if fraud_score <= LOW_THRESHOLD else "escalate_investigation",
+        "follow_up_questions": [],
+        "degraded": True,
+        "degraded_reason": reason
+    }
+
+def unavailable_result(error, fallback_score=None):
+    logger.warning("AI verdict unavailable: %s", error,
+                   extra={"degraded_reason": degraded_reason(error), "error_type": type(error).__name__})
+    if fallback_score is None:
+        return ai_failure_result(error)
+    return degraded_result(fallback_score, error)
+
+llm_calls = SingleFlight("llm")
+llm_calls_async = AsyncSingleFlight("llm")
+
+def post_completion(headers, data, timeout=LLM_TIMEOUT):
+    """
+    POST the chat-completions request; returns the response body (recorded in
+    record mode). Runs once per real request, so it is what the LLM circuit
+    breaker records, not each caller sharing it through llm_calls.
+    """
+    with llm_breaker.guard():
+        resp = get_http_session().post(PERPLEXITY_API_URL, headers=headers, data=json.dumps(data), timeout=timeout)
         resp.raise_for_status()
         result = resp.json()
-        content = result.get("choices", [])[0].get("message", {}).get("content")
-        if not content:
-            raise ValueError("No assistant content returned")
-        return json.loads(content)
+    record_response(data, result)
+    return result
+
+async def post_completion_async(client, headers, data, timeout=LLM_TIMEOUT):
+    with llm_breaker.guard():
+        resp = await client.post(PERPLEXITY_API_URL, headers=headers, content=json.dumps(data), timeout=timeout)
+        resp.raise_for_status()
+        result = resp.json()
+    record_response(data, result)
+    return result
+
+def analyze_claim_perplexity(claim_details, catboost_result, extra_docs=None, reasons=None,
+                             deadline=None, fallback_score=None):
+    """
+    Call Perplexity AI for fraud analysis (without CNN). reasons: triggered rule
+    reasons. The call is bounded by `deadline` and skipped while the LLM circuit
+    is open; then, or on failure, a degraded verdict is built from fallback_score
+    (the hybrid score) when given.
+    """
+    headers, data = build_perplexity_request(claim_details, catboost_result, extra_docs, reasons)
+
+    try:
+        with timed("llm"):
+            result = replayed_response(data)
+            if result is None:
+                timeout = deadline.timeout(LLM_TIMEOUT) if deadline else LLM_TIMEOUT
+                # Identical prompts already in flight (retries, repeated claims) share one call
+                result = llm_calls.do(request_key(data), post_completion, headers, data, timeout)
+        return parse_perplexity_response(result)
+    except Exception as e:
+        return unavailable_result(e, fallback_score)
+
+async def analyze_claim_perplexity_async(client, claim_details, catboost_result, extra_docs=None, reasons=None,
+                                         deadline=None, fallback_score=None):
+    """analyze_claim_perplexity for asyncio: awaits the call on an httpx.AsyncClient."""
+    headers, data = build_perplexity_request(claim_details, catboost_result, extra_docs, reasons)
+
+    try:
+        with timed("llm"):
+            result = replayed_response(data)
+            if result is None:
+                timeout = deadline.timeout(LLM_TIMEOUT) if deadline else LLM_TIMEOUT
+                result = await llm_calls_async.do(request_key(data), post_completion_async, client, headers,
+                                                  data, timeout)
+        return parse_perplexity_response(result)
     except Exception as e:
-        return {
-            "fraud_score": None,
-            "explanation": f"Failed to get response from AI: {str(e)}",
-            "action": "escalate_investigation",
-            "follow_up_questions": []
-        }
+        return unavailable_result(e, fallback_score)
 
 # ---------------- MAIN ----------------
 if __name__ == "__main__":
+    import pandas as pd
+
     print("Enter insurance claim details below:")
     claimant_name =input("Claimant Name: ").strip()
     vehicle_reg =  input("Vehicle Registration: ").strip()
@@ -1,24 +1,43 @@
 # incorporated catboost model
 
 
-import pandas as pd
-import joblib
 import json
-import requests
 import os
+from resources import get_catboost_model, get_http_session
+from llm_replay import record_response, replayed_response, request_key
+from singleflight import SingleFlight
+from resilience import llm_breaker
+from perpbot import unavailable_result
+from prompt_builder import build_batch_prompt, build_prompt
+from logs import get_logger
+from profiling import profiled
 
 # ---------------- CONFIG ----------------
 LOW_THRESHOLD = 10    # Skip final check if fraud_score <= LOW_THRESHOLD
 HIGH_THRESHOLD = 70   # If fraud_score >= HIGH_THRESHOLD, remove follow-up questions
+LLM_TIMEOUT = 30  # seconds, capped further by the analysis deadline
+BATCH_TOKENS_PER_CLAIM = 250  # completion budget per claim in a batched request
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
+logger = get_logger(__name__)
 
 # ---------------- LOAD MODELS ----------------
-catboost_model = joblib.load("models/catboost_model.pkl")
-categorical_features = joblib.load("models/categorical_features.pkl")
+# Loaded lazily on first prediction (native .cbm when available, pickle otherwise)
+def __getattr__(name):
+    """Keep module.catboost_model / module.categorical_features working without loading at import."""
+    if name == "catboost_model":
+        return get_catboost_model()[0]
+    if name == "categorical_features":
+        return get_catboost_model()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ---------------- HELPER FUNCTIONS ----------------
+@profiled("preprocess_input")
 def preprocess_input(user_df):
     """Safe preprocessing for CatBoost input."""
+    import pandas as pd
+    from claims_schema import fill_categorical
+    catboost_model, categorical_features = get_catboost_model()
+
     user_df = user_df.copy()
     # Ensure all features exist
     for col in catboost_model.feature_names_:
@@ -28,7 +47,7 @@ def preprocess_input(user_df):
     user_df = user_df[catboost_model.feature_names_]
     # Fill missing values
     for col in categorical_features:
-        user_df.loc[:, col] = user_df[col].fillna('Unknown').astype(str)
+        user_df[col] = fill_categorical(user_df[col], 'Unknown').astype(str)
     for col in user_df.columns:
         if col not in categorical_features:
             user_df.loc[:, col] = user_df[col].fillna(user_df[col].median())
@@ -37,14 +56,12 @@ def preprocess_input(user_df):
 def get_catboost_prediction(user_df):
     """Return fraud prediction and probability from CatBoost."""
     X_processed = preprocess_input(user_df)
+    catboost_model, _ = get_catboost_model()
     prob = catboost_model.predict_proba(X_processed)[:, 1][0]  # probability of fraud
     pred = 'y' if prob >= 0.5 else 'n'
     return {"fraud_prediction": pred, "fraud_probability": float(prob)}
 
-import os
-import json
 import base64
-import requests
 
 def load_file_as_base64(path: str) -> str:
     """Utility: load file as Base64 string (for images or PDFs)."""
@@ -56,8 +73,11 @@ def analyze_claim_perplexity(
     catboost_result: dict,
     extra_docs: dict = None,
     model_name: str = "sonar",   # change if using OpenAI / Anthropic
-    api_url: str = "https://api.perplexity.ai/chat/completions",
+    api_url: str = None,
     api_key: str = None,
+    reasons: list = None,
+    deadline=None,
+    fallback_score: float = None,
 ) -> dict:
     """
     Universal claim analysis with AI (supports text + images).
@@ -71,56 +91,18 @@ def analyze_claim_perplexity(
               "police_report": "path/to/report.pdf"
             }
         model_name (str): AI model to call ("sonar", "gpt-4o", etc.)
-        api_url (str): API endpoint
+        api_url (str): API endpoint (default: FRAUD_LLM_URL or Perplexity)
         api_key (str): API key for the model
+        reasons (list): Rule reasons the claim triggered (select the claim fields sent)
+        deadline (resilience.Deadline): Caps the call's timeout; no call once exhausted
+        fallback_score (float): Hybrid score for a degraded verdict when the AI is unavailable
 
     Returns:
         dict: Parsed JSON response from AI
     """
 
-    system_prompt = """
-You are an expert insurance fraud investigation assistant.
-
-You receive:
-- Claim details (reported by user)
-- CatBoost fraud prediction
-- Extra documents (photos, FIR, receipts, etc.)
-
-Your tasks:
-1. Decide if current information is enough to conclude fraud analysis.
-   - If enough → give fraud_score (0-100), explanation, and action.
-   - If not enough → set action = "request_documents" and ask for at most two specific, useful extra proofs.
-2. Extra questions must directly help conclude the claim’s validity.
-3. After extra documents are provided, always give the FINAL fraud score and action.
-4. Fraud score scale: 0 = clearly genuine, 100 = very likely fraud.
-
-Output strictly in JSON with this schema:
-{
-  "fraud_score": number or null,
-  "explanation": string,
-  "action": one of ["accept", "request_documents", "escalate_investigation", "reject"],
-  "follow_up_questions": [ up to 2 short strings ]
-}
-"""
-
-    evidence = {
-        "CLAIM_DETAILS": claim_details,
-        "CATBOOST_RESULT": catboost_result,
-        "EXTRA_DOCUMENTS": {}
-    }
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": []}
-    ]
-
-    # always include text claim evidence
-    messages[1]["content"].append({
-        "type": "text",
-        "text": json.dumps(evidence)
-    })
-
-    # attach extra docs (convert if needed)
+    # Text documents go into the compact prompt, images as separate content parts
+    text_docs, image_parts = {}, []
     if extra_docs:
         for name, doc in extra_docs.items():
             if isinstance(doc, str) and os.path.exists(doc):
@@ -131,23 +113,30 @@ Output strictly in JSON with this schema:
                 )
                 b64 = load_file_as_base64(doc)
                 if mime_type.startswith("image/"):
-                    messages[1]["content"].append({
+                    image_parts.append({
                         "type": "image_url",
                         "image_url": {"url": f"data:{mime_type};base64,{b64}"}
                     })
                 else:
-                    evidence["EXTRA_DOCUMENTS"][name] = {
+                    text_docs[name] = {
                         "filename": os.path.basename(doc),
                         "content": b64,
                         "type": mime_type
                     }
+            elif isinstance(doc, dict) and str(doc.get("type", "")).startswith("image/") and doc.get("content"):
+                image_parts.append({
+                    "type": "image_url",
+                    "image_url": {"url": f"data:{doc['type']};base64,{doc['content']}"}
+                })
+                text_docs[name] = doc.get("filename", name)
             else:
-                evidence["EXTRA_DOCUMENTS"][name] = {"filename": name, "content": str(doc), "type": "text/plain"}
+                text_docs[name] = doc if isinstance(doc, dict) else str(doc)
 
-    headers = {
-        "Authorization": f"Bearer {api_key or os.getenv('AI_API_KEY')}",
-        "Content-Type": "application/json"
-    }
+    prompt = build_prompt(claim_details, catboost_result, reasons=reasons, extra_docs=text_docs)
+    messages = [
+        {"role": "system", "content": prompt.system},
+        {"role": "user", "content": [{"type": "text", "text": prompt.user}] + image_parts}
+    ]
 
     payload = {
         "model": model_name,
@@ -157,24 +146,101 @@ Output strictly in JSON with this schema:
     }
 
     try:
-        resp = requests.post(api_url, headers=headers, data=json.dumps(payload), timeout=30)
+        return post_chat_completion(payload, api_url, api_key, deadline)
+    except Exception as e:
+        return unavailable_result(e, fallback_score)
+
+llm_calls = SingleFlight("llm")
+
+def _post(payload, api_url, api_key, timeout):
+    headers = {
+        "Authorization": f"Bearer {api_key or os.getenv('AI_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+    url = api_url or os.getenv("FRAUD_LLM_URL", "https://api.perplexity.ai/chat/completions")
+    # Inside the single-flight call: the breaker records each real request once
+    with llm_breaker.guard():
+        resp = get_http_session().post(url, headers=headers, data=json.dumps(payload), timeout=timeout)
         resp.raise_for_status()
         result = resp.json()
-        content = result.get("choices", [])[0].get("message", {}).get("content")
-        if not content:
-            raise ValueError("No assistant content returned")
-        return json.loads(content)
+    record_response(payload, result)
+    return result
+
+def post_chat_completion(payload, api_url=None, api_key=None, deadline=None):
+    """
+    POST a chat-completions request (or replay it) and return the parsed JSON the
+    assistant answered. Bounded by `deadline`, refused while the LLM circuit is open.
+    """
+    result = replayed_response(payload)
+    if result is None:
+        timeout = deadline.timeout(LLM_TIMEOUT) if deadline else LLM_TIMEOUT
+        # Identical requests already in flight share one call
+        result = llm_calls.do(request_key(payload), _post, payload, api_url, api_key, timeout)
+    content = result.get("choices", [])[0].get("message", {}).get("content")
+    if not content:
+        raise ValueError("No assistant content returned")
+    return json.loads(content)
+
+VALID_ACTIONS = {"accept", "request_documents", "escalate_investigation", "reject"}
+
+def valid_verdict(verdict):
+    """True if an AI verdict follows the response schema."""
+    if not isinstance(verdict, dict) or verdict.get("action") not in VALID_ACTIONS:
+        return False
+    score = verdict.get("fraud_score")
+    if score is not None and (isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 100):
+        return False
+    questions = verdict.get("follow_up_questions", [])
+    return isinstance(verdict.get("explanation"), str) and isinstance(questions, list)
+
+def analyze_claims_batch(
+    claims: list,
+    model_name: str = "sonar",
+    api_url: str = None,
+    api_key: str = None,
+    deadline=None,
+) -> dict:
+    """
+    Phase 1 analysis of several claims in one chat-completion request.
+
+    Parameters:
+        claims (list): (claim_id, claim_details, catboost_result, reasons) tuples
+        model_name, api_url, api_key, deadline: as for analyze_claim_perplexity
+
+    Returns:
+        dict: claim_id -> verdict, only for claims whose verdict came back valid.
+              Callers fall back to analyze_claim_perplexity for the others.
+    """
+    prompt = build_batch_prompt(claims)
+    payload = {
+        "model": model_name,
+        "messages": prompt.messages(),
+        "temperature": 0.0,
+        "max_tokens": BATCH_TOKENS_PER_CLAIM * len(claims)
+    }
+
+    try:
+        answer = post_chat_completion(payload, api_url, api_key, deadline)
     except Exception as e:
-        return {
-            "fraud_score": None,
-            "explanation": f"Failed to get response from AI: {str(e)}",
-            "action": "escalate_investigation",
-            "follow_up_questions": []
-        }
+        logger.warning("Batched AI request failed for %d claims: %s", len(claims), e)
+        return {}
+    if not isinstance(answer, dict):
+        logger.warning("Batched AI response is not an object keyed by claim id")
+        return {}
+
+    verdicts = {}
+    for claim_id, _, _, _ in claims:
+        verdict = answer.get(str(claim_id))
+        if valid_verdict(verdict):
+            verdict.setdefault("follow_up_questions", [])
+            verdicts[claim_id] = verdict
+    return verdicts
 
 # ---------------- MAIN ----------------
 # ---------------- MAIN ----------------
 if __name__ == "__main__":
+    import pandas as pd
+
     print("Enter insurance claim details below:")
     claimant_name = input("Claimant Name: ").strip()
     vehicle_reg = input("Vehicle Registration: ").strip()
@@ -0,0 +1,135 @@
+import asyncio
+import cProfile
+import functools
+import io
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+
+from logs import get_logger
+
+# ---------------- CONFIG ----------------
+# Opt-in: FRAUD_PROFILE=1 (or profiling.enable(), e.g. from a --profile flag)
+ENABLED = os.getenv("FRAUD_PROFILE", "0").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("FRAUD_PROFILE_DIR", "profiles")
+SAMPLE_RATE = float(os.getenv("FRAUD_PROFILE_SAMPLE_RATE", 1.0))  # fraction of calls profiled
+TOP_FUNCTIONS = int(os.getenv("FRAUD_PROFILE_TOP", 30))
+TOP_ALLOCATIONS = 20
+TRACEMALLOC_FRAMES = 10
+
+# ---------------- PROFILING ----------------
+# @profiled(name) wraps a function with cProfile + tracemalloc when profiling is
+# enabled and writes one report per sampled call to PROFILE_DIR:
+#   <name>-<timestamp>-<pid>-<n>.txt   top functions by cumulative time, top allocations
+#   <name>-<timestamp>-<pid>-<n>.prof  raw cProfile stats (snakeviz, pstats)
+# Disabled, the wrapper costs one flag check per call.
+
+logger = get_logger(__name__)
+_counter = itertools.count(1)
+# tracemalloc (peak, snapshots) is process-wide, so one profiled run at a time per
+# process: calls arriving while it runs, on any thread or task, are not profiled
+_active = threading.Lock()
+
+
+def enable(directory=None, sample_rate=None):
+    """Turn profiling on for this process (same as FRAUD_PROFILE=1)."""
+    global ENABLED, PROFILE_DIR, SAMPLE_RATE
+    ENABLED = True
+    if directory:
+        PROFILE_DIR = directory
+    if sample_rate is not None:
+        SAMPLE_RATE = sample_rate
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+class _Run:
+    """One profiled call: cProfile plus a tracemalloc snapshot diff."""
+
+    def __init__(self, name):
+        self.name = name
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        # Caller holds _active
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        self.before = tracemalloc.take_snapshot()
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        self.elapsed = time.perf_counter() - self.started
+        try:
+            self.after = tracemalloc.take_snapshot()
+            _, self.peak = tracemalloc.get_traced_memory()
+        finally:
+            if self.started_tracing:
+                tracemalloc.stop()
+        try:
+            self.write_report()
+        except Exception as e:
+            logger.warning("Could not write profile for %s: %s", self.name, e)
+        return False
+
+    def write_report(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stem = f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_counter)}"
+        base = os.path.join(PROFILE_DIR, stem)
+        self.profiler.dump_stats(base + ".prof")
+
+        out = io.StringIO()
+        out.write(f"{self.name}: {self.elapsed * 1000:.1f} ms wall, "
+                  f"peak traced memory {self.peak / 1e6:.1f} MB\n\n")
+        out.write("== Top functions (cumulative time) ==\n")
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        out.write("\n== Top allocations (net, by line) ==\n")
+        for stat in self.after.compare_to(self.before, "lineno")[:TOP_ALLOCATIONS]:
+            out.write(f"{stat}\n")
+        with open(base + ".txt", "w") as f:
+            f.write(out.getvalue())
+
+
+def _should_profile():
+    """True with _active acquired for a sampled call; nested calls are covered by the outer profile."""
+    return ENABLED and random.random() < SAMPLE_RATE and _active.acquire(blocking=False)
+
+
+def profiled(name):
+    """Decorator: profile calls of the function under `name` when profiling is enabled."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _should_profile():
+                    return await fn(*args, **kwargs)
+                # Spans the awaits, so other tasks scheduled meanwhile on this loop are included
+                try:
+                    with _Run(name):
+                        return await fn(*args, **kwargs)
+                finally:
+                    _active.release()
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _should_profile():
+                return fn(*args, **kwargs)
+            try:
+                with _Run(name):
+                    return fn(*args, **kwargs)
+            finally:
+                _active.release()
+        return wrapper
+    return decorator
@@ -0,0 +1,214 @@
+import json
+import math
+import os
+
+from logs import get_logger
+from metrics import PROMPT_TOKENS
+from resources import Lazy, get_catboost_model
+
+logger = get_logger(__name__)
+
+# ---------------- CONFIG ----------------
+TOKEN_BUDGET = int(os.getenv("FRAUD_PROMPT_TOKEN_BUDGET", 600))  # system + user message, estimated
+TOP_FEATURES = int(os.getenv("FRAUD_PROMPT_TOP_FEATURES", 8))    # most important CatBoost features sent
+CHARS_PER_TOKEN = 4   # rough estimate for JSON/English text; no tokenizer dependency
+DOC_MAX_CHARS = 400   # text documents are cut to this first when over budget
+
+# ---------------- PROMPT COMPACTION ----------------
+# Instead of the whole claim row (~40 fields, most irrelevant to the verdict)
+# the prompt carries: a few core fields, the fields behind each triggered rule
+# reason, and the claim's values for the model's most important features. Empty
+# values are dropped and numbers rounded; JSON is written without whitespace.
+# If the estimate is still over TOKEN_BUDGET the lowest-priority fields are
+# dropped (feature fields first, core fields never), then document text cut.
+# Batched prompts give every claim the allowance of a single-claim prompt.
+
+SYSTEM_PROMPT = """Insurance fraud investigator. Input JSON: claim (selected claim fields), model (CatBoost fraud prediction or hybrid scores), rules (triggered rule reasons), docs (extra documents, may be empty).
+If the evidence is enough, give fraud_score 0-100 (0 = clearly genuine, 100 = very likely fraud), explanation and action. If not, action "request_documents" with at most 2 specific, useful proofs as follow_up_questions. If docs are present, always give the final score and action.
+Reply with JSON only: {"fraud_score": number|null, "explanation": string, "action": "accept"|"request_documents"|"escalate_investigation"|"reject", "follow_up_questions": [<=2 short strings]}"""
+
+BATCH_SYSTEM_PROMPT = """Insurance fraud investigator. Input JSON: claims, a list of {id, claim (selected claim fields), model (CatBoost fraud prediction or hybrid scores), rules (triggered rule reasons)}. Judge each claim on its own evidence only.
+For each claim: if the evidence is enough, give fraud_score 0-100 (0 = clearly genuine, 100 = very likely fraud), explanation and action; if not, action "request_documents" with at most 2 specific, useful proofs as follow_up_questions.
+Reply with one JSON object keyed by claim id, nothing else: {"<id>": {"fraud_score": number|null, "explanation": string, "action": "accept"|"request_documents"|"escalate_investigation"|"reject", "follow_up_questions": [<=2 short strings]}, ...}"""
+
+CORE_FIELDS = ("policy_number", "incident_type", "incident_severity", "total_claim_amount", "incident_date")
+
+# "None" is a real authorities_contacted category, not a missing value
+MISSING = {"", "?", "unknown", "nan", "nat", "null"}
+
+
+def _load_top_features():
+    """CatBoost features ordered by importance (empty if no model is available)."""
+    try:
+        model, _ = get_catboost_model()
+        ranked = sorted(zip(model.get_feature_importance(), model.feature_names_), reverse=True)
+        return [name for importance, name in ranked if importance > 0]
+    except Exception as e:
+        logger.warning("Feature importance unavailable for prompt field selection: %s", e)
+        return []
+
+
+feature_ranking = Lazy(_load_top_features)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_value(value):
+    """JSON-friendly short form of a claim value; None when it carries no information."""
+    if value is None:
+        return None
+    if hasattr(value, "item"):  # numpy scalar
+        value = value.item()
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return None
+        return int(value) if value.is_integer() else round(value, 2)
+    if isinstance(value, (int, bool)):
+        return value
+    if hasattr(value, "isoformat"):  # datetime / Timestamp
+        text = value.isoformat()
+        return text[:10] if text.endswith("T00:00:00") else text
+    text = str(value).strip()
+    if text.lower() in MISSING:
+        return None
+    return text
+
+
+def compact_dict(values):
+    result = {}
+    for key, value in (values or {}).items():
+        if isinstance(value, dict):
+            value = compact_dict(value)
+        elif isinstance(value, (list, tuple)):
+            value = [compact_value(v) for v in value]
+        else:
+            value = compact_value(value)
+        if value not in (None, {}, []):
+            result[key] = value
+    return result
+
+
+def _reason_fields():
+    from rule_engine import rules
+    return rules.get().reason_fields
+
+
+def select_fields(claim_details, reasons=(), top_features=None, reason_fields=None):
+    """
+    Claim field names in priority order: core, rule-reason fields (the "fields"
+    of each detector/rule in rules.json), top model features.
+    """
+    top_features = feature_ranking.get()[:TOP_FEATURES] if top_features is None else top_features
+    reason_fields = _reason_fields() if reason_fields is None else reason_fields
+    ordered = list(CORE_FIELDS)
+    for reason in reasons or ():
+        ordered.extend(reason_fields.get(reason, ()))
+    ordered.extend(top_features)
+
+    fields, seen = [], set()
+    for name in ordered:
+        if name not in seen and name in claim_details:
+            seen.add(name)
+            fields.append(name)
+    return fields
+
+
+def _cut_text(value):
+    if isinstance(value, str):
+        return value[:DOC_MAX_CHARS]
+    if isinstance(value, dict):
+        return {k: _cut_text(v) for k, v in value.items()}
+    return value
+
+
+class Prompt:
+    """
+    System and user message text of one LLM call, with its estimated token count,
+    the claim fields sent (claim ids for a batch) and those dropped for the budget.
+    """
+
+    def __init__(self, system, user, tokens, fields, dropped):
+        self.system = system
+        self.user = user
+        self.tokens = tokens
+        self.fields = fields
+        self.dropped = dropped
+
+    def messages(self):
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user},
+        ]
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _claim_evidence(claim_details, model_result, reasons, extra_docs, allowance):
+    """
+    Compact evidence dict for one claim, trimmed to `allowance` estimated tokens.
+    Returns (evidence, dropped field names).
+    """
+    fields = select_fields(claim_details, reasons)
+    claim = compact_dict({name: claim_details[name] for name in fields})
+    evidence = {
+        "claim": claim,
+        "model": compact_dict(model_result),
+        "rules": list(reasons or []),
+        "docs": compact_dict(extra_docs),
+    }
+
+    dropped = []
+    droppable = [name for name in reversed(fields) if name not in CORE_FIELDS and name in claim]
+    while estimate_tokens(_dumps(evidence)) > allowance and droppable:
+        name = droppable.pop(0)
+        del claim[name]
+        dropped.append(name)
+    if estimate_tokens(_dumps(evidence)) > allowance and evidence["docs"]:
+        evidence["docs"] = _cut_text(evidence["docs"])
+    return evidence, dropped
+
+
+def _finish(system, user, budget, claims):
+    tokens = estimate_tokens(system) + estimate_tokens(user)
+    if tokens > budget:
+        logger.warning("Prompt over token budget", extra={"tokens": tokens, "budget": budget})
+    PROMPT_TOKENS.observe(tokens)
+    logger.debug("Prompt built", extra={"tokens": tokens, "claims": claims})
+    return tokens
+
+
+def build_prompt(claim_details, model_result, reasons=None, extra_docs=None, budget=None):
+    """
+    Compact prompt for one claim. model_result is the CatBoost result (or the
+    hybrid evidence dict in combinedback); reasons are the rule reasons it triggered.
+    """
+    budget = budget or TOKEN_BUDGET
+    evidence, dropped = _claim_evidence(claim_details, model_result, reasons, extra_docs,
+                                        budget - estimate_tokens(SYSTEM_PROMPT))
+    user = _dumps(evidence)
+    tokens = _finish(SYSTEM_PROMPT, user, budget, 1)
+    return Prompt(SYSTEM_PROMPT, user, tokens, list(evidence["claim"]), dropped)
+
+
+def build_batch_prompt(claims, budget_per_claim=None):
+    """
+    One prompt for several claims (no documents), each given the same token
+    allowance as a single-claim prompt. claims: (claim_id, claim_details,
+    model_result, reasons) tuples; the answer is expected keyed by str(claim_id).
+    """
+    allowance = (budget_per_claim or TOKEN_BUDGET) - estimate_tokens(SYSTEM_PROMPT)
+    entries, dropped = [], []
+    for claim_id, claim_details, model_result, reasons in claims:
+        evidence, claim_dropped = _claim_evidence(claim_details, model_result, reasons, None, allowance)
+        del evidence["docs"]
+        entries.append({"id": str(claim_id), **evidence})
+        dropped.extend(claim_dropped)
+
+    user = _dumps({"claims": entries})
+    budget = estimate_tokens(BATCH_SYSTEM_PROMPT) + allowance * len(entries)
+    tokens = _finish(BATCH_SYSTEM_PROMPT, user, budget, len(entries))
+    return Prompt(BATCH_SYSTEM_PROMPT, user, tokens, [e["id"] for e in entries], dropped)
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# ---------------- CONFIG ----------------
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("FRAUD_ANALYSIS_DEADLINE", 20))  # whole analysis, incl. LLM calls
+MIN_CALL_SECONDS = 1.0  # don't start an LLM call with less time than this left
+BREAKER_FAILURES = int(os.getenv("FRAUD_LLM_BREAKER_FAILURES", 5))        # consecutive failures to open
+BREAKER_SLOW_SECONDS = float(os.getenv("FRAUD_LLM_BREAKER_SLOW", 15))     # slower calls count as failures
+BREAKER_RESET_SECONDS = float(os.getenv("FRAUD_LLM_BREAKER_RESET", 30))   # open time before a probe call
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# ---------------- DEADLINES AND CIRCUIT BREAKING ----------------
+# A Deadline is created when a claim analysis starts and passed down to every
+# LLM call, whose timeout is capped by the time left. A CircuitBreaker stops
+# calling the LLM after repeated failures or slow calls; callers then answer
+# with a degraded verdict from the rule + CatBoost scores instead of waiting.
+
+
+class DeadlineExceeded(TimeoutError):
+    """Not enough of the analysis budget left to start a call."""
+
+
+class CircuitOpen(RuntimeError):
+    """The breaker is open: the dependency is failing or slow."""
+
+
+class Deadline:
+    """Point in time (time.perf_counter clock) by which an analysis must be done."""
+
+    def __init__(self, seconds=None, started=None):
+        self.seconds = ANALYSIS_DEADLINE_SECONDS if seconds is None else seconds
+        self.expires_at = (time.perf_counter() if started is None else started) + self.seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.perf_counter())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap):
+        """Timeout for a call: the time left, at most cap; raises DeadlineExceeded if too little is left."""
+        remaining = self.remaining()
+        if remaining < MIN_CALL_SECONDS:
+            raise DeadlineExceeded(f"analysis deadline of {self.seconds:g}s exhausted")
+        return min(cap, remaining)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass. Open after `failures` consecutive failed or slow calls:
+    calls are refused for `reset_seconds`. Half-open: one probe call decides
+    whether to close again or stay open.
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, slow_seconds=BREAKER_SLOW_SECONDS,
+                 reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failures
+        self.slow_seconds = slow_seconds
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok, seconds=0.0):
+        failed = not ok or seconds > self.slow_seconds
+        with self._lock:
+            self._probing = False
+            if not failed:
+                if self.state != CLOSED:
+                    logger.info("Circuit closed", extra={"breaker": self.name})
+                self.state = CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                logger.warning("Circuit opened", extra={"breaker": self.name, "failures": self.failures,
+                                                        "slow": ok and seconds > self.slow_seconds,
+                                                        "seconds": round(seconds, 3)})
+
+    @contextmanager
+    def guard(self):
+        """Run the block as one call through the breaker; raises CircuitOpen when refused."""
+        if not self.allow():
+            raise CircuitOpen(f"{self.name} circuit open")
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(ok, time.perf_counter() - start)
+
+
+# Perplexity calls from every module share one breaker per process
+llm_breaker = CircuitBreaker("llm")
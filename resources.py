@@ -0,0 +1,118 @@
+import os
+import threading
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# ---------------- LAZY SINGLETONS ----------------
+# Heavy process-wide resources (CatBoost model, Firestore client, HTTP session)
+# are created on first use instead of at import time, so API workers, CLI tools
+# and tests can import modules cheaply and without side effects.
+
+
+class Lazy:
+    """Thread-safe lazily created value (double-checked locking)."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+
+def _load_model():
+    from model_io import load_catboost_model
+    return load_catboost_model()
+
+
+def _create_session():
+    import requests
+    return requests.Session()
+
+
+def init_firebase():
+    """Initialize the Firebase app once per process; later calls are no-ops."""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:
+        try:
+            # Try to load from environment or use default path
+            cred_path = os.getenv('FIREBASE_CREDENTIALS_PATH', 'insurance-fraud-detectio-a6526-firebase-adminsdk-fbsvc-9a0f74002a.json')
+            cred = credentials.Certificate(cred_path)
+            firebase_admin.initialize_app(cred)
+            logger.info("Firebase initialized")
+        except Exception as e:
+            logger.warning("Firebase initialization failed: %s", e)
+
+
+def _create_firestore_client():
+    """Initialize Firebase (only if not already initialized) and return a Firestore client or None."""
+    from firebase_admin import firestore
+
+    init_firebase()
+    try:
+        return firestore.client()
+    except Exception:
+        logger.warning("Firestore client not available")
+        return None
+
+
+catboost = Lazy(_load_model)
+http_session = Lazy(_create_session)
+firestore_client = Lazy(_create_firestore_client)
+
+
+def get_catboost_model():
+    """(model, categorical_features) loaded once per process."""
+    return catboost.get()
+
+
+def get_http_session():
+    """Shared requests.Session (connection pooling for the LLM API)."""
+    return http_session.get()
+
+
+def get_firestore_client():
+    """Shared Firestore client, or None when Firebase is not configured."""
+    return firestore_client.get()
+
+
+def preload():
+    """
+    Load the model and heavy libraries in the current process, then freeze the
+    GC so forked workers share those pages copy-on-write instead of each holding
+    a private copy. Call this in the pre-fork master (see gunicorn.conf.py).
+
+    Network clients (Firestore/gRPC, HTTP sessions) are deliberately not
+    preloaded: they are not fork-safe and are created lazily in each worker.
+    """
+    import gc
+    import pandas  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+    import logics  # noqa: F401
+
+    get_catboost_model()
+    logics.reference_outliers.get()  # IsolationForest that single claims are scored against
+    gc.collect()
+    # Move everything allocated so far out of the collector's reach; otherwise GC
+    # passes in the workers write to every object's GC header and un-share the pages
+    gc.freeze()
@@ -0,0 +1,258 @@
+import ast
+import json
+import operator
+import os
+
+from logs import get_logger
+from resources import Lazy
+
+logger = get_logger(__name__)
+
+# ---------------- CONFIG ----------------
+RULES_PATH = os.getenv("FRAUD_RULES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+
+# ---------------- DECLARATIVE RULES ----------------
+# rules.json holds the scoring of AutoInsuranceFraudDetector:
+#   scoring   - max_score, risk level cut-offs and the level below them
+#   detectors - points and reason for detectors implemented in code
+#   tables    - lookup tables (average amount per incident type, ...)
+#   defaults  - value of a column the claims frame does not have
+#   rules     - expression rules: {"when": "<expression>", "points", "reason",
+#               "requires": [columns the rule needs], ...}
+# Detectors and rules may list "fields": the claim fields their reason is based
+# on, sent to the LLM with a claim flagged for it (see prompt_builder.py).
+#
+# A "when" expression uses Python syntax over claim columns and a few
+# detector values (amount_threshold, high_risk_amount, current_year, ...):
+#   lower(police_report_available) == 'no' and witnesses == 0
+#   total_claim_amount > lookup('incident_avg_amounts', incident_type, 20000) * 2
+# It is parsed once and compiled to a tree of pandas operations, so a rule is
+# evaluated on whole columns at once, never row by row. Only comparisons,
+# and/or/not, arithmetic, `in [...]` and the FUNCTIONS below are accepted;
+# anything else (attributes, subscripts, other calls) is rejected when the
+# rules are loaded.
+
+
+class RuleError(ValueError):
+    """A rule definition or expression that cannot be compiled."""
+
+
+def _lower(value):
+    import pandas as pd
+    return value.astype(str).str.lower() if isinstance(value, pd.Series) else str(value).lower()
+
+
+def _upper(value):
+    import pandas as pd
+    return value.astype(str).str.upper() if isinstance(value, pd.Series) else str(value).upper()
+
+
+def _isna(value):
+    import pandas as pd
+    return pd.isna(value)
+
+
+FUNCTIONS = {"lower": _lower, "upper": _upper, "isna": _isna}  # lookup() is bound per rule set
+
+_BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+           ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod}
+_COMPARE = {ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+            ast.Gt: operator.gt, ast.GtE: operator.ge}
+
+
+def _isin(value, options, negate=False):
+    result = value.isin(options) if hasattr(value, "isin") else value in options
+    return ~result if negate else result
+
+
+class Expression:
+    """A compiled "when" expression; evaluate(env) with env mapping names to Series or scalars."""
+
+    def __init__(self, text, functions):
+        self.text = text
+        self.names = set()
+        self._functions = functions
+        try:
+            tree = ast.parse(text, mode="eval")
+        except SyntaxError as e:
+            raise RuleError(f"Invalid expression {text!r}: {e.msg}") from None
+        self._evaluate = self._compile(tree.body)
+
+    def evaluate(self, env):
+        return self._evaluate(env)
+
+    def _compile(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+            value = node.value
+            return lambda env: value
+        if isinstance(node, ast.Name):
+            if node.id in self._functions:
+                raise RuleError(f"{node.id} is a function in {self.text!r}")
+            name = node.id
+            self.names.add(name)
+            return lambda env: env[name]
+        if isinstance(node, (ast.List, ast.Tuple)):
+            items = [self._literal(item) for item in node.elts]
+            return lambda env: items
+        if isinstance(node, ast.BoolOp):
+            parts = [self._compile(value) for value in node.values]
+            combine = operator.and_ if isinstance(node.op, ast.And) else operator.or_
+
+            def bool_op(env):
+                result = parts[0](env)
+                for part in parts[1:]:
+                    result = combine(result, part(env))
+                return result
+            return bool_op
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            operand = self._compile(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda env: -operand(env)
+
+            def not_op(env):
+                value = operand(env)
+                return not value if isinstance(value, bool) else ~value
+            return not_op
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            op, left, right = _BINARY[type(node.op)], self._compile(node.left), self._compile(node.right)
+            return lambda env: op(left(env), right(env))
+        if isinstance(node, ast.Compare):
+            return self._compile_compare(node)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            if node.func.id not in self._functions:
+                raise RuleError(f"Unknown function {node.func.id!r} in {self.text!r}")
+            fn = self._functions[node.func.id]
+            args = [self._compile(arg) for arg in node.args]
+            return lambda env: fn(*(arg(env) for arg in args))
+        raise RuleError(f"Unsupported syntax {ast.dump(node)[:60]!r} in {self.text!r}")
+
+    def _compile_compare(self, node):
+        # a < b < c is (a < b) and (b < c), element-wise
+        operands = [self._compile(node.left)] + [self._compile(c) for c in node.comparators]
+        steps = []
+        for i, op in enumerate(node.ops):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not isinstance(node.comparators[i], (ast.List, ast.Tuple)):
+                    raise RuleError(f"'in' needs a literal list in {self.text!r}")
+                steps.append((i, lambda a, b, negate=isinstance(op, ast.NotIn): _isin(a, b, negate)))
+            elif type(op) in _COMPARE:
+                steps.append((i, _COMPARE[type(op)]))
+            else:
+                raise RuleError(f"Unsupported comparison in {self.text!r}")
+
+        def compare(env):
+            values = [operand(env) for operand in operands]
+            result = None
+            for i, op in steps:
+                step = op(values[i], values[i + 1])
+                result = step if result is None else result & step
+            return result
+        return compare
+
+    def _literal(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+            return node.value
+        raise RuleError(f"Lists may only hold constants in {self.text!r}")
+
+
+class Rule:
+    def __init__(self, name, spec, functions):
+        if "when" not in spec:
+            raise RuleError(f"Rule {name} has no 'when' expression")
+        self.name = name
+        self.when = Expression(spec["when"], functions)
+        self.points = spec.get("points", 0)
+        self.reason = spec.get("reason", name)
+        self.method = spec.get("method", name.replace("_", " ").title())
+        self.risk_level = spec.get("risk_level", "MEDIUM")
+        self.requires = spec.get("requires", [])  # columns without which the rule flags nothing
+        self.fields = spec.get("fields", [])  # claim fields behind the reason, for the LLM prompt
+
+
+class RuleSet:
+    """Compiled rules.json: expression rules, detector weights, risk levels."""
+
+    def __init__(self, config):
+        scoring = config.get("scoring", {})
+        self.max_score = scoring.get("max_score", 100)
+        # Highest cut-off first
+        self.levels = sorted(scoring.get("levels", {}).items(), key=lambda item: item[1], reverse=True)
+        self.default_level = scoring.get("default_level", "MINIMAL")
+        self.tables = config.get("tables", {})
+        self.defaults = config.get("defaults", {})
+
+        functions = dict(FUNCTIONS, lookup=self.lookup)
+        self.rules = {name: Rule(name, spec, functions) for name, spec in config.get("rules", {}).items()}
+        detectors = config.get("detectors", {})
+        self.weights = {name: (spec["points"], spec.get("reason", name)) for name, spec in detectors.items()}
+        self.weights.update({name: (rule.points, rule.reason) for name, rule in self.rules.items()})
+        # Reason -> claim fields it is based on (several rules may share a reason)
+        self.reason_fields = {}
+        fields = [(spec.get("reason", name), spec.get("fields", [])) for name, spec in detectors.items()]
+        fields += [(rule.reason, rule.fields) for rule in self.rules.values()]
+        for reason, names in fields:
+            merged = self.reason_fields.setdefault(reason, [])
+            merged.extend(name for name in names if name not in merged)
+
+    def lookup(self, table, value, default=None):
+        """Map values through a table from rules.json; unknown or missing ones give default."""
+        import pandas as pd
+
+        if table not in self.tables:
+            raise RuleError(f"Unknown lookup table {table!r}")
+        mapping = self.tables[table]
+        if not isinstance(value, pd.Series):
+            return mapping.get(value, default)
+        mapped = value.astype(object).map(mapping)
+        return mapped.where(mapped.notna(), default).infer_objects()
+
+    def _column(self, df, name):
+        import pandas as pd
+
+        series = df[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Category codes differ between columns; compare the values themselves
+            numeric = pd.api.types.is_numeric_dtype(series.cat.categories.dtype)
+            series = series.astype(float if numeric else object)
+        return series
+
+    def evaluate(self, name, df, context=None):
+        """Boolean Series: claims of df matching the rule."""
+        import pandas as pd
+
+        rule = self.rules[name]
+        if any(column not in df.columns for column in rule.requires):
+            return pd.Series(False, index=df.index)
+        env = dict(context or {})
+        for column in rule.when.names:
+            if column in env:
+                continue
+            if column in df.columns:
+                env[column] = self._column(df, column)
+            elif column in self.defaults:
+                env[column] = self.defaults[column]
+            else:
+                # Unknown column: NaN, which no comparison matches
+                env[column] = pd.Series(float("nan"), index=df.index)
+        result = rule.when.evaluate(env)
+        if not isinstance(result, pd.Series):
+            result = pd.Series(bool(result), index=df.index)
+        return result.fillna(False).astype(bool)
+
+    def risk_levels(self, scores):
+        """Risk level per score (numpy array) from the configured cut-offs."""
+        import numpy as np
+
+        return np.select([scores >= cutoff for _, cutoff in self.levels], [level for level, _ in self.levels],
+                         default=self.default_level)
+
+
+def load_rules(path=None):
+    path = path or RULES_PATH
+    with open(path, encoding="utf-8") as f:
+        rule_set = RuleSet(json.load(f))
+    logger.info("Rules loaded", extra={"path": path, "rules": len(rule_set.rules)})
+    return rule_set
+
+
+rules = Lazy(load_rules)
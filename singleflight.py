@@ -0,0 +1,103 @@
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# ---------------- REQUEST COALESCING ----------------
+# Concurrent calls with the same key share one execution: the first caller
+# runs the function, later callers wait for it and get a copy of its result
+# (or its exception). Nothing is cached once the call has finished, so only
+# work that is actually in flight at the same time is deduplicated.
+
+
+def payload_key(data):
+    """Stable key of a claim payload: keys sorted, values compared as stripped strings, empty ones ignored."""
+    normalized = {}
+    for key, value in (data or {}).items():
+        text = "" if value is None else str(value).strip()
+        if text and text.lower() != "nan":
+            normalized[str(key)] = text
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls across threads."""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """fn(*args, **kwargs), unless a call with this key is already running: then wait for its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            logger.debug("Coalesced with in-flight call", extra={"flight": self.name})
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # Callers may mutate what they get back; each follower gets its own copy
+            return copy.deepcopy(call.result)
+
+        try:
+            result = fn(*args, **kwargs)
+            # Private snapshot taken before followers wake, so the leader's caller
+            # can mutate its result while they copy
+            call.result = copy.deepcopy(result)
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop."""
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        """await fn(*args, **kwargs), or the identical call already running."""
+        future = self._calls.get(key)
+        if future is not None:
+            logger.debug("Coalesced with in-flight call", extra={"flight": self.name})
+            # shield: a cancelled follower must not cancel the shared call
+            return copy.deepcopy(await asyncio.shield(future))
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn(*args, **kwargs)
+            future.set_result(copy.deepcopy(result))  # snapshot, as in SingleFlight.do
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here so an unawaited failure is not reported as lost
+            raise
+        finally:
+            del self._calls[key]
@@ -0,0 +1,296 @@
+"""
+Synthetic claim generator for load and scale testing.
+
+Learns the distributions of insurance_claims.csv (incident type x severity x
+collision, amounts conditional on type and severity, state/city, make/model,
+policy tenure, ...) and samples arbitrarily many claims with the same schema,
+in chunks, optionally rewriting a fraction of rows into the fraud patterns the
+detectors in logics.py look for.
+
+    python synth.py --rows 1000000 --out claims_1m.csv
+    python synth.py --rows 5000000 --out claims_5m.parquet --chunk-size 250000 --duplicates 0.02
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# ---------------- CONFIG ----------------
+DATA_PATH = "insurance_claims.csv"
+DEFAULT_CHUNK_SIZE = 100_000
+POLICY_NUMBER_OFFSET = 1_000_000  # real policy numbers are 6 digits; synthetic ones never collide
+JITTER_SIGMA = 0.1                # lognormal noise on resampled amounts and premiums
+
+# Columns drawn together as one observed row, so only real combinations appear
+JOINT_BLOCKS = [
+    ["incident_type", "incident_severity", "collision_type"],
+    ["incident_state", "incident_city"],
+    ["auto_make", "auto_model"],
+    ["age", "months_as_customer"],
+]
+
+# (given, columns): columns drawn as one observed row among real claims with the same given values
+CONDITIONAL_BLOCKS = [
+    (["incident_type", "incident_severity"], ["injury_claim", "property_claim", "vehicle_claim"]),
+    (["incident_type", "incident_severity"], ["fraud_reported"]),
+    (["incident_type"], ["incident_hour_of_the_day"]),
+    (["incident_type"], ["number_of_vehicles_involved"]),
+    (["incident_type"], ["authorities_contacted"]),
+    (["incident_type"], ["property_damage", "bodily_injuries"]),
+    (["incident_type"], ["witnesses", "police_report_available"]),
+    (["auto_make"], ["auto_year"]),
+]
+
+AMOUNT_COLUMNS = ["injury_claim", "property_claim", "vehicle_claim"]
+
+# Built by the generator instead of being resampled
+GENERATED_COLUMNS = ["policy_number", "insured_zip", "incident_date", "policy_bind_date",
+                     "incident_location", "total_claim_amount", "_c39"]
+
+# Columns detect_duplicate_claims compares (plus the amount split, to keep totals consistent)
+DUPLICATE_COLUMNS = ["insured_zip", "incident_date", "total_claim_amount", "auto_make", "auto_model"] + AMOUNT_COLUMNS
+
+# Fraction of rows rewritten into each fraud pattern (see inject_fraud_patterns)
+DEFAULT_INJECTION = {
+    "duplicates": 0.01,       # detect_duplicate_claims: copy of another claim's key fields
+    "frequency": 0.01,        # detect_excessive_frequency: repeat filers with recent incidents
+    "geographic": 0.0,        # detect_geographic_anomalies: incident_state != policy_state
+    "inflated_amount": 0.01,  # detect_suspicious_amounts / detect_outliers: amounts x3-6
+    "late_night": 0.0,        # detect_suspicious_patterns: 22:00-04:00, no witnesses or police report
+    "old_vehicle": 0.005,     # detect_vehicle_age_anomalies: >15 year old vehicle, claim > 30k
+}
+LATE_NIGHT_HOURS = [22, 23, 0, 1, 2, 3, 4]
+
+
+class ClaimSynthesizer:
+    """Resampling model of insurance_claims.csv; fit once, sample many chunks."""
+
+    def __init__(self, seed=0, start_date=None, end_date=None):
+        self.rng = np.random.default_rng(seed)
+        # Incident dates are spread uniformly over [start_date, end_date] (default: the last year)
+        self.end_date = pd.Timestamp(end_date or pd.Timestamp.now().normalize())
+        self.start_date = pd.Timestamp(start_date or self.end_date - pd.Timedelta(days=365))
+        self.columns = None
+        self.values = {}
+        self.conditional = []
+        self.tenure_days = None
+        self.zip_range = None
+        self.streets = None
+        self.n_source = 0
+
+    def fit(self, df):
+        """Learn column values, joint blocks and conditional pools from real claims."""
+        self.columns = list(df.columns)
+        self.n_source = len(df)
+        self.values = {col: df[col].to_numpy() for col in df.columns}
+
+        # For each conditional block: group key -> positions of the real rows with that key
+        self.conditional = [
+            (given, cols, df.groupby(given, dropna=False).indices)
+            for given, cols in CONDITIONAL_BLOCKS
+            if all(c in df.columns for c in given + cols)
+        ]
+
+        incident = pd.to_datetime(df["incident_date"], errors="coerce")
+        bound = pd.to_datetime(df["policy_bind_date"], errors="coerce")
+        self.tenure_days = (incident - bound).dt.days.dropna().clip(lower=0).to_numpy()
+        self.zip_range = (int(df["insured_zip"].min()), int(df["insured_zip"].max()))
+        self.streets = df["incident_location"].astype(str).str.split(" ", n=1).str[1].dropna().unique()
+        return self
+
+    def _draw(self, n):
+        """Positions of n real rows drawn uniformly with replacement."""
+        return self.rng.integers(0, self.n_source, n)
+
+    def sample(self, n, start_index=0, injection=None, label=False):
+        """
+        n synthetic claims as a DataFrame with the source schema. start_index
+        offsets the generated policy numbers so successive chunks stay unique.
+        """
+        if self.columns is None:
+            raise ValueError("Synthesizer is not fitted")
+        rng = self.rng
+        out = {}
+
+        # Joint blocks share one draw of real rows per block
+        for cols in JOINT_BLOCKS:
+            idx = self._draw(n)
+            for col in cols:
+                out[col] = self.values[col][idx]
+
+        # Everything else not conditional or generated: independent marginals
+        conditional_cols = {c for _, cols, _ in self.conditional for c in cols}
+        for col in self.columns:
+            if col not in out and col not in conditional_cols and col not in GENERATED_COLUMNS:
+                out[col] = self.values[col][self._draw(n)]
+
+        # Conditional blocks: draw from real rows sharing the already generated key
+        frame = pd.DataFrame(out)
+        for given, cols, pools in self.conditional:
+            idx = np.empty(n, dtype=np.int64)
+            for key, positions in frame.groupby(given, dropna=False).indices.items():
+                pool = pools.get(key)
+                idx[positions] = rng.choice(pool, len(positions)) if pool is not None else self._draw(len(positions))
+            for col in cols:
+                frame[col] = self.values[col][idx]
+
+        # Jittered amounts and premiums so values are not just copies of the source
+        for col in AMOUNT_COLUMNS:
+            frame[col] = (np.round(frame[col] * rng.lognormal(0, JITTER_SIGMA, n) / 10) * 10).astype(np.int64)
+        if "policy_annual_premium" in frame.columns:
+            frame["policy_annual_premium"] = np.round(frame["policy_annual_premium"] * rng.lognormal(0, JITTER_SIGMA, n), 2)
+
+        # Generated columns
+        frame["policy_number"] = POLICY_NUMBER_OFFSET + start_index + np.arange(n)
+        frame["insured_zip"] = rng.integers(self.zip_range[0], self.zip_range[1] + 1, n)
+        span = max(1, (self.end_date - self.start_date).days + 1)
+        incident = self.start_date + pd.to_timedelta(rng.integers(0, span, n), unit="D")
+        bound = incident - pd.to_timedelta(rng.choice(self.tenure_days, n), unit="D")
+        frame["incident_date"] = incident
+        frame["policy_bind_date"] = bound
+        frame["incident_location"] = [f"{num} {street}" for num, street in
+                                      zip(rng.integers(1000, 10000, n), rng.choice(self.streets, n))]
+
+        frame["total_claim_amount"] = frame[AMOUNT_COLUMNS].sum(axis=1)
+
+        if injection:
+            frame = inject_fraud_patterns(frame, injection, rng, now=self.end_date, label=label)
+
+        if "_c39" in self.columns:
+            frame["_c39"] = np.nan
+        frame["incident_date"] = pd.to_datetime(frame["incident_date"]).dt.strftime("%Y-%m-%d")
+        frame["policy_bind_date"] = pd.to_datetime(frame["policy_bind_date"]).dt.strftime("%Y-%m-%d")
+
+        extra = ["injected_pattern"] if label and injection else []
+        return frame[self.columns + extra]
+
+    def chunks(self, rows, chunk_size=DEFAULT_CHUNK_SIZE, injection=None, label=False):
+        """Yield DataFrames of at most chunk_size claims until rows have been generated."""
+        for start in range(0, rows, chunk_size):
+            yield self.sample(min(chunk_size, rows - start), start_index=start, injection=injection, label=label)
+
+
+def inject_fraud_patterns(df, rates, rng, now=None, label=False):
+    """
+    Rewrite a fraction of rows (per DEFAULT_INJECTION key) into the fraud patterns
+    the detectors flag. Duplicates and repeat filers are created within the chunk.
+    With label=True an `injected_pattern` column names the patterns applied to each row.
+    """
+    n = len(df)
+    now = pd.Timestamp(now or pd.Timestamp.now().normalize())
+    labels = [[] for _ in range(n)]
+
+    def pick(pattern):
+        count = int(round(rates.get(pattern, 0) * n))
+        rows = rng.choice(n, size=min(count, n), replace=False) if count else np.array([], dtype=np.int64)
+        for i in rows:
+            labels[i].append(pattern)
+        return rows
+
+    rows = pick("frequency")
+    if len(rows):
+        # About four recent claims per repeat filer, all inside the detector's six month window
+        filers = df["policy_number"].to_numpy()[rows[:max(1, len(rows) // 4)]]
+        df.loc[df.index[rows], "policy_number"] = rng.choice(filers, len(rows))
+        df.loc[df.index[rows], "incident_date"] = now - pd.to_timedelta(rng.integers(0, 90, len(rows)), unit="D")
+
+    rows = pick("geographic")
+    if len(rows):
+        states = np.unique(df["incident_state"].astype(str))
+        policy_states = df["policy_state"].to_numpy()[rows]
+        df.loc[df.index[rows], "incident_state"] = [
+            rng.choice(states[states != s]) if (states != s).any() else s for s in policy_states
+        ]
+
+    rows = pick("inflated_amount")
+    if len(rows):
+        factor = rng.uniform(3, 6, len(rows))
+        for col in AMOUNT_COLUMNS:
+            df.loc[df.index[rows], col] = (df[col].to_numpy()[rows] * factor).astype(np.int64)
+        df["total_claim_amount"] = df[AMOUNT_COLUMNS].sum(axis=1)
+
+    rows = pick("late_night")
+    if len(rows):
+        df.loc[df.index[rows], "incident_hour_of_the_day"] = rng.choice(LATE_NIGHT_HOURS, len(rows))
+        df.loc[df.index[rows], "witnesses"] = 0
+        df.loc[df.index[rows], "police_report_available"] = "NO"
+
+    rows = pick("old_vehicle")
+    if len(rows):
+        df.loc[df.index[rows], "auto_year"] = now.year - rng.integers(16, 26, len(rows))
+        totals = df[AMOUNT_COLUMNS].to_numpy()[rows].sum(axis=1).clip(min=1)
+        scale = np.maximum(1.0, rng.uniform(31000, 60000, len(rows)) / totals)
+        for col in AMOUNT_COLUMNS:
+            df.loc[df.index[rows], col] = (df[col].to_numpy()[rows] * scale).astype(np.int64)
+        df["total_claim_amount"] = df[AMOUNT_COLUMNS].sum(axis=1)
+
+    # Last, so the copies carry the final values of their source rows
+    rows = pick("duplicates")
+    if len(rows):
+        sources = rng.choice(n, len(rows))
+        for col in DUPLICATE_COLUMNS:
+            df.loc[df.index[rows], col] = df[col].to_numpy()[sources]
+
+    if label:
+        df["injected_pattern"] = [",".join(p) for p in labels]
+    return df
+
+
+def fit_synthesizer(path=DATA_PATH, seed=0, **kwargs):
+    """ClaimSynthesizer fitted on a claims CSV."""
+    return ClaimSynthesizer(seed=seed, **kwargs).fit(pd.read_csv(path))
+
+
+def write_claims(synth, path, rows, chunk_size=DEFAULT_CHUNK_SIZE, fmt=None, injection=None, label=False):
+    """Stream rows synthetic claims to a CSV or Parquet file chunk by chunk."""
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    chunks = synth.chunks(rows, chunk_size, injection=injection, label=label)
+
+    if fmt == "csv":
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        return path
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from None
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True, help="output .csv or .parquet path")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--source", default=DATA_PATH, help="real claims CSV to learn from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-date", help="earliest incident date (default: one year before --end-date)")
+    parser.add_argument("--end-date", help="latest incident date (default: today)")
+    parser.add_argument("--label", action="store_true", help="add an injected_pattern column")
+    for pattern, rate in DEFAULT_INJECTION.items():
+        parser.add_argument(f"--{pattern.replace('_', '-')}", type=float, default=rate,
+                            help=f"fraction of rows with the {pattern} pattern (default {rate})")
+    args = parser.parse_args()
+
+    synth = fit_synthesizer(args.source, seed=args.seed, start_date=args.start_date, end_date=args.end_date)
+    injection = {pattern: getattr(args, pattern) for pattern in DEFAULT_INJECTION}
+    write_claims(synth, args.out, args.rows, args.chunk_size, args.format, injection, args.label)
+    print(f"✅ Wrote {args.rows} synthetic claims to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+
+import pandas as pd
+
+from claims_schema import read_claims_csv
+from watchlists import Watchlist
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "insurance_claims.csv")
+
+
+def zip_watchlist(entries):
+    return Watchlist("blacklisted_zips", entries, ["insured_zip"], match="exact")
+
+
+def test_exact_zip_matches_csv_dtype():
+    df = read_claims_csv(DATA_PATH)
+    zip_code = str(df["insured_zip"].iloc[0])
+
+    hits = zip_watchlist([zip_code]).flag(df)
+
+    assert hits.iloc[0]
+    assert hits.sum() == (df["insured_zip"].astype(str) == zip_code).sum()
+
+
+def test_exact_zip_matches_float_column(tmp_path):
+    # A blank zip makes pandas read the column as float64 (430632.0)
+    df = read_claims_csv(DATA_PATH).head(5).copy()
+    zip_code = str(df["insured_zip"].iloc[0])
+    df.loc[1, "insured_zip"] = None
+    path = tmp_path / "claims.csv"
+    df.to_csv(path, index=False)
+
+    df = read_claims_csv(str(path))
+    assert pd.api.types.is_float_dtype(df["insured_zip"])
+
+    hits = zip_watchlist([zip_code]).flag(df)
+
+    assert hits.iloc[0]
+    assert not hits.iloc[1]
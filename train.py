@@ -1,4 +1,5 @@
 # train.py
+import argparse
 import pandas as pd
 import os
 from sklearn.model_selection import train_test_split
@@ -7,119 +8,187 @@ from sklearn.metrics import classification_report, confusion_matrix, roc_auc_sco
 from catboost import CatBoostClassifier
 import joblib
 import numpy as np
-
-# Create models directory first thing
-os.makedirs("models", exist_ok=True)
-
-# 1. Load dataset
-df = pd.read_csv("insurance_claims.csv")
-
-# 2. Check target column
-print("Columns in dataset:", df.columns)
-# assume target column is 'fraud_reported'
-target = 'fraud_reported'
-
-# 3. Separate features and labels
-X = df.drop(columns=[target, "_c39"], errors="ignore")  # remove weird column
-y = df[target]
-
-# Encode categorical target if needed
-if y.dtype == 'O':
-    le = LabelEncoder()
-    y = le.fit_transform(y)
-    # Save label encoder for later use
-    joblib.dump(le, "models/label_encoder.pkl")
-    print("Label encoder saved!")
-
-# 4. Identify categorical columns for CatBoost
-categorical_features = []
-for col in X.columns:
-    if X[col].dtype == 'object' or X[col].dtype.name == 'category':
-        categorical_features.append(col)
-
-print(f"Categorical features found: {categorical_features}")
-
-# 5. Handle missing values - CatBoost can handle them, but let's be explicit
-# For numerical columns, fill with median
-# For categorical columns, fill with mode or 'Unknown'
-for col in X.columns:
-    if col in categorical_features:
-        X[col] = X[col].fillna('Unknown')
+import claims_schema
+from claims_schema import read_claims_csv, fill_categorical
+from dataset_cache import cached_frame
+from model_io import export_model
+
+TARGET = 'fraud_reported'
+DATA_PATH = "insurance_claims.csv"
+
+# Fixed configuration used when no search is requested
+DEFAULT_PARAMS = {
+    "iterations": 1000,
+    "learning_rate": 0.1,
+    "depth": 8,
+    "class_weights": [1, 3],  # Give more weight to fraud class (assuming it's minority)
+    "random_seed": 42,
+    "early_stopping_rounds": 50,
+    "eval_metric": 'AUC',
+}
+
+
+def clean_training_data(path=DATA_PATH):
+    """Load the claims CSV and apply the training cleaning steps (cached by dataset_cache)."""
+    # Dates stay categorical: the model uses them as categorical features
+    df = read_claims_csv(path, parse_dates=False, report=True)
+    df = df.drop(columns=["_c39"], errors="ignore")  # remove weird column
+
+    # Handle missing values - CatBoost can handle them, but let's be explicit
+    # For numerical columns, fill with median
+    # For categorical columns, fill with mode or 'Unknown'
+    for col in df.columns:
+        if col == TARGET:
+            continue
+        if df[col].dtype == 'object' or df[col].dtype.name == 'category':
+            df[col] = fill_categorical(df[col], 'Unknown')
+        else:
+            df[col] = df[col].fillna(df[col].median())
+    return df
+
+
+def load_training_data(path=DATA_PATH, save_encoder=False):
+    """
+    Return (X, y, categorical_features) from the memory-mapped dataset cache.
+    y is label encoded; the encoder is saved to models/ when save_encoder is set.
+    """
+    # 1. Load cleaned dataset (memory-mapped cache keyed by the CSV hash and the cleaning code)
+    df = cached_frame(path, "train", lambda: clean_training_data(path),
+                      code=(clean_training_data, claims_schema))
+
+    # 2. Separate features and labels
+    X = df.drop(columns=[TARGET])
+    y = df[TARGET]
+
+    # Encode categorical target if needed
+    if y.dtype == 'O' or y.dtype.name == 'category':
+        le = LabelEncoder()
+        y = le.fit_transform(y)
+        if save_encoder:
+            # Save label encoder for later use
+            joblib.dump(le, "models/label_encoder.pkl")
+            print("Label encoder saved!")
+
+    # 3. Identify categorical columns for CatBoost
+    categorical_features = []
+    for col in X.columns:
+        if X[col].dtype == 'object' or X[col].dtype.name == 'category':
+            categorical_features.append(col)
+
+    return X, y, categorical_features
+
+
+def build_model(categorical_features, **params):
+    """CatBoostClassifier with DEFAULT_PARAMS overridden by params."""
+    config = {**DEFAULT_PARAMS, **params}
+    config.setdefault("verbose", 100)  # Print progress every 100 iterations
+    # CatBoost handles categorical features automatically - no need for scaling or encoding
+    return CatBoostClassifier(cat_features=categorical_features, **config)
+
+
+def evaluate_model(catboost_model, X_test, y_test):
+    """Print evaluation metrics and return fraud probabilities for X_test."""
+    y_pred = catboost_model.predict(X_test)
+    y_prob = catboost_model.predict_proba(X_test)[:, 1]
+
+    print("\n" + "="*50)
+    print("MODEL EVALUATION RESULTS")
+    print("="*50)
+
+    print(f"\nAccuracy: {accuracy_score(y_test, y_pred):.4f}")
+    print(f"ROC-AUC Score: {roc_auc_score(y_test, y_prob):.4f}")
+
+    print("\nConfusion Matrix:")
+    cm = confusion_matrix(y_test, y_pred)
+    print(cm)
+
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred))
+    return y_prob
+
+
+def save_model_artifacts(catboost_model, categorical_features, feature_names, onnx=False):
+    """Save model (.pkl and native .cbm), categorical features and feature importance to models/."""
+    feature_importance = catboost_model.get_feature_importance()
+    importance_df = pd.DataFrame({
+        'feature': feature_names,
+        'importance': feature_importance
+    }).sort_values('importance', ascending=False)
+
+    print("\nTop 10 Most Important Features:")
+    print(importance_df.head(10))
+
+    joblib.dump(catboost_model, "models/catboost_model.pkl")
+    joblib.dump(categorical_features, "models/categorical_features.pkl")
+    importance_df.to_csv("models/feature_importance.csv", index=False)
+    exported = export_model(catboost_model, onnx=onnx)
+
+    print("\n✅ CatBoost model, categorical features list, and feature importance saved!")
+    print(f"✅ Model saved to: models/catboost_model.pkl")
+    for path in exported:
+        print(f"✅ Inference model exported to: {path}")
+    print(f"✅ Categorical features saved to: models/categorical_features.pkl")
+    print(f"✅ Feature importance saved to: models/feature_importance.csv")
+
+
+def train_default(onnx=False):
+    """Train the fixed configuration on an 80/20 split and save it to models/."""
+    X, y, categorical_features = load_training_data(save_encoder=True)
+    print("Columns in dataset:", X.columns)
+    print(f"Categorical features found: {categorical_features}")
+
+    # Train-test split
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, stratify=y, random_state=42
+    )
+
+    catboost_model = build_model(categorical_features)
+
+    # Fit the model
+    print("\nStarting model training...")
+    catboost_model.fit(
+        X_train, y_train,
+        eval_set=(X_test, y_test),
+        plot=False  # Set to True if you want to see training plots
+    )
+
+    y_prob = evaluate_model(catboost_model, X_test, y_test)
+    save_model_artifacts(catboost_model, categorical_features, X.columns, onnx=onnx)
+
+    # Quick prediction example (optional)
+    print("\n" + "="*50)
+    print("SAMPLE PREDICTIONS")
+    print("="*50)
+    sample_predictions = y_prob[:5]
+    sample_actual = y_test[:5] if hasattr(y_test, 'iloc') else y_test[0:5]
+    print("Sample probabilities (fraud likelihood):")
+    for i, (prob, actual) in enumerate(zip(sample_predictions, sample_actual)):
+        print(f"Sample {i+1}: Fraud Probability = {prob:.4f}, Actual = {actual}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the CatBoost fraud model")
+    parser.add_argument("--search", action="store_true", help="run a hyperparameter search instead of the fixed config")
+    parser.add_argument("--cv", action="store_true", help="report stratified k-fold CV AUC for the fixed config")
+    parser.add_argument("--folds", type=int, default=5, help="number of CV folds")
+    parser.add_argument("--onnx", action="store_true", help="also export the model to ONNX")
+    parser.add_argument("--strategy", choices=["random", "bayesian"], default="random")
+    parser.add_argument("--trials", type=int, default=20, help="number of search trials")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel trials or folds (default: all cores)")
+    args = parser.parse_args(argv)
+
+    # Create models directory first thing
+    os.makedirs("models", exist_ok=True)
+
+    if args.search:
+        from tuning import run_search
+        run_search(n_trials=args.trials, n_jobs=args.jobs, strategy=args.strategy, onnx=args.onnx)
+    elif args.cv:
+        from cross_validation import cross_validate
+        cross_validate(n_folds=args.folds, n_jobs=args.jobs)
     else:
-        X[col] = X[col].fillna(X[col].median())
-
-# 6. Train-test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, stratify=y, random_state=42
-)
-
-# 7. Train CatBoost model
-# CatBoost handles categorical features automatically - no need for scaling or encoding
-catboost_model = CatBoostClassifier(
-    iterations=1000,
-    learning_rate=0.1,
-    depth=8,
-    cat_features=categorical_features,
-    class_weights=[1, 3],  # Give more weight to fraud class (assuming it's minority)
-    random_seed=42,
-    verbose=100,  # Print progress every 100 iterations
-    early_stopping_rounds=50,
-    eval_metric='AUC'
-)
-
-# Fit the model
-print("\nStarting model training...")
-catboost_model.fit(
-    X_train, y_train,
-    eval_set=(X_test, y_test),
-    plot=False  # Set to True if you want to see training plots
-)
-
-# 8. Evaluate model
-y_pred = catboost_model.predict(X_test)
-y_prob = catboost_model.predict_proba(X_test)[:, 1]
-
-print("\n" + "="*50)
-print("MODEL EVALUATION RESULTS")
-print("="*50)
-
-print(f"\nAccuracy: {accuracy_score(y_test, y_pred):.4f}")
-print(f"ROC-AUC Score: {roc_auc_score(y_test, y_prob):.4f}")
-
-print("\nConfusion Matrix:")
-cm = confusion_matrix(y_test, y_pred)
-print(cm)
-
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred))
-
-# 9. Feature importance
-feature_importance = catboost_model.get_feature_importance()
-feature_names = X.columns
-importance_df = pd.DataFrame({
-    'feature': feature_names,
-    'importance': feature_importance
-}).sort_values('importance', ascending=False)
-
-print("\nTop 10 Most Important Features:")
-print(importance_df.head(10))
-
-# 10. Save model and preprocessing objects
-joblib.dump(catboost_model, "models/catboost_model.pkl")
-joblib.dump(categorical_features, "models/categorical_features.pkl")
-importance_df.to_csv("models/feature_importance.csv", index=False)
-
-print("\n✅ CatBoost model, categorical features list, and feature importance saved!")
-print(f"✅ Model saved to: models/catboost_model.pkl")
-print(f"✅ Categorical features saved to: models/categorical_features.pkl")
-print(f"✅ Feature importance saved to: models/feature_importance.csv")
-
-# 11. Quick prediction example (optional)
-print("\n" + "="*50)
-print("SAMPLE PREDICTIONS")
-print("="*50)
-sample_predictions = y_prob[:5]
-sample_actual = y_test[:5] if hasattr(y_test, 'iloc') else y_test[0:5]
-print("Sample probabilities (fraud likelihood):")
-for i, (prob, actual) in enumerate(zip(sample_predictions, sample_actual)):
-    print(f"Sample {i+1}: Fraud Probability = {prob:.4f}, Actual = {actual}")
\ No newline at end of file
+        train_default(onnx=args.onnx)
+
+
+if __name__ == "__main__":
+    main()
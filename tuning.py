@@ -0,0 +1,223 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from train import DATA_PATH, build_model, evaluate_model, load_training_data, save_model_artifacts
+
+# ---------------- CONFIG ----------------
+SEARCH_DB = os.getenv("FRAUD_SEARCH_DB", os.path.join("models", "search_trials.sqlite"))
+PRUNE_AFTER = 100     # iterations before a trial may be pruned
+PRUNE_MARGIN = 0.05   # prune when validation AUC trails the best trial by more than this
+
+SEARCH_SPACE = {
+    "depth": (4, 10),
+    "learning_rate": (0.01, 0.3),   # log-uniform
+    "l2_leaf_reg": (1.0, 10.0),     # log-uniform
+    "fraud_weight": (1.0, 5.0),     # class_weights = [1, fraud_weight]
+}
+
+
+def split_data(X, y, random_state=42):
+    """Hold out the same 20% test set as train.py, then 20% of the rest for validation."""
+    idx = np.arange(len(X))
+    train_idx, test_idx = train_test_split(idx, test_size=0.2, stratify=y, random_state=random_state)
+    fit_idx, valid_idx = train_test_split(train_idx, test_size=0.2, stratify=y[train_idx],
+                                          random_state=random_state)
+    return fit_idx, valid_idx, test_idx
+
+
+def sample_params(rng):
+    """Draw one configuration from SEARCH_SPACE."""
+    lo, hi = SEARCH_SPACE["learning_rate"]
+    l2_lo, l2_hi = SEARCH_SPACE["l2_leaf_reg"]
+    return {
+        "depth": int(rng.integers(SEARCH_SPACE["depth"][0], SEARCH_SPACE["depth"][1] + 1)),
+        "learning_rate": float(np.exp(rng.uniform(np.log(lo), np.log(hi)))),
+        "l2_leaf_reg": float(np.exp(rng.uniform(np.log(l2_lo), np.log(l2_hi)))),
+        "fraud_weight": float(rng.uniform(*SEARCH_SPACE["fraud_weight"])),
+    }
+
+
+def suggest_params(trial):
+    """Draw one configuration from SEARCH_SPACE through an optuna trial (bayesian strategy)."""
+    return {
+        "depth": trial.suggest_int("depth", *SEARCH_SPACE["depth"]),
+        "learning_rate": trial.suggest_float("learning_rate", *SEARCH_SPACE["learning_rate"], log=True),
+        "l2_leaf_reg": trial.suggest_float("l2_leaf_reg", *SEARCH_SPACE["l2_leaf_reg"], log=True),
+        "fraud_weight": trial.suggest_float("fraud_weight", *SEARCH_SPACE["fraud_weight"]),
+    }
+
+
+class PruneCallback:
+    """CatBoost callback that stops a trial whose validation AUC trails the best trial."""
+
+    def __init__(self, threshold, after=PRUNE_AFTER):
+        self.threshold = threshold
+        self.after = after
+        self.pruned = False
+
+    def after_iteration(self, info):
+        if self.threshold is None or info.iteration < self.after:
+            return True
+        auc = info.metrics.get("validation", {}).get("AUC")
+        if auc and auc[-1] < self.threshold:
+            self.pruned = True
+            return False
+        return True
+
+
+# ---------------- TRIAL WORKERS ----------------
+_worker_data = None
+
+
+def _init_worker(path):
+    """Load the cached dataset once per worker process (memory-mapped, pages shared)."""
+    global _worker_data
+    X, y, categorical_features = load_training_data(path)
+    fit_idx, valid_idx, _ = split_data(X, y)
+    _worker_data = {
+        "X_fit": X.iloc[fit_idx], "y_fit": y[fit_idx],
+        "X_valid": X.iloc[valid_idx], "y_valid": y[valid_idx],
+        "categorical_features": categorical_features,
+    }
+
+
+def run_trial(trial_id, params, thread_count, prune_threshold=None):
+    """Fit one configuration and return its validation AUC and the fitted model."""
+    data = _worker_data
+    model_params = {k: v for k, v in params.items() if k != "fraud_weight"}
+    model = build_model(
+        data["categorical_features"],
+        class_weights=[1, params["fraud_weight"]],
+        thread_count=thread_count,
+        verbose=False,
+        **model_params,
+    )
+    callback = PruneCallback(prune_threshold)
+    start = time.perf_counter()
+    model.fit(data["X_fit"], data["y_fit"], eval_set=(data["X_valid"], data["y_valid"]),
+              callbacks=[callback])
+    seconds = time.perf_counter() - start
+
+    valid_auc = roc_auc_score(data["y_valid"], model.predict_proba(data["X_valid"])[:, 1])
+    return {
+        "trial_id": trial_id,
+        "params": params,
+        "valid_auc": float(valid_auc),
+        "best_iteration": model.get_best_iteration(),
+        "seconds": seconds,
+        "pruned": callback.pruned,
+        "model": model,
+    }
+
+
+# ---------------- RESULT STORE ----------------
+class TrialStore:
+    """SQLite record of every search trial."""
+
+    def __init__(self, path=SEARCH_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS trials (
+                study TEXT, trial_id INTEGER, strategy TEXT, params TEXT,
+                valid_auc REAL, best_iteration INTEGER, seconds REAL,
+                pruned INTEGER, thread_count INTEGER, created_at TEXT
+            )"""
+        )
+
+    def record(self, study, strategy, result, thread_count):
+        self.conn.execute(
+            "INSERT INTO trials VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (study, result["trial_id"], strategy, json.dumps(result["params"]),
+             result["valid_auc"], result["best_iteration"], result["seconds"],
+             int(result["pruned"]), thread_count, datetime.now().isoformat()),
+        )
+        self.conn.commit()
+
+    def best(self, study):
+        row = self.conn.execute(
+            "SELECT trial_id, params, valid_auc FROM trials WHERE study = ? AND pruned = 0 "
+            "ORDER BY valid_auc DESC LIMIT 1", (study,)
+        ).fetchone()
+        return None if row is None else {"trial_id": row[0], "params": json.loads(row[1]), "valid_auc": row[2]}
+
+
+# ---------------- SEARCH ----------------
+def run_search(n_trials=20, n_jobs=None, strategy="random", seed=42, path=DATA_PATH, store_path=SEARCH_DB,
+               onnx=False):
+    """
+    Run n_trials CatBoost configurations, n_jobs at a time, each with an equal
+    share of the cores as thread_count. Results go to the SQLite store and the
+    best model is evaluated on the held-out test set and exported to models/.
+    """
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, n_trials))
+    thread_count = max(1, (os.cpu_count() or 1) // n_jobs)
+    study = f"{strategy}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    store = TrialStore(store_path)
+
+    if strategy == "bayesian":
+        try:
+            import optuna
+        except ImportError:
+            raise ImportError("The bayesian strategy needs optuna: pip install optuna (see requirements.txt)")
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        sampler = optuna.samplers.TPESampler(seed=seed)
+        optuna_study = optuna.create_study(direction="maximize", sampler=sampler)
+    rng = np.random.default_rng(seed)
+
+    print(f"🔎 Search {study}: {n_trials} trials, {n_jobs} parallel, {thread_count} threads each")
+
+    best = None
+    pending = {}
+    submitted = 0
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=ctx,
+                             initializer=_init_worker, initargs=(path,)) as executor:
+        while submitted < n_trials or pending:
+            while submitted < n_trials and len(pending) < n_jobs:
+                if strategy == "bayesian":
+                    optuna_trial = optuna_study.ask()
+                    params = suggest_params(optuna_trial)
+                else:
+                    optuna_trial = None
+                    params = sample_params(rng)
+                threshold = best["valid_auc"] - PRUNE_MARGIN if best else None
+                future = executor.submit(run_trial, submitted, params, thread_count, threshold)
+                pending[future] = optuna_trial
+                submitted += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                optuna_trial = pending.pop(future)
+                result = future.result()
+                store.record(study, strategy, result, thread_count)
+                if optuna_trial is not None:
+                    if result["pruned"]:
+                        optuna_study.tell(optuna_trial, state=optuna.trial.TrialState.PRUNED)
+                    else:
+                        optuna_study.tell(optuna_trial, result["valid_auc"])
+
+                status = "pruned" if result["pruned"] else f"AUC {result['valid_auc']:.4f}"
+                print(f"  trial {result['trial_id']:3d}: {status} in {result['seconds']:.1f}s {result['params']}")
+                if not result["pruned"] and (best is None or result["valid_auc"] > best["valid_auc"]):
+                    best = result
+
+    if best is None:
+        print("⚠️ Every trial was pruned, nothing exported")
+        return None
+
+    print(f"\n🏆 Best trial {best['trial_id']}: validation AUC {best['valid_auc']:.4f} {best['params']}")
+
+    # Evaluate on the held-out test set and export like train.py does
+    X, y, categorical_features = load_training_data(path, save_encoder=True)
+    _, _, test_idx = split_data(X, y)
+    evaluate_model(best["model"], X.iloc[test_idx], y[test_idx])
+    save_model_artifacts(best["model"], categorical_features, X.columns, onnx=onnx)
+    return store.best(study)
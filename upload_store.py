@@ -0,0 +1,109 @@
+import glob
+import hashlib
+import os
+import re
+import tempfile
+
+from logs import get_logger
+from metrics import UPLOADS, timed
+
+logger = get_logger(__name__)
+
+# ---------------- CONFIG ----------------
+UPLOAD_DIR = os.getenv("FRAUD_UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = int(os.getenv("FRAUD_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))  # per uploaded file
+FORM_OVERHEAD_BYTES = 1024 * 1024  # room for the other form fields in a multipart request
+MAX_REQUEST_BYTES = MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES
+CHUNK_BYTES = 64 * 1024
+INCOMING_DIR = ".incoming"  # temp files, inside UPLOAD_DIR so the final rename stays on one filesystem
+
+_EXTENSION = re.compile(r"^\.[a-z0-9]{1,8}$")
+
+# ---------------- CONTENT-ADDRESSED UPLOADS ----------------
+# Uploaded files are streamed in chunks to a temp file while their sha256 is
+# computed, then renamed to uploads/<first 2 hex chars>/<sha256><ext>. The
+# client filename only contributes the extension, so two claims uploading
+# "images.jpeg" no longer overwrite each other, and the same photo sent with
+# several claims is stored once.
+#
+# Limitation: the web frameworks parse the multipart body before a handler
+# sees the file. Werkzeug (request.files) and Starlette (request.form())
+# spool each uploaded part to a SpooledTemporaryFile, in memory up to about
+# 500 KB / 1 MB and on disk above that. store_stream then reads that spool,
+# so a large photo is written to disk twice: once by the framework, once
+# here. Memory stays bounded either way, and MAX_REQUEST_BYTES
+# (MAX_CONTENT_LENGTH in Flask, the Content-Length check in the async app)
+# refuses oversized bodies before they are parsed.
+
+
+class UploadTooLarge(ValueError):
+    """Uploaded file exceeds the size limit; answer 413."""
+
+
+class StoredUpload:
+    def __init__(self, sha256, path, size, deduplicated):
+        self.sha256 = sha256
+        self.path = path
+        self.size = size
+        self.deduplicated = deduplicated  # identical content was already stored
+
+
+def safe_extension(filename):
+    """Lower-cased extension of a client filename, or '' if it looks unusual."""
+    ext = os.path.splitext(os.path.basename(filename or ""))[1].lower()
+    return ext if _EXTENSION.match(ext) else ""
+
+
+def content_path(sha256, ext="", root=None):
+    """Where content with this hash is stored."""
+    return os.path.join(root or UPLOAD_DIR, sha256[:2], sha256 + ext)
+
+
+def store_stream(stream, filename=None, max_bytes=MAX_UPLOAD_BYTES, root=None):
+    """
+    Copy a binary file object into the store without holding it in memory.
+    Raises UploadTooLarge (nothing is kept) once more than max_bytes are read.
+    For web uploads the stream is the framework's spooled copy of the part,
+    so large files are written twice (see the note above).
+    """
+    root = root or UPLOAD_DIR
+    incoming = os.path.join(root, INCOMING_DIR)
+    os.makedirs(incoming, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    with timed("upload"):
+        fd, tmp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        UPLOADS.inc(outcome="too_large")
+                        raise UploadTooLarge(f"Uploaded file exceeds {max_bytes} bytes")
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            sha256 = digest.hexdigest()
+            # Same bytes under another extension count as the same upload
+            existing = glob.glob(glob.escape(content_path(sha256, "", root)) + "*")
+            deduplicated = bool(existing)
+            if deduplicated:
+                path = existing[0]
+                os.remove(tmp_path)
+            else:
+                path = content_path(sha256, safe_extension(filename), root)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Atomic: a concurrent upload of the same bytes just replaces identical content
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    UPLOADS.inc(outcome="deduplicated" if deduplicated else "stored")
+    logger.info("Upload stored", extra={"sha256": sha256, "bytes": size, "deduplicated": deduplicated})
+    return StoredUpload(sha256, path, size, deduplicated)
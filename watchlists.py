@@ -0,0 +1,181 @@
+import json
+import numbers
+import os
+from collections import deque
+
+from logs import get_logger
+from resources import Lazy
+
+logger = get_logger(__name__)
+
+# ---------------- CONFIG ----------------
+WATCHLIST_DIR = os.getenv("FRAUD_WATCHLIST_DIR",
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), "watchlists"))
+MANIFEST = "watchlists.json"
+
+# ---------------- WATCHLISTS ----------------
+# watchlists/watchlists.json names each list, the claim columns it applies
+# to, how entries match and the reason reported for a hit:
+#   "suspicious_occupations": {"file": "suspicious_occupations.txt",
+#       "columns": ["insured_occupation"], "match": "substring",
+#       "reason": "High-risk occupation"}
+# The .txt files hold one entry per line (# starts a comment); values and
+# entries are compared lower-cased and stripped; whole floats lose their
+# ".0", so a zip column read as float64 (it has blanks) still matches "430632".
+#   exact     - hashed set lookup (zips, makes/models, repair shops)
+#   substring - Aho-Corasick automaton: every entry found in one pass over
+#               the value, however long the list is
+# Matching runs once per distinct value of a column and is then mapped back
+# onto the frame, so a categorical column costs one lookup per category.
+
+
+def normalize(value):
+    # float/numpy floats, not ints or bools
+    if isinstance(value, numbers.Real) and not isinstance(value, numbers.Integral) and float(value).is_integer():
+        value = int(value)
+    return str(value).strip().lower()
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher (goto/fail automaton over characters)."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._link()
+
+    def _add(self, pattern):
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += (pattern,)
+
+    def _link(self):
+        # Breadth-first: a state's failure link points to its longest proper suffix in the trie
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def search(self, text):
+        """Every pattern occurring in text."""
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found.update(self._out[state])
+        return found
+
+    def contains_any(self, text):
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._out[state]:
+                return True
+        return False
+
+
+class Watchlist:
+    def __init__(self, name, entries, columns, match="exact", reason=None):
+        if match not in ("exact", "substring"):
+            raise ValueError(f"Watchlist {name}: unknown match mode {match!r}")
+        self.name = name
+        self.columns = list(columns)
+        self.match = match
+        self.reason = reason or f"Watchlist match ({name})"
+        self.entries = frozenset(normalize(e) for e in entries if normalize(e))
+        self._automaton = AhoCorasick(self.entries) if match == "substring" else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def matches(self, value):
+        value = normalize(value)
+        if self._automaton is not None:
+            return self._automaton.contains_any(value)
+        return value in self.entries
+
+    def flag(self, df):
+        """Boolean Series: rows where any of the watchlist's columns hits the list."""
+        import pandas as pd
+
+        hits = pd.Series(False, index=df.index)
+        if not self.entries:
+            return hits
+        for col in self.columns:
+            if col not in df.columns:
+                continue
+            values = df[col].dropna()
+            if values.empty:
+                continue
+            distinct = values.unique()
+            if self._automaton is None:
+                found = {v for v in distinct if normalize(v) in self.entries}
+            else:
+                found = {v for v in distinct if self._automaton.contains_any(normalize(v))}
+            if found:
+                hits |= df[col].isin(found)
+        return hits
+
+
+def read_entries(path):
+    """Entries of a watchlist file: one per line, blank lines and # comments skipped."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            entry = line.split("#", 1)[0].strip()
+            if entry:
+                entries.append(entry)
+    return entries
+
+
+def load_watchlists(directory=None):
+    """Compile every watchlist described in <directory>/watchlists.json."""
+    directory = directory or WATCHLIST_DIR
+    manifest_path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(manifest_path):
+        # Scoring without the lists would silently drop the occupation, hobby, location... checks
+        raise FileNotFoundError(f"No watchlist manifest at {manifest_path} (FRAUD_WATCHLIST_DIR)")
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    watchlists = []
+    for name, spec in manifest.items():
+        entries = read_entries(os.path.join(directory, spec.get("file", f"{name}.txt")))
+        watchlists.append(Watchlist(name, entries, spec["columns"], spec.get("match", "exact"), spec.get("reason")))
+    logger.info("Watchlists loaded", extra={"watchlists": {w.name: len(w) for w in watchlists}})
+    return watchlists
+
+
+watchlists = Lazy(load_watchlists)
+
+
+def watchlist_hits(df, lists=None):
+    """{watchlist name: boolean Series} for the lists with at least one hit in df."""
+    hits = {}
+    for watchlist in watchlists.get() if lists is None else lists:
+        flags = watchlist.flag(df)
+        if flags.any():
+            hits[watchlist.name] = flags
+    return hits